@@ -0,0 +1,275 @@
+"""
+In-memory catalog of the export directory for long-running processes
+"""
+import os
+import sys
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+from .file_manager import HTMLFileManager, HTMLFileRecord, METADATA_FIELDS
+from .search import SearchIndex, tokenize
+from .client_index import ClientSearchIndex
+from . import storage
+
+# Bits of CatalogEntry.flags
+HAS_IMAGES = 1
+HAS_LINKS = 2
+IS_GEMINI_CANVAS = 4
+FLAG_BITS = {'has_images': HAS_IMAGES, 'has_links': HAS_LINKS, 'is_gemini_canvas': IS_GEMINI_CANVAS}
+
+
+class CatalogEntry:
+    """Compact in-memory metadata for one file
+
+    Times are epoch integers, the checksum is the raw 16-byte digest, the
+    boolean flags share one int and the directory, compression method and
+    description are interned. to_dict() produces the usual metadata dict and
+    is only called where entries leave the catalog (API responses, templates,
+    events).
+    """
+
+    __slots__ = ('filename', 'directory', 'compression', 'size_bytes', 'created', 'modified_ns',
+                 'digest', 'bytes_saved', 'title', 'description', 'word_count', 'flags')
+
+    def __init__(self, path: str, metadata: Dict[str, Any], created: int, modified_ns: int):
+        self.filename = metadata['filename']
+        self.directory = sys.intern(os.path.dirname(path))
+        compression = storage.compression_of(path)
+        self.compression = sys.intern(compression) if compression else None
+        self.size_bytes = metadata['size_bytes']
+        self.created = int(created)
+        self.modified_ns = modified_ns
+        self.digest = bytes.fromhex(metadata['checksum']) if metadata.get('checksum') else b''
+        self.bytes_saved = metadata.get('bytes_saved', 0)
+        self.title = metadata.get('title') or ''
+        self.description = sys.intern(metadata.get('description') or '')
+        self.word_count = metadata.get('word_count', 0)
+        self.flags = 0
+        for field, bit in FLAG_BITS.items():
+            if metadata.get(field):
+                self.flags |= bit
+
+    @classmethod
+    def from_record(cls, record: HTMLFileRecord) -> 'CatalogEntry':
+        """Build an entry from a directory scan record, extracting its metadata"""
+        return cls(record.path, record.to_dict(), record.created_timestamp, record.modified_ns)
+
+    @property
+    def signature(self) -> Tuple[int, int]:
+        """What a rescan compares to decide whether the file changed"""
+        return self.modified_ns, self.size_bytes
+
+    @property
+    def path(self) -> str:
+        stored_name = self.filename + storage.COMPRESSION_SUFFIXES.get(self.compression, '')
+        return os.path.join(self.directory, stored_name)
+
+    @property
+    def size_mb(self) -> float:
+        return round(self.size_bytes / (1024 * 1024), 2)
+
+    @property
+    def created_timestamp(self) -> int:
+        return self.created
+
+    @property
+    def modified_timestamp(self) -> int:
+        return self.modified_ns // 1_000_000_000
+
+    @property
+    def created_time(self) -> str:
+        return datetime.fromtimestamp(self.created).isoformat()
+
+    @property
+    def modified_time(self) -> str:
+        return datetime.fromtimestamp(self.modified_timestamp).isoformat()
+
+    @property
+    def checksum(self) -> str:
+        return self.digest.hex()
+
+    @property
+    def has_images(self) -> bool:
+        return bool(self.flags & HAS_IMAGES)
+
+    @property
+    def has_links(self) -> bool:
+        return bool(self.flags & HAS_LINKS)
+
+    @property
+    def is_gemini_canvas(self) -> bool:
+        return bool(self.flags & IS_GEMINI_CANVAS)
+
+    def get(self, field: str, default: Any = None) -> Any:
+        """Dict-style access to a single field, for code shared with metadata dicts"""
+        if field in METADATA_FIELDS or field in ('created_timestamp', 'modified_timestamp'):
+            return getattr(self, field)
+        return default
+
+    def to_dict(self, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Metadata dict in the shape of HTMLFileRecord.to_dict(), optionally only some fields"""
+        return {field: getattr(self, field) for field in (fields or METADATA_FIELDS)}
+
+    def __repr__(self) -> str:
+        return f"CatalogEntry({self.filename!r}, size_bytes={self.size_bytes})"
+
+
+class Catalog:
+    """Metadata cache for the export directory, refreshed incrementally
+
+    refresh() rescans the directory (stat only) and re-extracts metadata just
+    for files whose size or modification time changed. Every refresh that
+    finds a change bumps the generation number and notifies listeners,
+    once per change and in order. Refreshes run one at a time, so overlapping callers (requests, the
+    event watcher, jobs) don't parse the same files twice or apply an
+    older scan over a newer one.
+    """
+
+    def __init__(self, file_manager: HTMLFileManager):
+        self.file_manager = file_manager
+        self.generation = 0
+        self._entries: Dict[str, CatalogEntry] = {}
+        self._text_tokens: Dict[str, FrozenSet[str]] = {}
+        self._search_index: Tuple[int, SearchIndex] = (-1, None)
+        self._client_index: Tuple[int, ClientSearchIndex] = (-1, None)
+        self._listeners: List[Callable[[Dict[str, List[Dict[str, Any]]]], None]] = []
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+
+    def add_listener(self, callback: Callable[[Dict[str, List[Dict[str, Any]]]], None]) -> None:
+        """Call callback(changes) after every refresh that finds a change"""
+        self._listeners.append(callback)
+
+    def refresh(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Rescan the export directory and return the entries that were added, changed or removed"""
+        with self._refresh_lock:
+            changes = self._scan()
+
+            # Still under the refresh lock, so listeners get change sets in
+            # the order they were applied
+            if any(changes.values()):
+                for callback in self._listeners:
+                    try:
+                        callback(changes)
+                    except Exception as e:
+                        print(f"Error notifying catalog listener: {e}")
+
+        return changes
+
+    def _scan(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Apply the changes in the export directory (call with the refresh lock held)"""
+        with self._lock:
+            known = {path: entry.signature for path, entry in self._entries.items()}
+
+        scanned = set()
+        updated = {}
+        for record in self.file_manager.iter_html_files():
+            scanned.add(record.path)
+            if known.get(record.path) != (record.modified_ns, record.size_bytes):
+                try:
+                    # Interned tokens are shared by every document that uses them
+                    tokens = frozenset(map(sys.intern, tokenize(record.text)))
+                    updated[record.path] = (CatalogEntry.from_record(record), tokens)
+                except Exception as e:
+                    print(f"Error processing file {record.path}: {e}")
+
+        changes = {'added': [], 'changed': [], 'removed': []}
+
+        with self._lock:
+            for path, (entry, tokens) in updated.items():
+                kind = 'changed' if path in self._entries else 'added'
+                self._entries[path] = entry
+                self._text_tokens[path] = tokens
+                changes[kind].append(entry.to_dict())
+
+            for path in list(self._entries):
+                if path not in scanned:
+                    changes['removed'].append(self._entries.pop(path).to_dict())
+                    self._text_tokens.pop(path, None)
+
+            if any(changes.values()):
+                self.generation += 1
+
+        return changes
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """Metadata for every file, newest first (same shape as list_html_files())"""
+        return [entry.to_dict() for entry in self._sorted_entries()]
+
+    def _sorted_entries(self) -> List[CatalogEntry]:
+        with self._lock:
+            entries = list(self._entries.values())
+        entries.sort(key=lambda entry: entry.created, reverse=True)
+        return entries
+
+    def search_index(self) -> SearchIndex:
+        """Search index for the current generation, rebuilt only after the catalog changes"""
+        with self._lock:
+            generation, index = self._search_index
+            if index is None or generation != self.generation:
+                entries = self._sorted_entries()
+                index = SearchIndex(entries, [self._text_tokens.get(entry.path, frozenset())
+                                              for entry in entries])
+                self._search_index = (self.generation, index)
+            return index
+
+    def client_search_index(self) -> ClientSearchIndex:
+        """Prebuilt index for client-side search, rebuilt only after the catalog changes"""
+        with self._lock:
+            generation, index = self._client_index
+            if index is None or generation != self.generation:
+                index = ClientSearchIndex(self.search_index())
+                self._client_index = (self.generation, index)
+            return index
+
+    def search(self, query: str) -> List[Dict[str, Any]]:
+        """Entries matching a structured query (see gemini_html_manager.search), newest first
+
+        Raises search.QueryError for invalid queries.
+        """
+        return [entry.to_dict() for entry in self.search_index().search(query)]
+
+    def search_with_facets(self, query: str, fields: Optional[List[str]] = None
+                           ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Like search(), plus facet counts for the matches (see SearchIndex.facets())
+
+        With fields, each result only carries those keys.
+        """
+        results, facets = self.search_index().search_with_facets(query)
+        return [entry.to_dict(fields) for entry in results], facets
+
+    def stats(self) -> Dict[str, Any]:
+        """Aggregate statistics shown on the dashboard"""
+        with self._lock:
+            entries = list(self._entries.values())
+
+        return {
+            'total_files': len(entries),
+            'total_size_mb': sum(entry.size_mb for entry in entries),
+            'gemini_canvas_files': sum(1 for entry in entries if entry.flags & IS_GEMINI_CANVAS),
+            'files_with_images': sum(1 for entry in entries if entry.flags & HAS_IMAGES)
+        }
+
+    @staticmethod
+    def summarize(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """stats() for a list of metadata dicts"""
+        return {
+            'total_files': len(entries),
+            'total_size_mb': sum(entry['size_mb'] for entry in entries),
+            'gemini_canvas_files': sum(1 for entry in entries if entry.get('is_gemini_canvas')),
+            'files_with_images': sum(1 for entry in entries if entry.get('has_images'))
+        }
+
+    @staticmethod
+    def organize_by_date(entries: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+        """Group entries by creation date, as HTMLFileManager.organize_files_by_date() does"""
+        organized = {}
+
+        for file_info in entries:
+            try:
+                date_key = datetime.fromisoformat(file_info['created_time']).strftime('%Y-%m-%d')
+                organized.setdefault(date_key, []).append(file_info)
+            except Exception as e:
+                print(f"Error organizing file {file_info.get('filename')}: {e}")
+
+        return organized
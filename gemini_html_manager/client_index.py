@@ -0,0 +1,114 @@
+"""
+Prebuilt search index for browsers to download and query themselves
+"""
+import gzip
+import hashlib
+from typing import Any, Dict, List, Optional
+from .search import SearchIndex, FLAGS, ids_from_bitmap
+from . import serialization
+
+# Bumped whenever the file layout below changes; clients that do not
+# understand a version fall back to server-side search
+FORMAT_VERSION = 1
+
+# Words are sharded by their first characters, so a prefix search downloads
+# the one shard its prefix falls in (or, for a one-character prefix, every
+# shard starting with that character)
+SHARD_PREFIX_LENGTH = 2
+
+FLAG_BITS = {'has_images': 1, 'has_links': 2, 'is_gemini_canvas': 4}
+
+
+def _delta_encode(ids: List[int]) -> List[int]:
+    """Ascending doc ids as gaps, which JSON-encode (and gzip) much smaller"""
+    previous = 0
+    gaps = []
+    for doc_id in ids:
+        gaps.append(doc_id - previous)
+        previous = doc_id
+    return gaps
+
+
+class ClientSearchIndex:
+    """Compact, versioned, sharded export of a SearchIndex
+
+    Holds a set of JSON files named by content hash:
+
+        search-docs.<hash>.json    columns for every document, in index order
+                                   (filename, title, description, size, words,
+                                   created, modified, flag bits)
+        search-shard.<hash>.json   {"meta": {word: gaps}, "text": {word: gaps}}
+                                   for the words starting with one prefix;
+                                   gaps are delta-encoded ascending doc ids
+
+    and a small manifest listing the format version, the documents file and
+    each shard prefix's file. Because names change with content, everything
+    but the manifest can be cached indefinitely; the manifest's ETag is the
+    index version, so revalidating it costs a 304 until the catalog changes.
+    """
+
+    def __init__(self, index: SearchIndex):
+        self.files: Dict[str, bytes] = {}
+        self._compressed: Dict[str, bytes] = {}
+
+        entries = index.entries
+        flags = [0] * index.size
+        for column, bit in FLAG_BITS.items():
+            for doc_id in ids_from_bitmap(index.flags[column]):
+                flags[doc_id] |= bit
+
+        self.documents = self._add('search-docs', {
+            'filename': [entry.get('filename', '') for entry in entries],
+            'title': [entry.get('title') or '' for entry in entries],
+            'description': [entry.get('description') or '' for entry in entries],
+            'size': index.columns['size_bytes'],
+            'words': index.columns['word_count'],
+            'created': index.columns['created_timestamp'],
+            'modified': index.columns['modified_timestamp'],
+            'flags': flags
+        })
+
+        shards: Dict[str, Dict[str, Dict[str, List[int]]]] = {}
+        for index_name, (vocabulary, postings) in index.word_indexes.items():
+            for word in vocabulary:
+                shard = shards.setdefault(word[:SHARD_PREFIX_LENGTH], {'meta': {}, 'text': {}})
+                shard[index_name][word] = _delta_encode(postings[word])
+        self.shards = {prefix: self._add('search-shard', shard) for prefix, shard in sorted(shards.items())}
+
+        digest = hashlib.sha256(str(FORMAT_VERSION).encode())
+        digest.update(self.documents.encode())
+        for prefix, name in self.shards.items():
+            digest.update(f'{prefix}:{name}'.encode())
+        self.version = digest.hexdigest()[:16]
+
+    def _add(self, kind: str, data: Any) -> str:
+        body = serialization.dumps(data)
+        name = f"{kind}.{hashlib.sha256(body).hexdigest()[:16]}.json"
+        self.files[name] = body
+        return name
+
+    def manifest(self, url_prefix: str) -> Dict[str, Any]:
+        """The manifest, with file URLs under url_prefix"""
+        return {
+            'format': FORMAT_VERSION,
+            'version': self.version,
+            'documents': url_prefix + self.documents,
+            'shard_prefix_length': SHARD_PREFIX_LENGTH,
+            'shards': {prefix: url_prefix + name for prefix, name in self.shards.items()},
+            # Query-language flag terms (has:images, is:canvas, ...) -> flag bit
+            'flags': {f'{field}:{value}': FLAG_BITS[column] for (field, value), column in FLAGS.items()}
+        }
+
+    def get(self, name: str, compressed: bool = False) -> Optional[bytes]:
+        """A file's JSON, optionally gzipped (compressed once, on first request)"""
+        body = self.files.get(name)
+        if body is None or not compressed:
+            return body
+        if name not in self._compressed:
+            self._compressed[name] = gzip.compress(body, 6)
+        return self._compressed[name]
+
+    @staticmethod
+    def etag(name: str) -> str:
+        """ETag for a file: its content hash"""
+        return name.rsplit('.', 2)[-2]
@@ -43,12 +43,32 @@ class Config:
                     "https://www.googleapis.com/auth/drive.file"
                 ],
                 "credentials_file": "credentials.json",
-                "token_file": "token.json"
+                "token_file": "token.json",
+                "client_pool_size": 8,
+                "client_pool_timeout": 120,
+                "http_timeout": 60,
+                "api_endpoint": "",
+                "rate_limit": {
+                    "user_requests_per_second": 10,
+                    "project_requests_per_second": 100,
+                    "burst": 10,
+                    "decrease_factor": 0.5,
+                    "additive_increase": 1.0,
+                    "min_requests_per_second": 0.5,
+                    "max_retries": 8,
+                    "initial_backoff": 1.0,
+                    "max_backoff": 64.0
+                }
             },
             "html_manager": {
                 "export_directory": "html_exports",
                 "max_file_size": 10,
                 "supported_extensions": [".html", ".htm"],
+                "storage_compression": "none",
+                "optimize_on_import": False,
+                "layout": "flat",
+                "version_history": True,
+                "max_versions": 50,
                 "default_sharing": {
                     "type": "anyone",
                     "role": "reader"
@@ -59,9 +79,80 @@ class Config:
                 "port": 5000,
                 "debug": False
             },
+            "events": {
+                "max_connections": 50,
+                "keepalive_seconds": 15,
+                "poll_interval_seconds": 5
+            },
+            "cache": {
+                "enabled": True,
+                "max_bytes": 33554432
+            },
+            "mirror": {
+                "workers": 4,
+                "chunk_size": 1048576
+            },
+            "emulator": {
+                "host": "127.0.0.1",
+                "port": 8765,
+                "latency_ms": 0,
+                "latency_jitter_ms": 0,
+                "error_rate": 0.0,
+                "rate_limit_rate": 0.0,
+                "max_requests_per_second": 0,
+                "seed": None,
+                "log_requests": False
+            },
+            "static_site": {
+                "output_directory": "site",
+                "base_url": "/"
+            },
+            "grep": {
+                "workers": 0,
+                "max_matches_per_file": 1000,
+                "context_bytes": 120,
+                "max_concurrent": 2,
+                "api_regex": False
+            },
+            "profiling": {
+                "admin_token": "",
+                "profile_paths": [],
+                "slow_request_ms": 0,
+                "sample_interval_ms": 5,
+                "max_profiles": 20
+            },
+            "load_test": {
+                "routes": [
+                    "1:/",
+                    "2:/gemini-manager/",
+                    "1:/gemini-manager/files",
+                    "2:/gemini-manager/file/{file}",
+                    "2:/gemini-manager/download/{file}",
+                    "3:/api/search?q={word}",
+                    "1:/api/file_metadata/{file}"
+                ]
+            },
+            "jobs": {
+                "state_directory": ".jobs",
+                "max_workers": 2,
+                "max_history": 100,
+                "pools": {
+                    "drive": 8
+                }
+            },
+            "uploads": {
+                "directory": ".uploads",
+                "chunk_size": 1048576,
+                "parallel_chunks": 4,
+                "session_ttl_hours": 24
+            },
             "conversion": {
                 "preserve_formatting": True,
+                "slim_html": True,
+                "compress_upload": True,
                 "convert_images": True,
+                "externalize_images": False,
+                "max_image_dimension": 1600,
                 "max_doc_size": 1000000
             }
         }
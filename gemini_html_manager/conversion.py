@@ -0,0 +1,378 @@
+"""
+Preprocessing of HTML content before Google Docs conversion
+"""
+import re
+import io
+import base64
+import hashlib
+from typing import Callable, Dict, List, Optional, Tuple
+from bs4 import BeautifulSoup, Comment
+from .config import config
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+DATA_IMAGE_RE = re.compile(
+    r'data:(image/[a-zA-Z0-9.+-]+);base64,([A-Za-z0-9+/=\s]+)'
+)
+
+# Called with (image bytes, mime type, sha256 digest); returns a URL or None
+ImageUploader = Callable[[bytes, str, str], Optional[str]]
+
+
+def downsample_image(data: bytes, mime_type: str, max_dimension: int) -> Tuple[bytes, str]:
+    """Shrink an image so neither side exceeds max_dimension (needs Pillow)"""
+    if Image is None or not max_dimension or mime_type == 'image/svg+xml':
+        return data, mime_type
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            if max(image.size) <= max_dimension:
+                return data, mime_type
+
+            image_format = image.format or 'PNG'
+            image.thumbnail((max_dimension, max_dimension))
+            output = io.BytesIO()
+            image.save(output, format=image_format)
+    except Exception as e:
+        print(f"Error downsampling inline image: {e}")
+        return data, mime_type
+
+    resized = output.getvalue()
+    if len(resized) >= len(data):
+        return data, mime_type
+    return resized, Image.MIME.get(image_format, mime_type)
+
+
+def process_inline_images(html_content: str,
+                          image_uploader: Optional[ImageUploader] = None) -> Tuple[str, Dict[str, int]]:
+    """Hash, deduplicate and optionally downsample or externalize data: images
+
+    Each distinct image (by content hash) is processed once. With an uploader
+    it is replaced by the uploader's URL everywhere it appears; otherwise it
+    stays inline. When conversion.convert_images is off, inline images are
+    dropped instead.
+    """
+    convert_images = config.get('conversion.convert_images', True)
+    max_dimension = config.get('conversion.max_image_dimension', 1600)
+
+    stats = {'inline_images': 0, 'unique_images': 0, 'externalized_images': 0}
+    replacements: Dict[str, str] = {}
+
+    def replace(match: re.Match) -> str:
+        stats['inline_images'] += 1
+        mime_type = match.group(1).lower()
+        encoded = re.sub(r'\s+', '', match.group(2))
+
+        try:
+            data = base64.b64decode(encoded)
+        except Exception:
+            return match.group(0)
+
+        digest = hashlib.sha256(data).hexdigest()
+        if digest in replacements:
+            return replacements[digest]
+
+        stats['unique_images'] += 1
+        if not convert_images:
+            replacement = ''
+        else:
+            data, mime_type = downsample_image(data, mime_type, max_dimension)
+            url = image_uploader(data, mime_type, digest) if image_uploader else None
+            if url:
+                stats['externalized_images'] += 1
+                replacement = url
+            else:
+                replacement = f"data:{mime_type};base64,{base64.b64encode(data).decode('ascii')}"
+
+        replacements[digest] = replacement
+        return replacement
+
+    processed = DATA_IMAGE_RE.sub(replace, html_content)
+
+    if not convert_images and stats['inline_images']:
+        # Drop the now-empty <img> tags rather than leaving broken images
+        soup = BeautifulSoup(processed, 'html.parser')
+        for img in soup.find_all('img', src=''):
+            img.decompose()
+        processed = str(soup)
+
+    return processed, stats
+
+
+# Elements the Docs importer ignores or renders as junk. <noscript> is
+# unwrapped rather than dropped, since it holds the no-JavaScript fallback.
+STRIP_TAGS = ('script', 'canvas', 'template', 'iframe', 'object', 'embed', 'link', 'base', 'dialog')
+STRIP_ATTRIBUTE_RE = re.compile(r'^(on\w+|data-[\w-]*|aria-[\w-]*|role|tabindex|nonce|integrity|crossorigin)$',
+                                re.IGNORECASE)
+
+# CSS properties the Docs importer maps onto document formatting
+DOCS_CSS_PROPERTIES = frozenset((
+    'color', 'background', 'background-color', 'font', 'font-family', 'font-size', 'font-style',
+    'font-weight', 'font-variant', 'text-align', 'text-decoration', 'text-indent', 'text-transform',
+    'line-height', 'letter-spacing', 'vertical-align', 'white-space', 'width', 'height',
+    'list-style', 'list-style-type', 'border-collapse', 'border-spacing'
+))
+DOCS_CSS_PREFIXES = ('margin', 'padding', 'border')
+
+# Selectors that only apply in a browser (interaction states, generated content)
+DYNAMIC_SELECTOR_RE = re.compile(
+    r'::|:(hover|focus|focus-within|focus-visible|active|visited|target|checked|disabled|enabled|'
+    r'before|after|first-line|first-letter|placeholder|selection)\b',
+    re.IGNORECASE
+)
+CSS_COMMENT_RE = re.compile(r'/\*.*?\*/', re.DOTALL)
+CSS_VAR_RE = re.compile(r'var\(\s*(--[\w-]+)\s*(?:,\s*([^()]*(?:\([^()]*\)[^()]*)*))?\)')
+CSS_CLASS_RE = re.compile(r'\.(-?[_a-zA-Z][\w-]*)')
+
+
+def _split_top_level(text: str, separator: str) -> List[str]:
+    """Split on separator outside parentheses and quotes (e.g. a url() holding ';')"""
+    pieces, depth, quote, start = [], 0, None, 0
+    for index, char in enumerate(text):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth = max(depth - 1, 0)
+        elif char == separator and depth == 0:
+            pieces.append(text[start:index])
+            start = index + 1
+    pieces.append(text[start:])
+    return pieces
+
+
+def parse_css_rules(css: str) -> List[Tuple[str, str]]:
+    """(selector, declarations) pairs of a stylesheet's plain rules
+
+    At-rules are skipped (@media, @keyframes, @font-face, @import, ...),
+    except that the rules inside @media print are kept, since they describe
+    how the page looks on paper.
+    """
+    css = CSS_COMMENT_RE.sub('', css)
+    rules = []
+    position = 0
+    while position < len(css):
+        brace = css.find('{', position)
+        if brace < 0:
+            break
+        prelude = css[position:brace].strip()
+        if prelude.startswith('@') or ';' in prelude:
+            # A statement at-rule such as @import ends at its semicolon
+            statement_end = css.find(';', position, brace)
+            if statement_end >= 0:
+                position = statement_end + 1
+                continue
+
+        depth, end = 1, brace + 1
+        while end < len(css) and depth:
+            if css[end] == '{':
+                depth += 1
+            elif css[end] == '}':
+                depth -= 1
+            end += 1
+        block = css[brace + 1:end - 1]
+        position = end
+
+        if prelude.startswith('@'):
+            if re.match(r'@media\s+print\b', prelude, re.IGNORECASE):
+                rules.extend(parse_css_rules(block))
+        elif prelude:
+            rules.append((prelude, block))
+    return rules
+
+
+def _declarations(block: str) -> List[Tuple[str, str]]:
+    declarations = []
+    for declaration in _split_top_level(block, ';'):
+        name, separator, value = declaration.partition(':')
+        name, value = name.strip().lower(), value.strip()
+        if separator and name and value:
+            declarations.append((name, value))
+    return declarations
+
+
+def _resolve_vars(value: str, variables: Dict[str, str]) -> Optional[str]:
+    """Substitute var() references (Docs has no custom properties); None if one can't be resolved"""
+    for _ in range(10):
+        match = CSS_VAR_RE.search(value)
+        if not match:
+            return value
+        replacement = variables.get(match.group(1), match.group(2))
+        if replacement is None:
+            return None
+        value = value[:match.start()] + replacement.strip() + value[match.end():]
+    return None
+
+
+def _docs_declarations(block: str, variables: Dict[str, str]) -> str:
+    """The declarations of a block that Docs understands, with variables resolved"""
+    kept = []
+    for name, value in _declarations(block):
+        if name not in DOCS_CSS_PROPERTIES and not name.startswith(DOCS_CSS_PREFIXES):
+            continue
+        value = _resolve_vars(value, variables)
+        if value:
+            kept.append(f"{name}:{value}")
+    return ';'.join(kept)
+
+
+def _prune_styles(soup: BeautifulSoup, stats: Dict[str, int]) -> None:
+    """Replace the page's <style> sheets with the rules that apply to it"""
+    rules = []
+    for style in soup.find_all('style'):
+        rules.extend(parse_css_rules(style.get_text()))
+        style.decompose()
+
+    variables: Dict[str, str] = {}
+    for selector, block in rules:
+        if selector.strip().lower() in (':root', 'html', 'body'):
+            variables.update((name, value) for name, value in _declarations(block) if name.startswith('--'))
+
+    kept_rules = []
+    used_classes = set()
+    for selector, block in rules:
+        matching = []
+        for single in _split_top_level(selector, ','):
+            single = single.strip()
+            if not single or DYNAMIC_SELECTOR_RE.search(single):
+                continue
+            try:
+                if soup.select_one(single) is not None:
+                    matching.append(single)
+            except Exception:
+                continue
+        declarations = _docs_declarations(block, variables) if matching else ''
+        if not declarations:
+            stats['css_rules_dropped'] += 1
+            continue
+        stats['css_rules_kept'] += 1
+        kept_rules.append(f"{','.join(matching)}{{{declarations}}}")
+        for single in matching:
+            used_classes.update(CSS_CLASS_RE.findall(single))
+
+    for element in soup.find_all(True):
+        if element.get('style'):
+            declarations = _docs_declarations(element['style'], variables)
+            if declarations:
+                element['style'] = declarations
+            else:
+                del element['style']
+        if element.get('class') is not None:
+            classes = [name for name in element['class'] if name in used_classes]
+            if classes:
+                element['class'] = classes
+            else:
+                del element['class']
+
+    if kept_rules:
+        style = soup.new_tag('style')
+        style.string = ''.join(kept_rules)
+        container = soup.head or soup.body or soup
+        container.insert(0, style)
+
+
+def slim_html(html_content: str) -> Tuple[str, Dict[str, int]]:
+    """Strip what the Docs importer can't use from a document
+
+    Scripts, canvases, embedded frames, comments, event handler and data
+    attributes go. With conversion.preserve_formatting on, the page's style
+    sheets are replaced by the rules whose selectors match something in the
+    page, limited to properties Docs maps onto formatting and with CSS
+    variables resolved; otherwise all styling is dropped.
+    """
+    preserve_formatting = config.get('conversion.preserve_formatting', True)
+    stats = {'removed_elements': 0, 'css_rules_kept': 0, 'css_rules_dropped': 0}
+
+    soup = BeautifulSoup(html_content, 'html.parser')
+    for element in soup.find_all(list(STRIP_TAGS)):
+        element.decompose()
+        stats['removed_elements'] += 1
+    for comment in soup.find_all(string=lambda text: isinstance(text, Comment)):
+        comment.extract()
+    for noscript in soup.find_all('noscript'):
+        noscript.unwrap()
+    for element in soup.find_all(True):
+        for name in [name for name in element.attrs if STRIP_ATTRIBUTE_RE.match(name)]:
+            del element[name]
+
+    if preserve_formatting:
+        _prune_styles(soup, stats)
+    else:
+        for style in soup.find_all('style'):
+            style.decompose()
+        for element in soup.find_all(True):
+            for name in ('style', 'class'):
+                if name in element.attrs:
+                    del element[name]
+
+    return str(soup), stats
+
+
+def split_html(html_content: str, max_size: int) -> List[str]:
+    """Split an HTML document into documents of at most max_size characters
+
+    The <head> is repeated in every part and the <body> is split between its
+    top-level children. A single child larger than max_size gets a part of
+    its own.
+    """
+    if not max_size or len(html_content) <= max_size:
+        return [html_content]
+
+    soup = BeautifulSoup(html_content, 'html.parser')
+    body = soup.body
+    if body is None:
+        return [html_content]
+
+    head = str(soup.head) if soup.head else ''
+    shell = f"<html>{head}<body></body></html>"
+    budget = max(max_size - len(shell), 1)
+
+    parts = []
+    current: List[str] = []
+    current_size = 0
+
+    for child in list(body.children):
+        chunk = str(child)
+        if current and current_size + len(chunk) > budget:
+            parts.append(current)
+            current, current_size = [], 0
+        current.append(chunk)
+        current_size += len(chunk)
+
+    if current:
+        parts.append(current)
+
+    return [f"<html>{head}<body>{''.join(part)}</body></html>" for part in parts]
+
+
+def prepare_html_for_docs(html_content: str,
+                          image_uploader: Optional[ImageUploader] = None) -> Tuple[List[str], Dict[str, int]]:
+    """Run the conversion preprocessing stage
+
+    Returns the HTML document(s) to upload, slimmed (unless
+    conversion.slim_html is off) and split to respect
+    conversion.max_doc_size, and counters describing the work done.
+    """
+    original_bytes = len(html_content.encode('utf-8'))
+
+    slim_stats: Dict[str, int] = {}
+    if config.get('conversion.slim_html', True):
+        html_content, slim_stats = slim_html(html_content)
+
+    processed, stats = process_inline_images(html_content, image_uploader)
+    parts = split_html(processed, config.get('conversion.max_doc_size', 1000000))
+
+    stats.update(slim_stats)
+    stats['original_bytes'] = original_bytes
+    stats['upload_bytes'] = sum(len(part.encode('utf-8')) for part in parts)
+    stats['bytes_saved'] = max(original_bytes - stats['upload_bytes'], 0)
+    stats['parts'] = len(parts)
+    return parts, stats
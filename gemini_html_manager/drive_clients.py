@@ -0,0 +1,197 @@
+"""
+Thread-safe Google API clients shared by request and job threads
+"""
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+import httplib2
+from google.auth import credentials as auth_credentials
+from google.auth.transport.requests import Request
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build, build_from_document
+from .config import config
+
+
+class SharedCredentials(auth_credentials.Credentials):
+    """Credentials shared by every client, refreshed under a lock
+
+    AuthorizedHttp calls before_request() for every API call and refresh()
+    after a 401. Both go through one lock, so an expired token is refreshed
+    once however many threads notice it, and no thread reads a token while
+    it is being replaced. Other attributes are passed through to the wrapped
+    credentials.
+
+    It is a google.auth Credentials subclass so that googleapiclient (e.g. for
+    batch requests) treats it as one; the base class state is not initialized
+    because every attribute lives on the wrapped credentials.
+    """
+
+    def __init__(self, credentials, on_refresh: Optional[Callable[[Any], None]] = None,
+                 min_refresh_interval: float = 10.0):
+        # Deliberately no super().__init__(), see above
+        self._credentials = credentials
+        self._on_refresh = on_refresh
+        self._min_refresh_interval = min_refresh_interval
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+        self.refresh_count = 0
+
+    def __getattr__(self, name):
+        return getattr(self._credentials, name)
+
+    @property
+    def valid(self) -> bool:
+        return self._credentials.valid
+
+    @property
+    def expired(self) -> bool:
+        return getattr(self._credentials, 'expired', False)
+
+    def apply(self, headers, token=None) -> None:
+        with self._lock:
+            self._credentials.apply(headers)
+
+    def before_request(self, request, method, url, headers) -> None:
+        with self._lock:
+            if not self._credentials.valid:
+                self._refresh(request)
+            self._credentials.apply(headers)
+
+    def refresh(self, request) -> None:
+        with self._lock:
+            # Several threads can get a 401 for the same stale token; the
+            # first one refreshes and the rest reuse the new token
+            if self._credentials.valid and time.monotonic() - self._last_refresh < self._min_refresh_interval:
+                return
+            self._refresh(request)
+
+    def _refresh(self, request) -> None:
+        self._credentials.refresh(request or Request())
+        self._last_refresh = time.monotonic()
+        self.refresh_count += 1
+        if self._on_refresh:
+            try:
+                self._on_refresh(self._credentials)
+            except Exception as e:
+                print(f"Error saving refreshed credentials: {e}")
+
+
+class ServiceClient:
+    """Drive and Docs services sharing one private HTTP connection
+
+    With api_endpoint (e.g. a local drive_emulator), every request - including
+    upload and batch URLs - goes to that server instead of Google's.
+    """
+
+    def __init__(self, credentials: SharedCredentials, timeout: Optional[float] = None,
+                 api_endpoint: Optional[str] = None):
+        transport = httplib2.Http(timeout=timeout)
+        # Drive answers resumable upload chunks with "308 Resume Incomplete",
+        # which is not a redirect
+        transport.redirect_codes = transport.redirect_codes - {308}
+        http = AuthorizedHttp(credentials, http=transport)
+        self.drive = self._build('drive', 'v3', http, api_endpoint)
+        self.docs = self._build('docs', 'v1', http, api_endpoint)
+
+    @staticmethod
+    def _build(service: str, version: str, http, api_endpoint: Optional[str]):
+        if not api_endpoint:
+            return build(service, version, http=http, cache_discovery=False)
+        # Rewriting rootUrl (rather than client_options) also redirects
+        # media upload and batch URLs, which are derived from it
+        document = json.loads(discovery_cache.get_static_doc(service, version))
+        document['rootUrl'] = api_endpoint.rstrip('/') + '/'
+        return build_from_document(document, http=http)
+
+
+class ServiceClientPool:
+    """Bounded pool of service clients, each used by one thread at a time
+
+    httplib2 connections are not thread-safe, so every thread works with its
+    own client. acquire() returns the client bound to the calling thread,
+    binding an idle one (or creating one, up to max_clients) on first use.
+    release() returns it to the pool; clients bound to threads that have
+    exited are reclaimed automatically. A thread that finds every client in
+    use waits at most timeout seconds, then gets a TimeoutError rather than
+    hanging on a pool that a thread which never released its client has
+    exhausted.
+    """
+
+    def __init__(self, factory: Callable[[], Any], max_clients: Optional[int] = None,
+                 timeout: Optional[float] = None):
+        self.factory = factory
+        self.max_clients = max_clients or config.get('google.client_pool_size', 8)
+        self.timeout = config.get('google.client_pool_timeout', 120) if timeout is None else timeout
+        self._idle = []
+        self._bound: Dict[threading.Thread, Any] = {}
+        self._created = 0
+        self._condition = threading.Condition()
+
+    @property
+    def size(self) -> int:
+        """Number of clients created so far"""
+        with self._condition:
+            return self._created
+
+    def acquire(self) -> Any:
+        thread = threading.current_thread()
+        deadline = time.monotonic() + self.timeout
+        with self._condition:
+            while True:
+                client = self._bound.get(thread)
+                if client is not None:
+                    return client
+
+                self._reclaim()
+                if self._idle:
+                    client = self._idle.pop()
+                elif self._created < self.max_clients:
+                    self._created += 1
+                    break
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"No API client became free within {self.timeout:g}s "
+                                           f"(all {self.max_clients} in use)")
+                    # Wake up periodically to reclaim clients from exited threads
+                    self._condition.wait(timeout=min(remaining, 1.0))
+                    continue
+
+                self._bound[thread] = client
+                return client
+
+        # Build outside the lock; building a client parses discovery documents
+        try:
+            client = self.factory()
+        except Exception:
+            with self._condition:
+                self._created -= 1
+                self._condition.notify()
+            raise
+
+        with self._condition:
+            self._bound[thread] = client
+        return client
+
+    def release(self) -> None:
+        """Return the calling thread's client to the pool, if it has one"""
+        with self._condition:
+            client = self._bound.pop(threading.current_thread(), None)
+            if client is not None:
+                self._idle.append(client)
+                self._condition.notify()
+
+    def _reclaim(self) -> None:
+        for thread in [t for t in self._bound if not t.is_alive()]:
+            self._idle.append(self._bound.pop(thread))
+
+    def stats(self) -> Dict[str, int]:
+        with self._condition:
+            return {
+                'max_clients': self.max_clients,
+                'created': self._created,
+                'in_use': len(self._bound),
+                'idle': len(self._idle)
+            }
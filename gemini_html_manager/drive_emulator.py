@@ -0,0 +1,738 @@
+"""
+Local stand-in for the Drive v3 API, for tests and offline benchmarks
+"""
+import gzip
+import hashlib
+import json
+import random
+import re
+import secrets
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+from .config import config
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+GOOGLE_APPS_PREFIX = 'application/vnd.google-apps.'
+MAX_BATCH_SIZE = 100
+FAULT_SETTINGS = ('latency_ms', 'latency_jitter_ms', 'error_rate', 'rate_limit_rate', 'max_requests_per_second')
+PERMISSION_TYPES = ('user', 'group', 'domain', 'anyone')
+PERMISSION_ROLES = ('owner', 'organizer', 'fileOrganizer', 'writer', 'commenter', 'reader')
+EXPORT_MIME_TYPES = ('text/html',)
+
+# Fields returned when a request does not ask for specific ones
+DEFAULT_FILE_FIELDS = {'kind': None, 'id': None, 'name': None, 'mimeType': None}
+DEFAULT_PERMISSION_FIELDS = {'kind': None, 'id': None, 'type': None, 'role': None}
+
+Response = Tuple[int, Dict[str, str], bytes]
+
+_QUERY_CLAUSE = re.compile(
+    r"\s*(?:'(?P<parent>(?:[^'\\]|\\.)*)'\s+in\s+parents"
+    r"|(?P<field>name|mimeType|trashed)\s*(?P<op>!=|=|contains)\s*"
+    r"(?P<value>'(?:[^'\\]|\\.)*'|true|false))\s*"
+)
+
+
+class EmulatorError(Exception):
+    """An error response in the Drive API error format"""
+
+    def __init__(self, status: int, reason: str, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status = status
+        self.reason = reason
+        self.message = message
+        self.headers = headers or {}
+
+    def response(self) -> Response:
+        domain = 'usageLimits' if self.status in (403, 429) else 'global'
+        body = {'error': {'code': self.status, 'message': self.message,
+                          'errors': [{'domain': domain, 'reason': self.reason, 'message': self.message}]}}
+        return _json_response(self.status, body, self.headers)
+
+
+class DriveEmulator:
+    """In-memory Drive v3 server covering the calls GoogleWorkspaceManager makes
+
+    Implements files create/list/get/generateIds (including multipart, media
+    and resumable uploads, creates with a generated ID, and ranged
+    downloads), export of Docs as HTML, permissions
+    create/list, batch requests and the changes feed. Request bodies may be
+    gzip-compressed (Content-Encoding: gzip).
+    Each request can be delayed (latency_ms plus up to latency_jitter_ms) and
+    failed at random with a 500 (error_rate) or a 429 (rate_limit_rate), and
+    requests beyond max_requests_per_second get a 429 too. Point the manager at
+    it with google.api_endpoint.
+
+    GET /emulator/stats, POST /emulator/faults (JSON settings) and
+    POST /emulator/reset inspect and control a running emulator.
+    """
+
+    def __init__(self, host: Optional[str] = None, port: Optional[int] = None, seed: Optional[int] = None,
+                 **faults: Any):
+        self.host = host or config.get('emulator.host', '127.0.0.1')
+        self.port = config.get('emulator.port', 8765) if port is None else port
+        self.latency_ms = 0.0
+        self.latency_jitter_ms = 0.0
+        self.error_rate = 0.0
+        self.rate_limit_rate = 0.0
+        self.max_requests_per_second = 0
+        self.configure(**{name: config.get(f'emulator.{name}', 0) for name in FAULT_SETTINGS})
+        self.configure(**faults)
+        self._random = random.Random(config.get('emulator.seed') if seed is None else seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        self.reset()
+
+    def configure(self, **settings: Any) -> None:
+        """Change fault injection settings (see FAULT_SETTINGS)"""
+        for name, value in settings.items():
+            if name not in FAULT_SETTINGS:
+                raise ValueError(f"Unknown emulator setting '{name}' (available: {', '.join(FAULT_SETTINGS)})")
+            value = float(value or 0)
+            if value < 0 or (name.endswith('_rate') and value > 1):
+                raise ValueError(f"Invalid value for {name}: {value}")
+            setattr(self, name, value)
+
+    def reset(self) -> None:
+        """Drop all files, changes, upload sessions and statistics"""
+        with self._lock:
+            self._files: Dict[str, Dict[str, Any]] = {}
+            self._content: Dict[str, bytes] = {}
+            self._permissions: Dict[str, List[Dict[str, Any]]] = {}
+            self._changes: List[Dict[str, Any]] = []
+            self._sessions: Dict[str, Dict[str, Any]] = {}
+            self._window = (0, 0)
+            self._stats = {'requests': 0, 'batch_requests': 0, 'injected_errors': 0, 'rate_limited': 0,
+                           'received_bytes': 0, 'uploaded_bytes': 0, 'statuses': {}}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats, statuses=dict(self._stats['statuses']))
+            stats['files'] = len(self._files)
+            stats['open_upload_sessions'] = len(self._sessions)
+        stats['faults'] = {name: getattr(self, name) for name in FAULT_SETTINGS}
+        return stats
+
+    # Server lifecycle
+
+    @property
+    def url(self) -> str:
+        """Base URL to use as google.api_endpoint"""
+        return f"http://{self.host}:{self.port}/"
+
+    def start(self) -> str:
+        """Serve in a background thread and return the base URL"""
+        self._bind()
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={'poll_interval': 0.1},
+                                        name='drive-emulator', daemon=True)
+        self._thread.start()
+        return self.url
+
+    def serve_forever(self) -> None:
+        self._bind()
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _bind(self) -> None:
+        self._server = ThreadingHTTPServer((self.host, self.port), _RequestHandler)
+        self._server.daemon_threads = True
+        self._server.emulator = self
+        # Port 0 picks a free port
+        self.port = self._server.server_address[1]
+
+    # Request handling
+
+    def handle(self, method: str, target: str, headers: Dict[str, str], body: bytes) -> Response:
+        """Handle one HTTP request; header names must be lower case"""
+        self._delay()
+        return self._dispatch(method, target, headers, body)
+
+    def _dispatch(self, method: str, target: str, headers: Dict[str, str], body: bytes) -> Response:
+        url = urlsplit(target)
+        query = dict(parse_qsl(url.query, keep_blank_values=True))
+
+        for route_method, pattern, handler_name in ROUTES:
+            match = pattern.fullmatch(url.path)
+            if match and route_method == method:
+                break
+        else:
+            self._count(404)
+            return EmulatorError(404, 'notFound', f"No route for {method} {url.path}").response()
+
+        with self._lock:
+            self._stats['received_bytes'] += len(body)
+
+        try:
+            if not url.path.startswith(('/emulator/', '/batch')):
+                self._inject_fault()
+            if headers.get('content-encoding', '').lower() == 'gzip':
+                try:
+                    body = gzip.decompress(body)
+                except (OSError, EOFError):
+                    raise EmulatorError(400, 'badContent', 'Request body is not valid gzip')
+            request = _Request(method, url.path, query, headers, body)
+            response = getattr(self, handler_name)(request, **match.groupdict())
+        except EmulatorError as e:
+            response = e.response()
+        except (ValueError, KeyError) as e:
+            response = EmulatorError(400, 'badRequest', f"Bad request: {e}").response()
+        self._count(response[0])
+        return response
+
+    def _delay(self) -> None:
+        delay = self.latency_ms
+        if self.latency_jitter_ms:
+            with self._lock:
+                delay += self._random.uniform(0, self.latency_jitter_ms)
+        if delay:
+            time.sleep(delay / 1000)
+
+    def _inject_fault(self) -> None:
+        with self._lock:
+            second = int(time.monotonic())
+            window, count = self._window
+            count = count + 1 if window == second else 1
+            self._window = (second, count)
+            over_limit = self.max_requests_per_second and count > self.max_requests_per_second
+            roll = self._random.random()
+
+            if over_limit or roll < self.rate_limit_rate:
+                self._stats['rate_limited'] += 1
+                raise EmulatorError(429, 'rateLimitExceeded', 'Rate Limit Exceeded', {'Retry-After': '1'})
+            if roll < self.rate_limit_rate + self.error_rate:
+                self._stats['injected_errors'] += 1
+                raise EmulatorError(500, 'backendError', 'Backend Error')
+
+    def _count(self, status: int) -> None:
+        with self._lock:
+            self._stats['requests'] += 1
+            statuses = self._stats['statuses']
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    # Files
+
+    def _list_files(self, request: '_Request') -> Response:
+        matches = _compile_query(request.query.get('q', ''))
+        page_size = min(int(request.query.get('pageSize') or 100), 1000)
+        offset = int(request.query.get('pageToken') or 0)
+
+        with self._lock:
+            files = [resource for resource in self._files.values() if matches(resource)]
+
+        page = files[offset:offset + page_size]
+        result = {'kind': 'drive#fileList', 'incompleteSearch': False, 'files': page}
+        if offset + page_size < len(files):
+            result['nextPageToken'] = str(offset + page_size)
+
+        fields = request.fields({'kind': None, 'incompleteSearch': None, 'nextPageToken': None,
+                                 'files': DEFAULT_FILE_FIELDS})
+        return _json_response(200, _select(result, fields))
+
+    def _create_file(self, request: '_Request') -> Response:
+        metadata = json.loads(request.body or b'{}')
+        resource = self._store_file(metadata, None, None)
+        return _json_response(200, _select(resource, request.fields(DEFAULT_FILE_FIELDS)))
+
+    def _generate_ids(self, request: '_Request') -> Response:
+        count = min(int(request.query.get('count') or 10), 1000)
+        ids = [secrets.token_urlsafe(24) for _ in range(count)]
+        return _json_response(200, {'kind': 'drive#generatedIds', 'space': 'drive', 'ids': ids})
+
+    def _get_file(self, request: '_Request', file_id: str) -> Response:
+        resource = self._file(file_id)
+        if request.query.get('alt') == 'media':
+            if resource['mimeType'].startswith(GOOGLE_APPS_PREFIX):
+                raise EmulatorError(403, 'fileNotDownloadable',
+                                    'Only files with binary content can be downloaded. Use Export with Docs Editors files.')
+            return self._media_response(request, file_id, resource['mimeType'])
+        return _json_response(200, _select(resource, request.fields(DEFAULT_FILE_FIELDS)))
+
+    def _export_file(self, request: '_Request', file_id: str) -> Response:
+        resource = self._file(file_id)
+        if resource['mimeType'] != 'application/vnd.google-apps.document':
+            raise EmulatorError(403, 'fileNotExportable', 'Export only supports Docs Editors files.')
+        if request.query.get('mimeType') not in EXPORT_MIME_TYPES:
+            raise EmulatorError(400, 'badRequest', f"Unsupported export mimeType: {request.query.get('mimeType')}")
+        # Documents are stored as the HTML they were converted from
+        return self._media_response(request, file_id, request.query['mimeType'])
+
+    def _media_response(self, request: '_Request', file_id: str, mime_type: str) -> Response:
+        """File content, or the part of it asked for with a Range header"""
+        with self._lock:
+            content = self._content.get(file_id, b'')
+
+        match = re.fullmatch(r'bytes=(\d+)-(\d*)', request.headers.get('range', '').strip())
+        if not match:
+            return 200, {'Content-Type': mime_type}, content
+
+        start = int(match.group(1))
+        end = min(int(match.group(2)) if match.group(2) else len(content) - 1, len(content) - 1)
+        if start >= len(content):
+            return 416, {'Content-Range': f"bytes */{len(content)}"}, b''
+        return 206, {'Content-Type': mime_type, 'Content-Range': f"bytes {start}-{end}/{len(content)}"}, \
+            content[start:end + 1]
+
+    def _file(self, file_id: str) -> Dict[str, Any]:
+        with self._lock:
+            resource = self._files.get(file_id)
+        if resource is None:
+            raise EmulatorError(404, 'notFound', f"File not found: {file_id}.")
+        return resource
+
+    def _store_file(self, metadata: Dict[str, Any], content: Optional[bytes],
+                    content_type: Optional[str]) -> Dict[str, Any]:
+        file_id = metadata.get('id') or secrets.token_urlsafe(24)
+        mime_type = metadata.get('mimeType') or content_type or 'application/octet-stream'
+        now = _timestamp()
+        resource = {
+            'kind': 'drive#file',
+            'id': file_id,
+            'name': metadata.get('name', 'Untitled'),
+            'mimeType': mime_type,
+            'parents': list(metadata.get('parents') or ['root']),
+            'trashed': bool(metadata.get('trashed', False)),
+            'createdTime': now,
+            'modifiedTime': now,
+            'webViewLink': _view_link(file_id, mime_type)
+        }
+        if 'description' in metadata:
+            resource['description'] = metadata['description']
+        if content is not None and not mime_type.startswith(GOOGLE_APPS_PREFIX):
+            resource['size'] = str(len(content))
+            resource['md5Checksum'] = hashlib.md5(content).hexdigest()
+            resource['webContentLink'] = f"https://drive.google.com/uc?id={file_id}&export=download"
+
+        with self._lock:
+            if file_id in self._files:
+                raise EmulatorError(409, 'fileIdInUse', 'A file already exists with the provided ID.')
+            self._files[file_id] = resource
+            if content is not None:
+                self._content[file_id] = content
+                self._stats['uploaded_bytes'] += len(content)
+            self._record_change(resource)
+        return resource
+
+    def _record_change(self, resource: Dict[str, Any]) -> None:
+        self._changes.append({'kind': 'drive#change', 'changeType': 'file', 'type': 'file',
+                              'fileId': resource['id'], 'time': _timestamp(), 'removed': False,
+                              'file': resource})
+
+    # Uploads
+
+    def _upload(self, request: '_Request') -> Response:
+        upload_type = request.query.get('uploadType')
+        content_type = request.headers.get('content-type', 'application/octet-stream')
+
+        if upload_type == 'media':
+            resource = self._store_file({}, request.body, content_type.split(';')[0])
+        elif upload_type == 'multipart':
+            parts = _split_multipart(request.body, content_type)
+            if len(parts) != 2:
+                raise EmulatorError(400, 'badContent', 'Multipart upload needs a metadata and a media part')
+            (_, metadata), (media_headers, content) = parts
+            resource = self._store_file(json.loads(metadata or b'{}'), content,
+                                        media_headers.get('content-type', 'application/octet-stream'))
+        elif upload_type == 'resumable':
+            return self._start_resumable_upload(request)
+        else:
+            raise EmulatorError(400, 'invalidParameter', f"Invalid uploadType: {upload_type}")
+
+        return _json_response(200, _select(resource, request.fields(DEFAULT_FILE_FIELDS)))
+
+    def _start_resumable_upload(self, request: '_Request') -> Response:
+        upload_id = secrets.token_urlsafe(16)
+        total = request.headers.get('x-upload-content-length')
+        session = {
+            'metadata': json.loads(request.body or b'{}'),
+            'content_type': request.headers.get('x-upload-content-type', 'application/octet-stream'),
+            'total': int(total) if total else None,
+            'fields': request.query.get('fields'),
+            'data': bytearray()
+        }
+        with self._lock:
+            self._sessions[upload_id] = session
+
+        host = request.headers.get('host', f"{self.host}:{self.port}")
+        location = f"http://{host}{request.path}?uploadType=resumable&upload_id={upload_id}"
+        return 200, {'Location': location, 'Content-Length': '0'}, b''
+
+    def _upload_chunk(self, request: '_Request') -> Response:
+        upload_id = request.query.get('upload_id', '')
+        with self._lock:
+            session = self._sessions.get(upload_id)
+        if session is None:
+            raise EmulatorError(404, 'notFound', f"Upload session not found: {upload_id}")
+
+        data = session['data']
+        content_range = request.headers.get('content-range', '')
+        match = re.fullmatch(r'bytes (?:(\d+)-(\d+)|\*)/(\d+|\*)', content_range.strip())
+        if content_range and not match:
+            raise EmulatorError(400, 'badRequest', f"Invalid Content-Range: {content_range}")
+
+        if match:
+            start, end, total = match.groups()
+            if total != '*':
+                session['total'] = int(total)
+            # A chunk that does not continue where the upload stands is
+            # ignored; the 308 tells the client where to resume
+            if start is not None and int(start) == len(data):
+                data.extend(request.body[:int(end) - int(start) + 1])
+        else:
+            # No Content-Range: the body is the whole (possibly empty) file
+            data.extend(request.body)
+            session['total'] = len(data)
+
+        if session['total'] is not None and len(data) >= session['total']:
+            with self._lock:
+                self._sessions.pop(upload_id, None)
+            resource = self._store_file(session['metadata'], bytes(data), session['content_type'])
+            fields = _parse_fields(session['fields']) if session['fields'] else DEFAULT_FILE_FIELDS
+            return _json_response(200, _select(resource, fields))
+
+        headers = {'Content-Length': '0'}
+        if data:
+            headers['Range'] = f"bytes=0-{len(data) - 1}"
+        return 308, headers, b''
+
+    # Permissions
+
+    def _create_permission(self, request: '_Request', file_id: str) -> Response:
+        resource = self._file(file_id)
+        body = json.loads(request.body or b'{}')
+        if body.get('type') not in PERMISSION_TYPES:
+            raise EmulatorError(400, 'invalidSharingRequest', f"Invalid permission type: {body.get('type')}")
+        if body.get('role') not in PERMISSION_ROLES:
+            raise EmulatorError(400, 'invalidSharingRequest', f"Invalid permission role: {body.get('role')}")
+
+        permission = dict(body, kind='drive#permission')
+        permission['id'] = 'anyoneWithLink' if body['type'] == 'anyone' else secrets.token_hex(10)
+        with self._lock:
+            permissions = self._permissions.setdefault(file_id, [])
+            permissions[:] = [existing for existing in permissions if existing['id'] != permission['id']]
+            permissions.append(permission)
+            resource['modifiedTime'] = _timestamp()
+            self._record_change(resource)
+        return _json_response(200, _select(permission, request.fields(DEFAULT_PERMISSION_FIELDS)))
+
+    def _list_permissions(self, request: '_Request', file_id: str) -> Response:
+        self._file(file_id)
+        with self._lock:
+            permissions = list(self._permissions.get(file_id, []))
+        result = {'kind': 'drive#permissionList', 'permissions': permissions}
+        return _json_response(200, _select(result, request.fields({'kind': None,
+                                                                   'permissions': DEFAULT_PERMISSION_FIELDS})))
+
+    # Changes feed
+
+    def _start_page_token(self, request: '_Request') -> Response:
+        with self._lock:
+            token = str(len(self._changes) + 1)
+        return _json_response(200, {'kind': 'drive#startPageToken', 'startPageToken': token})
+
+    def _list_changes(self, request: '_Request') -> Response:
+        if 'pageToken' not in request.query:
+            raise EmulatorError(400, 'required', 'Required parameter: pageToken')
+        start = max(int(request.query['pageToken']) - 1, 0)
+        page_size = min(int(request.query.get('pageSize') or 100), 1000)
+
+        with self._lock:
+            changes = self._changes[start:start + page_size]
+            end = start + len(changes)
+            more = end < len(self._changes)
+
+        result = {'kind': 'drive#changeList', 'changes': changes}
+        if more:
+            result['nextPageToken'] = str(end + 1)
+        else:
+            result['newStartPageToken'] = str(end + 1)
+        return _json_response(200, _select(result, request.fields(None)))
+
+    # Batch requests
+
+    def _batch(self, request: '_Request') -> Response:
+        parts = _split_multipart(request.body, request.headers.get('content-type', ''))
+        if len(parts) > MAX_BATCH_SIZE:
+            raise EmulatorError(400, 'batchSizeTooLarge', f"A batch can contain at most {MAX_BATCH_SIZE} calls")
+        with self._lock:
+            self._stats['batch_requests'] += 1
+
+        boundary = f"batch_{secrets.token_hex(12)}"
+        output = []
+        for part_headers, payload in parts:
+            method, target, headers, body = _parse_http_request(payload)
+            headers.setdefault('host', request.headers.get('host', ''))
+            status, response_headers, content = self._dispatch(method, target, headers, body)
+
+            content_id = part_headers.get('content-id', '').strip('<>')
+            lines = [f"--{boundary}", 'Content-Type: application/http',
+                     f"Content-ID: <response-{content_id}>", '',
+                     f"HTTP/1.1 {status} {_REASONS.get(status, 'Unknown')}"]
+            lines.extend(f"{name}: {value}" for name, value in response_headers.items())
+            lines.extend(['', content.decode('utf-8')])
+            output.append('\r\n'.join(lines))
+        output.append(f"--{boundary}--\r\n")
+
+        return 200, {'Content-Type': f'multipart/mixed; boundary={boundary}'}, '\r\n'.join(output).encode('utf-8')
+
+    # Control endpoints
+
+    def _get_stats(self, request: '_Request') -> Response:
+        return _json_response(200, self.stats())
+
+    def _set_faults(self, request: '_Request') -> Response:
+        try:
+            self.configure(**json.loads(request.body or b'{}'))
+        except (TypeError, ValueError) as e:
+            raise EmulatorError(400, 'invalidParameter', str(e))
+        return _json_response(200, self.stats()['faults'])
+
+    def _reset(self, request: '_Request') -> Response:
+        self.reset()
+        return _json_response(200, {'reset': True})
+
+
+ROUTES = [(method, re.compile(pattern), handler) for method, pattern, handler in (
+    ('GET', r'/drive/v3/files', '_list_files'),
+    ('POST', r'/drive/v3/files', '_create_file'),
+    ('GET', r'/drive/v3/files/generateIds', '_generate_ids'),
+    ('GET', r'/drive/v3/files/(?P<file_id>[\w-]+)', '_get_file'),
+    ('GET', r'/drive/v3/files/(?P<file_id>[\w-]+)/export', '_export_file'),
+    ('POST', r'/drive/v3/files/(?P<file_id>[\w-]+)/permissions', '_create_permission'),
+    ('GET', r'/drive/v3/files/(?P<file_id>[\w-]+)/permissions', '_list_permissions'),
+    ('POST', r'/(?:resumable/)?upload/drive/v3/files', '_upload'),
+    ('PUT', r'/(?:resumable/)?upload/drive/v3/files', '_upload_chunk'),
+    ('GET', r'/drive/v3/changes/startPageToken', '_start_page_token'),
+    ('GET', r'/drive/v3/changes', '_list_changes'),
+    ('POST', r'/batch(?:/drive/v3)?', '_batch'),
+    ('GET', r'/emulator/stats', '_get_stats'),
+    ('POST', r'/emulator/faults', '_set_faults'),
+    ('POST', r'/emulator/reset', '_reset'),
+)]
+
+_REASONS = {200: 'OK', 206: 'Partial Content', 308: 'Resume Incomplete', 400: 'Bad Request', 403: 'Forbidden',
+            404: 'Not Found', 416: 'Range Not Satisfiable', 429: 'Too Many Requests', 500: 'Internal Server Error'}
+
+
+class _Request:
+    """A parsed request as seen by the emulator's route handlers"""
+
+    def __init__(self, method: str, path: str, query: Dict[str, str], headers: Dict[str, str], body: bytes):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+
+    def fields(self, default: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Parsed fields= selection, or default when the request has none"""
+        spec = self.query.get('fields')
+        return _parse_fields(spec) if spec else default
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'DriveEmulator/1.0'
+    # Send headers and body in one segment; otherwise Nagle's algorithm and
+    # delayed ACKs add ~40ms to every keep-alive request
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def _handle(self) -> None:
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        headers = {name.lower(): value for name, value in self.headers.items()}
+
+        status, response_headers, payload = self.server.emulator.handle(self.command, self.path, headers, body)
+
+        self.send_response(status, _REASONS.get(status))
+        for name, value in response_headers.items():
+            if name.lower() != 'content-length':
+                self.send_header(name, value)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _handle
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if config.get('emulator.log_requests', False):
+            super().log_message(format, *args)
+
+
+def _json_response(status: int, data: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+    response_headers = {'Content-Type': 'application/json; charset=UTF-8'}
+    response_headers.update(headers or {})
+    return status, response_headers, json.dumps(data).encode('utf-8')
+
+
+def _timestamp() -> str:
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+def _view_link(file_id: str, mime_type: str) -> str:
+    if mime_type == 'application/vnd.google-apps.document':
+        return f"https://docs.google.com/document/d/{file_id}/edit?usp=drivesdk"
+    if mime_type == FOLDER_MIME_TYPE:
+        return f"https://drive.google.com/drive/folders/{file_id}"
+    return f"https://drive.google.com/file/d/{file_id}/view?usp=drivesdk"
+
+
+def _parse_fields(spec: str) -> Dict[str, Any]:
+    """Parse a fields= selection such as 'files(id, name),nextPageToken'
+
+    Returns {field: None} for plain fields and {field: {...}} for nested
+    selections.
+    """
+    position = 0
+
+    def parse_group() -> Dict[str, Any]:
+        nonlocal position
+        selection = {}
+        name = ''
+        while position < len(spec):
+            char = spec[position]
+            position += 1
+            if char == '(':
+                selection[name.strip()] = parse_group()
+                name = ''
+            elif char == ')':
+                break
+            elif char == ',':
+                if name.strip():
+                    selection[name.strip()] = None
+                name = ''
+            else:
+                name += char
+        if name.strip():
+            selection[name.strip()] = None
+        return selection
+
+    return parse_group()
+
+
+def _select(data: Any, selection: Optional[Dict[str, Any]]) -> Any:
+    """Apply a parsed fields selection to a response"""
+    if selection is None or '*' in selection:
+        return data
+    if isinstance(data, list):
+        return [_select(item, selection) for item in data]
+    if not isinstance(data, dict):
+        return data
+    return {name: _select(data[name], nested) for name, nested in selection.items() if name in data}
+
+
+def _compile_query(query: str) -> Callable[[Dict[str, Any]], bool]:
+    """Predicate for the subset of the Drive query language the manager uses
+
+    Supports "'<id>' in parents", name/mimeType with = != or contains, and
+    trashed = true/false, joined with 'and'.
+    """
+    predicates = []
+    position = 0
+    while query[position:].strip():
+        match = _QUERY_CLAUSE.match(query, position)
+        if not match:
+            raise EmulatorError(400, 'invalid', f"Invalid Value: unsupported query near {query[position:]!r}")
+        position = match.end()
+        predicates.append(_clause_predicate(match))
+
+        rest = query[position:]
+        connector = re.match(r'and\b\s*', rest, re.IGNORECASE)
+        if connector:
+            position += connector.end()
+        elif rest.strip():
+            raise EmulatorError(400, 'invalid', f"Invalid Value: expected 'and' near {rest!r}")
+
+    return lambda resource: all(predicate(resource) for predicate in predicates)
+
+
+def _clause_predicate(match: 're.Match') -> Callable[[Dict[str, Any]], bool]:
+    if match.group('parent') is not None:
+        parent = _unquote(match.group('parent'))
+        return lambda resource: parent in resource.get('parents', [])
+
+    field, operator, value = match.group('field'), match.group('op'), match.group('value')
+    if field == 'trashed':
+        if operator == 'contains' or value not in ('true', 'false'):
+            raise EmulatorError(400, 'invalid', f"Invalid Value: {match.group(0).strip()}")
+        expected = value == 'true'
+        return lambda resource: resource.get('trashed', False) == (expected if operator == '=' else not expected)
+
+    if not value.startswith("'"):
+        raise EmulatorError(400, 'invalid', f"Invalid Value: {match.group(0).strip()}")
+    value = _unquote(value[1:-1])
+    if operator == 'contains':
+        return lambda resource: value.lower() in resource.get(field, '').lower()
+    if operator == '!=':
+        return lambda resource: resource.get(field) != value
+    return lambda resource: resource.get(field) == value
+
+
+def _unquote(value: str) -> str:
+    return re.sub(r'\\(.)', r'\1', value)
+
+
+def _split_multipart(body: bytes, content_type: str) -> List[Tuple[Dict[str, str], bytes]]:
+    """Split a multipart body into (headers, payload) pairs; header names are lower case"""
+    match = re.search(r'boundary="?([^";]+)"?', content_type)
+    if not match:
+        raise EmulatorError(400, 'badContent', 'Missing multipart boundary')
+    delimiter = b'--' + match.group(1).encode('latin-1')
+
+    parts = []
+    for chunk in body.split(delimiter)[1:]:
+        if chunk.startswith(b'--'):
+            break
+        # The line break after the delimiter and the one before the next
+        # delimiter belong to the delimiters, not to the part
+        chunk = chunk[2:] if chunk.startswith(b'\r\n') else chunk[1:] if chunk.startswith(b'\n') else chunk
+        chunk = chunk[:-2] if chunk.endswith(b'\r\n') else chunk[:-1] if chunk.endswith(b'\n') else chunk
+        headers, payload = _split_head(chunk)
+        parts.append((headers, payload))
+    return parts
+
+
+def _split_head(message: bytes) -> Tuple[Dict[str, str], bytes]:
+    """Split header lines from the body at the first blank line"""
+    crlf, lf = message.find(b'\r\n\r\n'), message.find(b'\n\n')
+    if crlf == -1 and lf == -1:
+        head, body = message, b''
+    elif lf == -1 or (crlf != -1 and crlf < lf):
+        head, body = message[:crlf], message[crlf + 4:]
+    else:
+        head, body = message[:lf], message[lf + 2:]
+
+    headers = {}
+    for line in head.decode('latin-1').splitlines():
+        name, separator, value = line.partition(':')
+        if separator:
+            headers[name.strip().lower()] = value.strip()
+    return headers, body
+
+
+def _parse_http_request(payload: bytes) -> Tuple[str, str, Dict[str, str], bytes]:
+    """Parse an application/http batch part into method, target, headers and body"""
+    request_line, _, rest = payload.partition(b'\n')
+    try:
+        method, target, _ = request_line.decode('latin-1').strip().split(' ', 2)
+    except ValueError:
+        raise EmulatorError(400, 'badContent', f"Invalid batch request line: {request_line[:100]!r}")
+    headers, body = _split_head(rest)
+    if 'content-length' in headers:
+        body = body[:int(headers['content-length'])]
+    return method, target, headers, body
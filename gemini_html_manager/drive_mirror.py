@@ -0,0 +1,223 @@
+"""
+Parallel mirror of the Drive exports folder into the local export directory
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Optional
+from .config import config
+from .file_manager import HTMLFileManager
+from .google_workspace import GoogleWorkspaceManager, GOOGLE_DOC_MIME_TYPE
+from . import storage
+
+MANIFEST_FILE = '.drive_mirror.json'
+
+
+class _HashingWriter:
+    """Binary file wrapper that computes the MD5 of everything written"""
+
+    def __init__(self, file):
+        self.file = file
+        self.md5 = hashlib.md5()
+        self.bytes_written = 0
+
+    def write(self, data: bytes) -> int:
+        self.md5.update(data)
+        self.bytes_written += len(data)
+        return self.file.write(data)
+
+
+class DriveMirror:
+    """Pulls every file in the Drive exports folder into the export directory
+
+    A pool of workers downloads files concurrently, each streaming into a
+    temporary file in chunks; Google Docs are exported as HTML. Finished
+    downloads are imported with HTMLFileManager.import_html_file(), so storage
+    compression, layout and optimize-on-import apply and the catalog picks
+    them up on its next refresh.
+
+    A file is skipped when a local file of the same name already has the MD5
+    Drive reports, or when the manifest (.drive_mirror.json in the export
+    directory) shows it was pulled before and has not changed in Drive since.
+    Docs have no checksum, so their modifiedTime is compared instead.
+
+    Drive allows several files of one name; each keeps its own local file,
+    the later ones named with their Drive ID appended (see local_filename()).
+    """
+
+    def __init__(self, workspace_manager: GoogleWorkspaceManager, file_manager: HTMLFileManager,
+                 workers: Optional[int] = None, chunk_size: Optional[int] = None):
+        self.workspace_manager = workspace_manager
+        self.file_manager = file_manager
+        self.workers = workers or config.get('mirror.workers', 4)
+        self.chunk_size = chunk_size or config.get('mirror.chunk_size', 1048576)
+        self.supported_extensions = config.get('html_manager.supported_extensions', ['.html', '.htm'])
+        self.manifest_path = os.path.join(file_manager.export_directory, MANIFEST_FILE)
+        self._manifest: Dict[str, Dict[str, str]] = {}
+        self._claimed: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def pull(self, progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+             should_stop: Optional[Callable[[], bool]] = None,
+             on_total: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+        """Mirror the folder and return counts, bytes and throughput
+
+        on_total(count) is called once the folder has been listed, and
+        progress(item) (from one thread at a time) as each file finishes;
+        should_stop() is checked before each download starts.
+        """
+        start = time.perf_counter()
+        self._manifest = self._load_manifest()
+        self._claimed = {pulled['filename']: drive_id for drive_id, pulled in self._manifest.items()}
+
+        folder_id = self.workspace_manager.get_or_create_gemini_folder()
+        files = [file_info for file_info in self.workspace_manager.iter_folder_files(folder_id)
+                 if self.is_mirrored(file_info)]
+        if on_total:
+            on_total(len(files))
+
+        items = []
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='drive-mirror') as executor:
+            futures = [executor.submit(self._pull_file, file_info, should_stop) for file_info in files]
+            for future in as_completed(futures):
+                item = future.result()
+                items.append(item)
+                if progress:
+                    progress(item)
+
+        self._save_manifest()
+        elapsed = time.perf_counter() - start
+        downloaded_bytes = sum(item.get('bytes', 0) for item in items)
+
+        return {
+            'total_files': len(files),
+            'downloaded': sum(1 for item in items if item['status'] == 'downloaded'),
+            'skipped': sum(1 for item in items if item['status'] == 'skipped'),
+            'failed': sum(1 for item in items if item['status'] == 'failed'),
+            'cancelled': sum(1 for item in items if item['status'] == 'cancelled'),
+            'bytes': downloaded_bytes,
+            'seconds': round(elapsed, 3),
+            'files_per_second': round(len(items) / elapsed, 2) if elapsed else 0.0,
+            'mb_per_second': round(downloaded_bytes / (1024 * 1024) / elapsed, 3) if elapsed else 0.0
+        }
+
+    def is_mirrored(self, file_info: Dict[str, Any]) -> bool:
+        """Whether a Drive file is pulled: Google Docs and HTML files"""
+        if file_info.get('mimeType') == GOOGLE_DOC_MIME_TYPE:
+            return True
+        name = file_info.get('name', '').lower()
+        return file_info.get('mimeType') == 'text/html' or any(name.endswith(ext) for ext in self.supported_extensions)
+
+    def local_filename(self, file_info: Dict[str, Any]) -> str:
+        """Name a Drive file is stored under locally
+
+        The name it was last pulled under, else its Drive name, unless another
+        Drive file already has that name locally; then the file's ID is
+        appended, so the name stays the same from one pull to the next.
+        """
+        drive_id = file_info['id']
+        with self._lock:
+            pulled = self._manifest.get(drive_id)
+        if pulled and self.file_manager.resolve_path(pulled['filename']):
+            return pulled['filename']
+
+        name = file_info['name'].replace('/', '_').replace('\\', '_').strip() or drive_id
+        if not any(name.lower().endswith(ext) for ext in self.supported_extensions):
+            name += '.html'
+        with self._lock:
+            if self._claimed.setdefault(name, drive_id) != drive_id:
+                stem, ext = os.path.splitext(name)
+                name = f"{stem}_{drive_id}{ext}"
+                self._claimed[name] = drive_id
+        return name
+
+    def _pull_file(self, file_info: Dict[str, Any], should_stop: Optional[Callable[[], bool]]) -> Dict[str, Any]:
+        filename = self.local_filename(file_info)
+        item = {'filename': filename, 'drive_id': file_info['id'], 'mime_type': file_info.get('mimeType')}
+
+        if should_stop and should_stop():
+            return dict(item, status='cancelled')
+
+        current = self._current_local_file(file_info, filename)
+        if current:
+            self._remember(file_info, current)
+            return dict(item, status='skipped', filename=current)
+
+        temp_path = None
+        try:
+            with tempfile.NamedTemporaryFile(suffix='.html', delete=False) as temp_file:
+                temp_path = temp_file.name
+                writer = _HashingWriter(temp_file)
+                self.workspace_manager.download_file(file_info, writer, self.chunk_size)
+
+            expected = file_info.get('md5Checksum')
+            if expected and writer.md5.hexdigest() != expected:
+                raise ValueError(f"Checksum mismatch (expected {expected}, got {writer.md5.hexdigest()})")
+
+            # A changed Drive file becomes a new version of its local copy, but
+            # never replaces a local file that belongs to something else
+            with self._lock:
+                pulled = self._manifest.get(file_info['id'])
+            ours = bool(pulled) and pulled['filename'] == filename
+            destination = self.file_manager.import_html_file(temp_path, filename, version_history=ours)
+            if not destination:
+                raise ValueError('Import failed')
+
+            stored_name = storage.logical_filename(destination)
+            self._remember(file_info, stored_name)
+            return dict(item, status='downloaded', filename=stored_name, bytes=writer.bytes_written)
+
+        except Exception as e:
+            print(f"Error pulling {file_info.get('name')} from Google Drive: {e}")
+            return dict(item, status='failed', error=str(e))
+
+        finally:
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+            self.workspace_manager.release_client()
+
+    def _current_local_file(self, file_info: Dict[str, Any], filename: str) -> Optional[str]:
+        """Name of a local file already holding this Drive file's content, if any"""
+        with self._lock:
+            pulled = self._manifest.get(file_info['id'])
+        if (pulled and pulled.get('version') == self._version(file_info)
+                and self.file_manager.resolve_path(pulled['filename'])):
+            return pulled['filename']
+
+        local_path = self.file_manager.resolve_path(filename)
+        expected = file_info.get('md5Checksum')
+        if local_path and expected and self.file_manager.calculate_checksum(local_path) == expected:
+            return filename
+        return None
+
+    @staticmethod
+    def _version(file_info: Dict[str, Any]) -> str:
+        return file_info.get('md5Checksum') or file_info.get('modifiedTime', '')
+
+    def _remember(self, file_info: Dict[str, Any], filename: str) -> None:
+        with self._lock:
+            self._manifest[file_info['id']] = {'filename': filename, 'version': self._version(file_info)}
+
+    def _load_manifest(self) -> Dict[str, Dict[str, str]]:
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"Error reading mirror manifest: {e}")
+            return {}
+
+    def _save_manifest(self) -> None:
+        with self._lock:
+            manifest = dict(self._manifest)
+        try:
+            with open(self.manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2, sort_keys=True)
+            os.replace(self.manifest_path + '.tmp', self.manifest_path)
+        except Exception as e:
+            print(f"Error saving mirror manifest: {e}")
@@ -0,0 +1,145 @@
+"""
+Server-Sent Events for catalog changes, dashboard stats and job progress
+"""
+import json
+import queue
+import threading
+from typing import Any, Dict, Iterator, Optional
+from .catalog import Catalog
+from .config import config
+
+
+class EventBroker:
+    """Fans published events out to every connected subscriber"""
+
+    def __init__(self, max_subscribers: Optional[int] = None, queue_size: int = 100):
+        self.max_subscribers = max_subscribers or config.get('events.max_connections', 50)
+        self.queue_size = queue_size
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def subscribe(self) -> Optional[queue.Queue]:
+        """Register a subscriber, or return None when the connection limit is reached"""
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            subscriber = queue.Queue(maxsize=self.queue_size)
+            self._subscribers.append(subscriber)
+            return subscriber
+
+    def unsubscribe(self, subscriber: queue.Queue) -> None:
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def publish(self, event_type: str, data: Dict[str, Any]) -> None:
+        """Send an event to all subscribers; slow subscribers lose their oldest events"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+
+        for subscriber in subscribers:
+            while True:
+                try:
+                    subscriber.put_nowait((event_type, data))
+                    break
+                except queue.Full:
+                    try:
+                        subscriber.get_nowait()
+                    except queue.Empty:
+                        pass
+
+
+def format_event(event_type: str, data: Dict[str, Any]) -> str:
+    """Format an event in the text/event-stream wire format"""
+    return f"event: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def stream_events(broker: EventBroker, subscriber: queue.Queue,
+                  initial_events=(), keepalive: Optional[float] = None) -> Iterator[str]:
+    """Yield SSE messages for a subscriber until the client disconnects"""
+    keepalive = keepalive or config.get('events.keepalive_seconds', 15)
+
+    try:
+        yield f"retry: {int(keepalive * 1000)}\n\n"
+        for event_type, data in initial_events:
+            yield format_event(event_type, data)
+
+        while True:
+            try:
+                event_type, data = subscriber.get(timeout=keepalive)
+            except queue.Empty:
+                # Comment line keeps proxies from closing an idle connection
+                yield ": keepalive\n\n"
+                continue
+            yield format_event(event_type, data)
+    finally:
+        broker.unsubscribe(subscriber)
+
+
+def file_summary(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """The fields of a catalog entry sent with file events"""
+    return {
+        'filename': metadata.get('filename'),
+        'title': metadata.get('title'),
+        'size_mb': metadata.get('size_mb'),
+        'created_time': metadata.get('created_time'),
+        'is_gemini_canvas': metadata.get('is_gemini_canvas'),
+        'has_images': metadata.get('has_images')
+    }
+
+
+class CatalogWatcher:
+    """Background thread that refreshes the catalog and publishes what changed
+
+    The directory is only rescanned while at least one client is connected.
+    notify() triggers an immediate rescan, e.g. after an upload.
+    """
+
+    def __init__(self, catalog: Catalog, broker: EventBroker, interval: Optional[float] = None):
+        self.catalog = catalog
+        self.broker = broker
+        self.interval = interval or config.get('events.poll_interval_seconds', 5)
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        catalog.add_listener(self.publish_changes)
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='catalog-watcher', daemon=True)
+                self._thread.start()
+
+    def notify(self) -> None:
+        """Rescan as soon as possible"""
+        self._wakeup.set()
+
+    def publish_changes(self, changes: Dict[str, Any]) -> None:
+        """Publish file events and updated stats for a catalog refresh"""
+        for kind in ('added', 'changed', 'removed'):
+            for metadata in changes[kind]:
+                self.broker.publish(f"file_{kind}", file_summary(metadata))
+
+        self.broker.publish('stats', self.current_stats())
+
+    def current_stats(self) -> Dict[str, Any]:
+        stats = self.catalog.stats()
+        stats['generation'] = self.catalog.generation
+        return stats
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+            if not self.broker.subscriber_count:
+                continue
+            try:
+                self.catalog.refresh()
+            except Exception as e:
+                print(f"Error watching export directory: {e}")
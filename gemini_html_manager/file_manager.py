@@ -2,14 +2,131 @@
 HTML file management utilities
 """
 import os
+import io
+import json
 import shutil
-import glob
-from typing import List, Dict, Optional, Any
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Any, Iterator, Tuple
 from datetime import datetime
 import hashlib
 from bs4 import BeautifulSoup
 import html2text
 from .config import config
+from . import storage
+from . import optimizer
+from .versions import VersionStore
+
+# Subdirectory of the export directory holding pre-optimization originals
+ORIGINALS_DIRECTORY = '.originals'
+OPTIMIZATION_MANIFEST = 'optimization.json'
+
+# Metadata fields, split by what it takes to compute them
+STAT_FIELDS = ('filename', 'path', 'size_bytes', 'size_mb', 'created_time', 'modified_time')
+HTML_FIELDS = ('title', 'description', 'word_count', 'has_images', 'has_links', 'is_gemini_canvas')
+METADATA_FIELDS = STAT_FIELDS + ('checksum', 'bytes_saved') + HTML_FIELDS
+
+# Imports of the same name into the same directory take turns, so they
+# neither pick the same free name nor version the same file at once.
+# Entries are [lock, number of imports holding or waiting for it].
+_import_locks: Dict[Tuple[str, str], list] = {}
+_import_locks_lock = threading.Lock()
+
+
+@contextmanager
+def _import_lock(export_directory: str, filename: str) -> Iterator[None]:
+    key = (os.path.abspath(export_directory), filename)
+    with _import_locks_lock:
+        entry = _import_locks.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _import_locks_lock:
+            entry[1] -= 1
+            if not entry[1]:
+                del _import_locks[key]
+
+
+class HTMLFileRecord:
+    """Lightweight catalog entry for an HTML file
+
+    Cheap fields come straight from the directory scan's stat result; the
+    checksum and HTML metadata are only computed on first access.
+    """
+
+    __slots__ = ('filename', 'path', 'compression', 'size_bytes', 'created_timestamp',
+                 'modified_timestamp', 'modified_ns', '_manager', '_checksum', '_html_metadata', '_text')
+
+    def __init__(self, manager: 'HTMLFileManager', path: str, stat: os.stat_result):
+        self.filename = storage.logical_filename(path)
+        self.path = path
+        self.compression = storage.compression_of(path)
+        self.size_bytes = stat.st_size
+        self.created_timestamp = stat.st_ctime
+        self.modified_timestamp = stat.st_mtime
+        self.modified_ns = stat.st_mtime_ns
+        self._manager = manager
+        self._checksum = None
+        self._html_metadata = None
+        self._text = None
+
+    @property
+    def size_mb(self) -> float:
+        return round(self.size_bytes / (1024 * 1024), 2)
+
+    @property
+    def created_time(self) -> str:
+        return datetime.fromtimestamp(self.created_timestamp).isoformat()
+
+    @property
+    def modified_time(self) -> str:
+        return datetime.fromtimestamp(self.modified_timestamp).isoformat()
+
+    @property
+    def checksum(self) -> str:
+        """MD5 checksum, calculated on first access"""
+        if self._checksum is None:
+            self._checksum = self._manager.calculate_checksum(self.path)
+        return self._checksum
+
+    @property
+    def html_metadata(self) -> Dict[str, Any]:
+        """Parsed HTML metadata, extracted on first access"""
+        if self._html_metadata is None:
+            self._html_metadata, self._text = self._manager.extract_html_content(self.path)
+        return self._html_metadata
+    
+    @property
+    def text(self) -> str:
+        """Plain text content, extracted together with the HTML metadata"""
+        if self._text is None:
+            self._html_metadata, self._text = self._manager.extract_html_content(self.path)
+        return self._text
+
+    def to_dict(self, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Metadata dict, as returned by get_file_metadata()
+
+        With fields, only those keys are returned and only what they need is
+        computed: stat fields never open the file.
+        """
+        if fields is None:
+            fields = METADATA_FIELDS
+
+        metadata = {}
+        for field in fields:
+            if field in HTML_FIELDS:
+                metadata[field] = self.html_metadata.get(field)
+            elif field == 'bytes_saved':
+                metadata[field] = self._manager.get_optimization_info(self.filename).get('bytes_saved', 0)
+            elif field in METADATA_FIELDS:
+                metadata[field] = getattr(self, field)
+        return metadata
+
+    def __repr__(self) -> str:
+        return f"HTMLFileRecord({self.filename!r}, size_bytes={self.size_bytes})"
 
 
 class HTMLFileManager:
@@ -17,16 +134,42 @@ class HTMLFileManager:
     
     def __init__(self):
         self.export_directory = config.get('html_manager.export_directory', 'html_exports')
+        self.layout = storage.get_layout()
+        self._optimization_manifest = (None, {})
+        self._versions = None
         self.ensure_export_directory()
     
+    @property
+    def originals_directory(self) -> str:
+        """Directory holding the original copies of optimized imports"""
+        return os.path.join(self.export_directory, ORIGINALS_DIRECTORY)
+    
+    @property
+    def versions(self) -> VersionStore:
+        """Version history of re-imported exports"""
+        if self._versions is None or self._versions.export_directory != self.export_directory:
+            self._versions = VersionStore(self.export_directory)
+        return self._versions
+    
+    def file_directory(self, filename: str, layout: Optional[str] = None) -> str:
+        """Directory an HTML file is stored in under the (current) layout"""
+        return storage.layout_directory(self.export_directory, filename, layout or self.layout)
+    
     def ensure_export_directory(self) -> None:
         """Ensure export directory exists"""
         if not os.path.exists(self.export_directory):
             os.makedirs(self.export_directory)
             print(f"Created export directory: {self.export_directory}")
     
-    def import_html_file(self, source_path: str, new_name: Optional[str] = None) -> Optional[str]:
-        """Import HTML file to export directory"""
+    def import_html_file(self, source_path: str, new_name: Optional[str] = None,
+                         version_history: Optional[bool] = None) -> Optional[str]:
+        """Import HTML file to export directory
+
+        A re-import of an existing name becomes its new version when
+        version_history is on (html_manager.version_history by default);
+        otherwise the import is stored under a new, timestamped name. Pass
+        False when the import must not replace an unrelated file.
+        """
         if not os.path.exists(source_path):
             print(f"Source file not found: {source_path}")
             return None
@@ -39,23 +182,93 @@ class HTMLFileManager:
             print(f"File too large: {file_size_mb:.2f}MB (max: {max_size_mb}MB)")
             return None
         
+        # Generate destination path
+        if new_name:
+            filename = new_name if new_name.endswith('.html') else f"{new_name}.html"
+        else:
+            filename = os.path.basename(source_path)
+        if version_history is None:
+            version_history = config.get('html_manager.version_history', True)
+        
+        with _import_lock(self.export_directory, filename):
+            return self._import_html_file(source_path, filename, version_history)
+    
+    def _import_html_file(self, source_path: str, filename: str, version_history: bool) -> Optional[str]:
+        """import_html_file() once the name's import lock is held"""
         try:
-            # Generate destination path
-            if new_name:
-                filename = new_name if new_name.endswith('.html') else f"{new_name}.html"
-            else:
-                filename = os.path.basename(source_path)
-            
-            # Add timestamp if file exists
-            destination_path = os.path.join(self.export_directory, filename)
-            if os.path.exists(destination_path):
+            # A re-import of an existing name becomes its new version; without
+            # version history, add a timestamp (then a counter if several
+            # imports of the same name land in the same second)
+            existing_path = self.resolve_path(filename)
+            keep_history = existing_path and version_history
+            if existing_path and not keep_history:
                 name, ext = os.path.splitext(filename)
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                 filename = f"{name}_{timestamp}{ext}"
-                destination_path = os.path.join(self.export_directory, filename)
+                counter = 1
+                while self.resolve_path(filename):
+                    counter += 1
+                    filename = f"{name}_{timestamp}_{counter}{ext}"
+            
+            compression = storage.get_storage_compression()
+            destination_directory = self.file_directory(filename)
+            os.makedirs(destination_directory, exist_ok=True)
+            destination_path = storage.storage_path(destination_directory, filename, compression)
             
-            # Copy file
-            shutil.copy2(source_path, destination_path)
+            slimmed = None
+            if config.get('html_manager.optimize_on_import', False):
+                slimmed = self.slim_html_file(source_path)
+            
+            previous = content = None
+            if keep_history:
+                with storage.open_binary(existing_path) as f:
+                    previous = f.read()
+                if slimmed is not None:
+                    content = slimmed
+                else:
+                    with open(source_path, 'rb') as f:
+                        content = f.read()
+                if content == previous:
+                    print(f"{filename} is unchanged, keeping the current version")
+                    return existing_path
+            
+            if slimmed is not None:
+                # Keep the original alongside the slimmed copy
+                originals_directory = storage.layout_directory(self.originals_directory, filename, self.layout)
+                os.makedirs(originals_directory, exist_ok=True)
+                original_path = storage.storage_path(originals_directory, filename, compression)
+                with open(source_path, 'rb') as source:
+                    storage.write_compressed(source, original_path, compression)
+                shutil.copystat(source_path, original_path)
+                
+                storage.write_compressed(io.BytesIO(slimmed), destination_path, compression)
+                shutil.copystat(source_path, destination_path)
+                
+                original_bytes = os.path.getsize(source_path)
+                self._save_optimization_info(filename, {
+                    'original_bytes': original_bytes,
+                    'optimized_bytes': len(slimmed),
+                    'bytes_saved': original_bytes - len(slimmed)
+                })
+            elif compression:
+                # Copy file, compressing it
+                with open(source_path, 'rb') as source:
+                    storage.write_compressed(source, destination_path, compression)
+                shutil.copystat(source_path, destination_path)
+            else:
+                # Copy file
+                shutil.copy2(source_path, destination_path)
+            
+            if keep_history:
+                # The storage form or layout may have changed since the last version
+                if existing_path != destination_path:
+                    os.remove(existing_path)
+                # Date the export by this import, so caches keyed on the
+                # modification time see the change
+                os.utime(destination_path)
+                entry = self.versions.record(filename, previous, content)
+                print(f"Imported {filename} as version {entry['version']}")
+                return destination_path
             
             print(f"Imported {filename} to {self.export_directory}")
             return destination_path
@@ -64,55 +277,171 @@ class HTMLFileManager:
             print(f"Error importing file {source_path}: {e}")
             return None
     
+    def list_versions(self, filename: str) -> List[Dict[str, Any]]:
+        """Recorded versions of an export, oldest first (empty if never re-imported)"""
+        return self.versions.list_versions(filename)
+    
+    def get_version(self, filename: str, version: int) -> Optional[bytes]:
+        """Content of a version of an export, or None if there is no such version"""
+        path = self.resolve_path(filename)
+        if not path:
+            return None
+        with storage.open_binary(path) as f:
+            current = f.read()
+        return self.versions.get_version(filename, version, current)
+    
+    def restore_version(self, filename: str, version: int) -> Optional[str]:
+        """Make a past version the current one (recorded as a new version)"""
+        content = self.get_version(filename, version)
+        if content is None:
+            print(f"No version {version} of {filename}")
+            return None
+        
+        with tempfile.NamedTemporaryFile(suffix='.html', delete=False) as temp_file:
+            temp_file.write(content)
+        try:
+            # A restore replaces the current export, whatever html_manager.version_history says
+            return self.import_html_file(temp_file.name, filename, version_history=True)
+        finally:
+            os.remove(temp_file.name)
+    
+    def slim_html_file(self, source_path: str) -> Optional[bytes]:
+        """Minify an HTML file, returning the slimmed bytes or None if it can't be slimmed"""
+        try:
+            with open(source_path, 'r', encoding='utf-8') as f:
+                content = f.read()
+        except UnicodeDecodeError:
+            print(f"Skipping optimization of non UTF-8 file: {source_path}")
+            return None
+        
+        slimmed, stats = optimizer.slim_html(content)
+        slimmed_bytes = slimmed.encode('utf-8')
+        
+        if len(slimmed_bytes) >= len(content.encode('utf-8')):
+            return None
+        
+        if stats['duplicate_styles'] or stats['duplicate_assets']:
+            print(f"Removed {stats['duplicate_styles']} duplicate styles and "
+                  f"{stats['duplicate_assets']} duplicate assets from {os.path.basename(source_path)}")
+        return slimmed_bytes
+    
+    def get_optimization_info(self, filename: str) -> Dict[str, int]:
+        """Get the size savings recorded when a file was optimized on import"""
+        return self._load_optimization_manifest().get(filename, {})
+    
+    def _load_optimization_manifest(self) -> Dict[str, Dict[str, int]]:
+        manifest_path = os.path.join(self.originals_directory, OPTIMIZATION_MANIFEST)
+        try:
+            mtime = os.stat(manifest_path).st_mtime
+        except OSError:
+            return {}
+        
+        cached_mtime, manifest = self._optimization_manifest
+        if cached_mtime != mtime:
+            try:
+                with open(manifest_path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+            except Exception as e:
+                print(f"Error reading optimization manifest: {e}")
+                manifest = {}
+            self._optimization_manifest = (mtime, manifest)
+        
+        return manifest
+    
+    def _save_optimization_info(self, filename: str, info: Dict[str, int]) -> None:
+        manifest = dict(self._load_optimization_manifest())
+        manifest[filename] = info
+        
+        manifest_path = os.path.join(self.originals_directory, OPTIMIZATION_MANIFEST)
+        with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(manifest_path + '.tmp', manifest_path)
+    
+    def resolve_path(self, filename: str) -> Optional[str]:
+        """Get the on-disk path of an HTML file, whether stored plain or compressed"""
+        directories = [self.file_directory(filename)]
+        if os.path.basename(filename) == filename:
+            # Also look where the other layout would put it, e.g. mid-migration
+            directories += [self.file_directory(filename, layout) for layout in storage.LAYOUTS
+                            if layout != self.layout]
+        
+        for directory in directories:
+            for candidate in storage.candidate_paths(os.path.join(directory, filename)):
+                if os.path.isfile(candidate):
+                    return candidate
+        return None
+    
+    def open_html(self, file_path: str):
+        """Open a stored HTML file as text, decompressing transparently"""
+        return storage.open_text(file_path)
+    
+    def iter_html_files(self, directory: Optional[str] = None) -> Iterator[HTMLFileRecord]:
+        """Lazily yield a record for each HTML file in a directory
+
+        Uses os.scandir so each entry's stat result comes from the directory
+        scan; no file is opened until a record's checksum or HTML metadata
+        is accessed. Entries are yielded in directory order. Files in shard
+        subdirectories (sharded layout) are included.
+        """
+        directory = directory or self.export_directory
+        supported_extensions = tuple(
+            ext.lower() for ext in config.get('html_manager.supported_extensions', ['.html', '.htm'])
+        )
+        
+        for entry in storage.iter_file_entries(directory):
+            name = storage.strip_compression_suffix(entry.name)
+            if name.startswith('.') or not name.lower().endswith(supported_extensions):
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+            except OSError as e:
+                print(f"Error processing file {entry.path}: {e}")
+                continue
+            
+            yield HTMLFileRecord(self, entry.path, stat)
+    
     def list_html_files(self) -> List[Dict[str, Any]]:
         """List all HTML files in export directory with metadata"""
         files = []
-        supported_extensions = config.get('html_manager.supported_extensions', ['.html', '.htm'])
         
-        for ext in supported_extensions:
-            pattern = os.path.join(self.export_directory, f"*{ext}")
-            for file_path in glob.glob(pattern):
-                try:
-                    file_info = self.get_file_metadata(file_path)
-                    if file_info:
-                        files.append(file_info)
-                except Exception as e:
-                    print(f"Error processing file {file_path}: {e}")
+        # Records come sorted by creation time (newest first)
+        for record in self._records_newest_first():
+            try:
+                files.append(record.to_dict())
+            except Exception as e:
+                print(f"Error processing file {record.path}: {e}")
         
-        # Sort by creation time (newest first)
-        files.sort(key=lambda x: x.get('created_time', ''), reverse=True)
         return files
     
-    def get_file_metadata(self, file_path: str) -> Optional[Dict[str, Any]]:
-        """Extract metadata from HTML file"""
-        if not os.path.exists(file_path):
+    def _records_newest_first(self) -> List[HTMLFileRecord]:
+        """Records for the export directory, sorted by creation time (newest first)"""
+        return sorted(self.iter_html_files(), key=lambda r: r.created_timestamp, reverse=True)
+    
+    def get_file_metadata(self, file_path: str, fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """Extract metadata from HTML file, optionally only the given fields"""
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Error getting metadata for {file_path}: {e}")
             return None
         
         try:
-            stat = os.stat(file_path)
-            
-            metadata = {
-                'filename': os.path.basename(file_path),
-                'path': file_path,
-                'size_bytes': stat.st_size,
-                'size_mb': round(stat.st_size / (1024 * 1024), 2),
-                'created_time': datetime.fromtimestamp(stat.st_ctime).isoformat(),
-                'modified_time': datetime.fromtimestamp(stat.st_mtime).isoformat(),
-                'checksum': self.calculate_checksum(file_path)
-            }
-            
-            # Extract HTML metadata
-            html_metadata = self.extract_html_metadata(file_path)
-            metadata.update(html_metadata)
-            
-            return metadata
-            
+            return HTMLFileRecord(self, file_path, stat).to_dict(fields)
         except Exception as e:
             print(f"Error getting metadata for {file_path}: {e}")
             return None
     
     def extract_html_metadata(self, file_path: str) -> Dict[str, Any]:
         """Extract metadata from HTML content"""
+        return self.extract_html_content(file_path)[0]
+    
+    def extract_html_content(self, file_path: str) -> Tuple[Dict[str, Any], str]:
+        """Extract metadata and plain text from HTML content in a single parse"""
+        text_content = ''
         metadata = {
             'title': '',
             'description': '',
@@ -123,7 +452,7 @@ class HTMLFileManager:
         }
         
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
+            with self.open_html(file_path) as f:
                 content = f.read()
             
             soup = BeautifulSoup(content, 'html.parser')
@@ -155,13 +484,15 @@ class HTMLFileManager:
         except Exception as e:
             print(f"Error extracting HTML metadata from {file_path}: {e}")
         
-        return metadata
+        return metadata, text_content
     
     def calculate_checksum(self, file_path: str) -> str:
-        """Calculate MD5 checksum of file"""
+        """Calculate MD5 checksum of the (decompressed) file content"""
         try:
-            with open(file_path, 'rb') as f:
-                return hashlib.md5(f.read()).hexdigest()
+            checksum = hashlib.md5()
+            for chunk in storage.iter_decompressed(file_path):
+                checksum.update(chunk)
+            return checksum.hexdigest()
         except Exception:
             return ''
     
@@ -202,7 +533,7 @@ class HTMLFileManager:
             
             # Search in content (if needed)
             try:
-                with open(file_info['path'], 'r', encoding='utf-8') as f:
+                with self.open_html(file_info['path']) as f:
                     content = f.read().lower()
                     if query_lower in content:
                         results.append(file_info)
@@ -213,28 +544,137 @@ class HTMLFileManager:
     
     def cleanup_duplicates(self) -> List[str]:
         """Remove duplicate files based on checksum"""
-        files = self.list_html_files()
         checksum_map = {}
         duplicates = []
         
-        for file_info in files:
-            checksum = file_info.get('checksum')
+        # Only checksums are needed here, so HTML metadata is never parsed
+        for record in self._records_newest_first():
+            checksum = record.checksum
             if not checksum:
                 continue
             
             if checksum in checksum_map:
                 # This is a duplicate - remove the newer one
                 try:
-                    os.remove(file_info['path'])
-                    duplicates.append(file_info['filename'])
-                    print(f"Removed duplicate: {file_info['filename']}")
+                    os.remove(record.path)
+                    duplicates.append(record.filename)
+                    print(f"Removed duplicate: {record.filename}")
                 except Exception as e:
-                    print(f"Error removing duplicate {file_info['path']}: {e}")
+                    print(f"Error removing duplicate {record.path}: {e}")
             else:
-                checksum_map[checksum] = file_info
+                checksum_map[checksum] = record
         
         return duplicates
     
+    def convert_storage(self, method: Optional[str], dry_run: bool = False) -> List[Dict[str, Any]]:
+        """Re-store existing files with a compression method (None stores them plain)"""
+        converted = []
+        
+        for record in list(self.iter_html_files()):
+            if record.compression == method:
+                continue
+            
+            destination_path = storage.storage_path(os.path.dirname(record.path), record.filename, method)
+            result = {'filename': record.filename, 'old_size': record.size_bytes, 'new_size': None}
+            
+            if dry_run:
+                converted.append(result)
+                continue
+            
+            temp_path = destination_path + '.tmp'
+            try:
+                with storage.open_binary(record.path) as source:
+                    storage.write_compressed(source, temp_path, method)
+                shutil.copystat(record.path, temp_path)
+                os.replace(temp_path, destination_path)
+                os.remove(record.path)
+                result['new_size'] = os.path.getsize(destination_path)
+                converted.append(result)
+            except Exception as e:
+                print(f"Error converting storage for {record.path}: {e}")
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+        
+        return converted
+    
+    def migrate_layout(self, layout: str, dry_run: bool = False) -> List[Dict[str, Any]]:
+        """Move existing files (and their optimization originals) into a layout
+
+        Returns one {filename, old_path, new_path} result per moved file. Files
+        whose target already exists are left in place and reported with
+        new_path None. Empty shard directories are removed afterwards.
+        """
+        if layout not in storage.LAYOUTS:
+            raise ValueError(f"Unknown layout: {layout}")
+        
+        moved = []
+        for record in list(self.iter_html_files()):
+            target_directory = self.file_directory(record.filename, layout)
+            if os.path.dirname(record.path) == target_directory:
+                continue
+            
+            new_path = os.path.join(target_directory, os.path.basename(record.path))
+            result = {'filename': record.filename, 'old_path': record.path, 'new_path': new_path}
+            
+            if dry_run:
+                moved.append(result)
+                continue
+            
+            if os.path.exists(new_path):
+                print(f"Not moving {record.path}: {new_path} already exists")
+                result['new_path'] = None
+                moved.append(result)
+                continue
+            
+            try:
+                os.makedirs(target_directory, exist_ok=True)
+                os.replace(record.path, new_path)
+                self._migrate_original(record, layout)
+            except OSError as e:
+                print(f"Error moving {record.path}: {e}")
+                result['new_path'] = None
+            moved.append(result)
+        
+        if not dry_run:
+            self.layout = layout
+            for directory in (self.export_directory, self.originals_directory):
+                self._remove_empty_shards(directory)
+        
+        return moved
+    
+    def _migrate_original(self, record: HTMLFileRecord, layout: str) -> None:
+        """Move the optimization original of a file next to where the layout expects it"""
+        stored_name = os.path.basename(record.path)
+        target_directory = storage.layout_directory(self.originals_directory, record.filename, layout)
+        
+        for other in storage.LAYOUTS:
+            if other == layout:
+                continue
+            old_path = os.path.join(storage.layout_directory(self.originals_directory, record.filename, other),
+                                    stored_name)
+            if os.path.isfile(old_path):
+                os.makedirs(target_directory, exist_ok=True)
+                os.replace(old_path, os.path.join(target_directory, stored_name))
+    
+    def _remove_empty_shards(self, directory: str) -> None:
+        """Remove shard directories left empty by a migration"""
+        try:
+            shards = [entry.path for entry in os.scandir(directory)
+                      if storage.SHARD_NAME_RE.match(entry.name) and entry.is_dir()]
+        except OSError:
+            return
+        
+        for shard in shards:
+            for subshard in os.listdir(shard):
+                try:
+                    os.rmdir(os.path.join(shard, subshard))
+                except OSError:
+                    pass
+            try:
+                os.rmdir(shard)
+            except OSError:
+                pass
+    
     def export_file_list(self, format_type: str = 'csv') -> str:
         """Export file list to CSV or JSON"""
         files = self.list_html_files()
@@ -252,7 +692,6 @@ class HTMLFileManager:
                     writer.writerows(files)
         
         elif format_type.lower() == 'json':
-            import json
             filename = f"gemini_files_{timestamp}.json"
             
             with open(filename, 'w', encoding='utf-8') as jsonfile:
@@ -2,33 +2,126 @@
 Google Workspace API integration for managing HTML files
 """
 import os
+import gzip
 import json
+import time
 import pickle
-from typing import List, Dict, Optional, Any
+import mimetypes
+import threading
+from typing import List, Dict, Optional, Any, BinaryIO, Iterator, Tuple
+from google.auth.credentials import AnonymousCredentials
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload, MediaIoBaseUpload
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaFileUpload, MediaIoBaseUpload, MediaIoBaseDownload
 from .config import config
+from . import storage
+from . import conversion
+from .drive_clients import SharedCredentials, ServiceClient, ServiceClientPool
+from .rate_limiter import get_rate_limiter
 import io
 
+GOOGLE_DOC_MIME_TYPE = 'application/vnd.google-apps.document'
+# Largest upload Drive accepts as a single multipart request
+MAX_MULTIPART_BYTES = 5 * 1024 * 1024
+# File IDs fetched per files().generateIds call
+FILE_ID_BATCH = 100
+
+
+def conversion_error(doc_ids: List[str], stats: Dict[str, Any]) -> Optional[str]:
+    """Why a convert_html_with_stats() call failed (saying if it got part way), or None"""
+    if not stats.get('error'):
+        return None
+    if doc_ids:
+        return f"Only {len(doc_ids)} of {stats.get('parts', '?')} parts converted: {stats['error']}"
+    return stats['error']
+
 
 class GoogleWorkspaceManager:
-    """Manages Google Workspace API interactions"""
+    """Manages Google Workspace API interactions
+
+    Safe to share between threads: drive_service and docs_service are the
+    calling thread's own clients from a pool (see drive_clients), and the
+    credentials they share are refreshed under a lock. Every API call goes
+    through a shared AdaptiveRateLimiter (see rate_limiter), which paces calls
+    to the configured quota and retries rate-limited and failed ones.
+    """
     
     def __init__(self):
         self.credentials = None
-        self.drive_service = None
-        self.docs_service = None
+        self.client_pool = None
+        self.rate_limiter = None
+        self._inline_image_urls = {}
+        self._inline_image_folders = {}
+        self._folder_lock = threading.Lock()
+        self._file_ids: List[str] = []
+        self._file_ids_lock = threading.Lock()
+        self._compress_uploads = config.get('conversion.compress_upload', True)
         self.initialize_services()
     
     def initialize_services(self) -> None:
-        """Initialize Google API services"""
-        self.credentials = self.get_credentials()
+        """Initialize Google API services
+        
+        With google.api_endpoint set (e.g. to a local drive_emulator), requests
+        go to that server without authentication.
+        """
+        api_endpoint = config.get('google.api_endpoint')
+        self.credentials = AnonymousCredentials() if api_endpoint else self.get_credentials()
         if self.credentials:
-            self.drive_service = build('drive', 'v3', credentials=self.credentials)
-            self.docs_service = build('docs', 'v1', credentials=self.credentials)
+            shared = SharedCredentials(self.credentials, on_refresh=self.save_credentials)
+            timeout = config.get('google.http_timeout', 60)
+            self.client_pool = ServiceClientPool(lambda: ServiceClient(shared, timeout, api_endpoint))
+            # Quotas are per user; the token file stands for the signed-in user
+            self.rate_limiter = get_rate_limiter(api_endpoint or config.get('google.token_file'))
+    
+    @property
+    def drive_service(self):
+        """Drive API service for the calling thread"""
+        return self.client_pool.acquire().drive if self.client_pool else None
+    
+    @property
+    def docs_service(self):
+        """Docs API service for the calling thread"""
+        return self.client_pool.acquire().docs if self.client_pool else None
+    
+    def execute(self, request):
+        """Execute an API request through the rate limiter"""
+        return self.rate_limiter.execute(request)
+    
+    def create_file(self, body: Dict[str, Any], fields: str = 'id', **kwargs) -> Dict[str, Any]:
+        """files().create() that is safe to retry
+
+        The rate limiter retries failed requests, and a create whose response
+        was lost may already have made the file. So the file is given an ID
+        generated up front: a retry of a create that went through is refused
+        with 409, and the file it made is fetched instead of a duplicate made.
+        """
+        body = dict(body, id=self._new_file_id())
+        return self._execute_create(self.drive_service.files().create(body=body, fields=fields, **kwargs),
+                                    body['id'], fields)
+    
+    def _execute_create(self, request, file_id: str, fields: str) -> Dict[str, Any]:
+        """Execute a files().create() request for a file with a generated ID"""
+        try:
+            return self.execute(request)
+        except HttpError as e:
+            if e.resp.status != 409:
+                raise
+            return self.execute(self.drive_service.files().get(fileId=file_id, fields=fields))
+    
+    def _new_file_id(self) -> str:
+        """An unused Drive file ID, fetched from files().generateIds in batches"""
+        with self._file_ids_lock:
+            if not self._file_ids:
+                result = self.execute(self.drive_service.files().generateIds(count=FILE_ID_BATCH, space='drive'))
+                self._file_ids = list(result['ids'])
+            return self._file_ids.pop()
+    
+    def release_client(self) -> None:
+        """Return the calling thread's API clients to the pool (e.g. at the end of a request)"""
+        if self.client_pool:
+            self.client_pool.release()
     
     def get_credentials(self) -> Optional[Credentials]:
         """Get or create Google API credentials"""
@@ -67,14 +160,18 @@ class GoogleWorkspaceManager:
                     return None
             
             # Save the credentials for the next run
-            try:
-                with open(token_file, 'wb') as token:
-                    pickle.dump(creds, token)
-            except Exception as e:
-                print(f"Error saving token: {e}")
+            self.save_credentials(creds)
         
         return creds
     
+    def save_credentials(self, creds: Credentials) -> None:
+        """Persist credentials (e.g. after a refresh) to the token file"""
+        try:
+            with open(config.get('google.token_file'), 'wb') as token:
+                pickle.dump(creds, token)
+        except Exception as e:
+            print(f"Error saving token: {e}")
+    
     def upload_html_file(self, file_path: str, title: Optional[str] = None) -> Optional[str]:
         """Upload HTML file to Google Drive"""
         if not self.drive_service:
@@ -83,20 +180,24 @@ class GoogleWorkspaceManager:
         
         try:
             if not title:
-                title = os.path.basename(file_path)
+                title = storage.logical_filename(file_path)
             
             file_metadata = {
                 'name': title,
                 'parents': [self.get_or_create_gemini_folder()]
             }
             
-            media = MediaFileUpload(file_path, mimetype='text/html')
+            if storage.compression_of(file_path):
+                # Compressed at rest - upload the decompressed stream
+                media = MediaIoBaseUpload(
+                    storage.spool_decompressed(file_path),
+                    mimetype='text/html',
+                    resumable=True
+                )
+            else:
+                media = MediaFileUpload(file_path, mimetype='text/html')
             
-            file_result = self.drive_service.files().create(
-                body=file_metadata,
-                media_body=media,
-                fields='id,name,webViewLink'
-            ).execute()
+            file_result = self.create_file(file_metadata, media_body=media, fields='id,name,webViewLink')
             
             # Make file publicly viewable
             self.share_file(file_result['id'])
@@ -109,81 +210,217 @@ class GoogleWorkspaceManager:
             return None
     
     def convert_html_to_google_doc(self, file_path: str, title: Optional[str] = None) -> Optional[str]:
-        """Convert HTML file to Google Docs"""
+        """Convert HTML file to Google Docs; None unless every part was converted"""
+        doc_ids = self.convert_html_to_google_docs(file_path, title)
+        return doc_ids[0] if doc_ids else None
+    
+    def convert_html_to_google_docs(self, file_path: str, title: Optional[str] = None) -> List[str]:
+        """Convert HTML file to Google Docs, split into parts beyond conversion.max_doc_size
+        
+        Returns an empty list if the conversion failed, even when some parts
+        had already been created (they are listed in the error message).
+        """
+        doc_ids, stats = self.convert_html_with_stats(file_path, title)
+        if stats.get('error'):
+            if doc_ids:
+                print(f"{file_path}: {conversion_error(doc_ids, stats)} (created {', '.join(doc_ids)})")
+            return []
+        return doc_ids
+    
+    def convert_html_with_stats(self, file_path: str,
+                                title: Optional[str] = None) -> Tuple[List[str], Dict[str, Any]]:
+        """Convert HTML file to Google Docs and report what the conversion took
+        
+        Returns the document IDs and the preprocessing counters (see
+        conversion.prepare_html_for_docs) plus sent_bytes (on the wire, after
+        compression), bytes_saved against the original file, and the seconds
+        spent preparing and converting. If the conversion fails, stats has
+        the reason in 'error' and the IDs (also counted in parts_converted)
+        are those of the parts created before the failure.
+        """
         if not self.drive_service:
             print("Google Drive service not initialized")
-            return None
+            return [], {'error': 'Google Drive service not initialized'}
+        
+        doc_ids = []
+        stats: Dict[str, Any] = {}
+        started = time.perf_counter()
         
         try:
             if not title:
-                title = os.path.basename(file_path).replace('.html', '')
+                title = storage.logical_filename(file_path).replace('.html', '')
             
             # Read HTML content
-            with open(file_path, 'r', encoding='utf-8') as f:
+            with storage.open_text(file_path) as f:
                 html_content = f.read()
             
-            # Upload as Google Doc
-            file_metadata = {
-                'name': title,
-                'parents': [self.get_or_create_gemini_folder()],
-                'mimeType': 'application/vnd.google-apps.document'
-            }
+            folder_id = self.get_or_create_gemini_folder()
             
-            media = MediaIoBaseUpload(
-                io.BytesIO(html_content.encode('utf-8')),
-                mimetype='text/html',
-                resumable=True
-            )
+            # Slim the page, deduplicate/externalize inline images and split oversized content
+            image_uploader = None
+            if config.get('conversion.externalize_images', False):
+                image_uploader = lambda data, mime_type, digest: self.upload_inline_image(
+                    data, mime_type, digest, folder_id)
+            parts, stats = conversion.prepare_html_for_docs(html_content, image_uploader)
+            stats['sent_bytes'] = 0
+            stats['prepare_seconds'] = round(time.perf_counter() - started, 3)
             
-            file_result = self.drive_service.files().create(
+            for index, part in enumerate(parts, 1):
+                part_title = title if len(parts) == 1 else f"{title} (part {index} of {len(parts)})"
+                
+                # Upload as Google Doc
+                file_metadata = {
+                    'name': part_title,
+                    'parents': [folder_id],
+                    'mimeType': GOOGLE_DOC_MIME_TYPE
+                }
+                file_result = self._create_doc(file_metadata, part.encode('utf-8'), stats)
+                
+                # Share the document
+                self.share_file(file_result['id'])
+                doc_ids.append(file_result['id'])
+            
+            print(f"Converted {title} to Google Docs "
+                  f"({stats['parts']} part(s), {stats['unique_images']}/{stats['inline_images']} unique inline images, "
+                  f"{stats['original_bytes']} -> {stats['upload_bytes']} bytes, {stats['sent_bytes']} sent, "
+                  f"{time.perf_counter() - started:.2f}s)")
+            return doc_ids, stats
+            
+        except Exception as e:
+            print(f"Error converting file {file_path}: {e}")
+            stats['error'] = str(e)
+            return doc_ids, stats
+        
+        finally:
+            # Filled in even when the conversion failed part way
+            stats['parts_converted'] = len(doc_ids)
+            stats['bytes_saved'] = max(stats.get('original_bytes', 0) - stats.get('sent_bytes', 0), 0)
+            stats['seconds'] = round(time.perf_counter() - started, 3)
+            stats['convert_seconds'] = round(stats['seconds'] - stats.get('prepare_seconds', 0), 3)
+    
+    def _create_doc(self, file_metadata: Dict[str, Any], content: bytes, stats: Dict[str, Any]) -> Dict[str, Any]:
+        """Upload HTML as a new Google Doc, gzip-compressed when possible
+        
+        Uploads under MAX_MULTIPART_BYTES go as one multipart request whose
+        body is compressed with Content-Encoding: gzip. If the API refuses
+        a compressed body, this and later uploads are sent uncompressed.
+        """
+        file_metadata = dict(file_metadata, id=self._new_file_id())
+        if self._compress_uploads and len(content) <= MAX_MULTIPART_BYTES:
+            request = self.drive_service.files().create(
                 body=file_metadata,
-                media_body=media,
+                media_body=MediaIoBaseUpload(io.BytesIO(content), mimetype='text/html', resumable=False),
                 fields='id,name,webViewLink'
-            ).execute()
+            )
+            body = gzip.compress(request.body, compresslevel=6)
+            request.body = body
+            request.body_size = len(body)
+            request.headers['content-encoding'] = 'gzip'
+            request.headers['content-length'] = str(len(body))
+            try:
+                file_result = self._execute_create(request, file_metadata['id'], 'id,name,webViewLink')
+                stats['sent_bytes'] += len(body)
+                return file_result
+            except HttpError as e:
+                if e.resp.status not in (400, 415):
+                    raise
+                print(f"Compressed upload refused ({e.resp.status}), sending uploads uncompressed")
+                self._compress_uploads = False
+        
+        media = MediaIoBaseUpload(
+            io.BytesIO(content),
+            mimetype='text/html',
+            resumable=True
+        )
+        file_result = self._execute_create(self.drive_service.files().create(
+            body=file_metadata,
+            media_body=media,
+            fields='id,name,webViewLink'
+        ), file_metadata['id'], 'id,name,webViewLink')
+        stats['sent_bytes'] += len(content)
+        return file_result
+    
+    def upload_inline_image(self, data: bytes, mime_type: str, digest: str,
+                            parent_id: Optional[str] = None) -> Optional[str]:
+        """Upload an inline image once per content hash and return a public URL for it"""
+        if digest in self._inline_image_urls:
+            return self._inline_image_urls[digest]
+        
+        try:
+            parent_id = parent_id or self.get_or_create_gemini_folder()
+            folder_id = self._inline_image_folders.get(parent_id)
+            if not folder_id:
+                folder_id = self._get_or_create_folder("Inline Images", parent_id)
+                self._inline_image_folders[parent_id] = folder_id
+            name = f"inline-{digest[:32]}{mimetypes.guess_extension(mime_type) or ''}"
             
-            # Share the document
-            self.share_file(file_result['id'])
+            # Reuse an image uploaded by an earlier conversion
+            existing = self.execute(self.drive_service.files().list(
+                q=f"name='{name}' and '{folder_id}' in parents and trashed=false",
+                fields="files(id)"
+            )).get('files', [])
             
-            print(f"Converted {title} to Google Docs")
-            return file_result['id']
+            if existing:
+                file_id = existing[0]['id']
+            else:
+                media = MediaIoBaseUpload(io.BytesIO(data), mimetype=mime_type)
+                file_id = self.create_file({'name': name, 'parents': [folder_id]}, media_body=media)['id']
+                self.share_file(file_id)
             
         except Exception as e:
-            print(f"Error converting file {file_path}: {e}")
+            print(f"Error uploading inline image {digest[:12]}: {e}")
             return None
+        
+        url = f"https://drive.google.com/uc?export=view&id={file_id}"
+        self._inline_image_urls[digest] = url
+        return url
     
     def get_or_create_gemini_folder(self) -> str:
         """Get or create Gemini HTML exports folder in Google Drive"""
-        folder_name = "Gemini HTML Exports"
-        
         try:
-            # Search for existing folder
-            results = self.drive_service.files().list(
-                q=f"name='{folder_name}' and mimeType='application/vnd.google-apps.folder'",
-                fields="files(id, name)"
-            ).execute()
-            
-            folders = results.get('files', [])
-            
-            if folders:
-                return folders[0]['id']
+            return self._get_or_create_folder("Gemini HTML Exports")
+        except Exception as e:
+            print(f"Error creating folder: {e}")
+            return 'root'  # Fallback to root folder
+    
+    def _get_or_create_folder(self, folder_name: str, parent_id: Optional[str] = None) -> str:
+        """Get or create a Drive folder by name, optionally inside a parent folder"""
+        folder_id = self._find_folder(folder_name, parent_id)
+        if folder_id:
+            return folder_id
+        
+        # Concurrent uploads would each create their own copy of a missing
+        # folder, so creating one is serialized and re-checked under a lock
+        with self._folder_lock:
+            folder_id = self._find_folder(folder_name, parent_id)
+            if folder_id:
+                return folder_id
             
-            # Create new folder
             folder_metadata = {
                 'name': folder_name,
                 'mimeType': 'application/vnd.google-apps.folder'
             }
+            if parent_id:
+                folder_metadata['parents'] = [parent_id]
             
-            folder = self.drive_service.files().create(
-                body=folder_metadata,
-                fields='id'
-            ).execute()
-            
-            print(f"Created folder: {folder_name}")
-            return folder['id']
-            
-        except Exception as e:
-            print(f"Error creating folder: {e}")
-            return 'root'  # Fallback to root folder
+            folder = self.create_file(folder_metadata)
+        
+        print(f"Created folder: {folder_name}")
+        return folder['id']
+    
+    def _find_folder(self, folder_name: str, parent_id: Optional[str] = None) -> Optional[str]:
+        """ID of the first Drive folder with this name (inside parent_id, if given)"""
+        query = f"name='{folder_name}' and mimeType='application/vnd.google-apps.folder'"
+        if parent_id:
+            query += f" and '{parent_id}' in parents"
+        
+        results = self.execute(self.drive_service.files().list(
+            q=query,
+            fields="files(id, name)"
+        ))
+        
+        folders = results.get('files', [])
+        return folders[0]['id'] if folders else None
     
     def share_file(self, file_id: str) -> None:
         """Make file publicly viewable"""
@@ -195,10 +432,10 @@ class GoogleWorkspaceManager:
                 'role': sharing_config.get('role', 'reader')
             }
             
-            self.drive_service.permissions().create(
+            self.execute(self.drive_service.permissions().create(
                 fileId=file_id,
                 body=permission
-            ).execute()
+            ))
             
         except Exception as e:
             print(f"Error sharing file {file_id}: {e}")
@@ -211,10 +448,10 @@ class GoogleWorkspaceManager:
         try:
             folder_id = self.get_or_create_gemini_folder()
             
-            results = self.drive_service.files().list(
+            results = self.execute(self.drive_service.files().list(
                 q=f"'{folder_id}' in parents",
                 fields="files(id, name, mimeType, size, createdTime, webViewLink)"
-            ).execute()
+            ))
             
             return results.get('files', [])
             
@@ -222,6 +459,42 @@ class GoogleWorkspaceManager:
             print(f"Error listing files: {e}")
             return []
     
+    def iter_folder_files(self, folder_id: str,
+                          fields: str = "id, name, mimeType, size, md5Checksum, modifiedTime"
+                          ) -> Iterator[Dict[str, Any]]:
+        """Yield every (untrashed) file in a Drive folder, following pagination"""
+        page_token = None
+        while True:
+            results = self.execute(self.drive_service.files().list(
+                q=f"'{folder_id}' in parents and trashed=false",
+                fields=f"nextPageToken, files({fields})",
+                pageSize=1000,
+                pageToken=page_token
+            ))
+            yield from results.get('files', [])
+            
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return
+    
+    def download_file(self, file_info: Dict[str, Any], destination: BinaryIO,
+                      chunk_size: Optional[int] = None) -> None:
+        """Stream a Drive file into a binary file object, exporting Google Docs as HTML
+        
+        The content is fetched in chunk_size ranges, each written as it
+        arrives and retried through the rate limiter. Raises on failure.
+        """
+        if file_info.get('mimeType') == GOOGLE_DOC_MIME_TYPE:
+            request = self.drive_service.files().export_media(fileId=file_info['id'], mimeType='text/html')
+        else:
+            request = self.drive_service.files().get_media(fileId=file_info['id'])
+        
+        downloader = MediaIoBaseDownload(destination, request,
+                                         chunksize=chunk_size or config.get('mirror.chunk_size', 1048576))
+        done = False
+        while not done:
+            _, done = self.rate_limiter.call(downloader.next_chunk)
+    
     def batch_upload_html_files(self, directory_path: str) -> List[str]:
         """Upload all HTML files from a directory"""
         uploaded_files = []
@@ -231,14 +504,21 @@ class GoogleWorkspaceManager:
             print(f"Directory not found: {directory_path}")
             return uploaded_files
         
-        for filename in os.listdir(directory_path):
-            if any(filename.lower().endswith(ext) for ext in supported_extensions):
-                file_path = os.path.join(directory_path, filename)
-                file_id = self.upload_html_file(file_path)
+        failed_files = []
+        
+        # Includes files in shard subdirectories (sharded export layout)
+        for entry in storage.iter_file_entries(directory_path):
+            html_name = storage.strip_compression_suffix(entry.name).lower()
+            if any(html_name.endswith(ext) for ext in supported_extensions) and entry.is_file():
+                file_id = self.upload_html_file(entry.path)
                 if file_id:
                     uploaded_files.append(file_id)
+                else:
+                    failed_files.append(entry.name)
         
         print(f"Uploaded {len(uploaded_files)} HTML files")
+        if failed_files:
+            print(f"Failed to upload {len(failed_files)} files (after retries): {', '.join(failed_files)}")
         return uploaded_files
     
     def get_file_info(self, file_id: str) -> Optional[Dict[str, Any]]:
@@ -247,10 +527,10 @@ class GoogleWorkspaceManager:
             return None
         
         try:
-            file_info = self.drive_service.files().get(
+            file_info = self.execute(self.drive_service.files().get(
                 fileId=file_id,
                 fields="id, name, mimeType, size, createdTime, webViewLink, webContentLink"
-            ).execute()
+            ))
             
             return file_info
             
@@ -0,0 +1,242 @@
+"""
+Byte-level grep over the raw HTML of exports
+"""
+import mmap
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from .config import config
+from . import storage
+
+
+def compile_pattern(pattern: str, regex: bool = False, ignore_case: bool = False) -> Tuple[bytes, int]:
+    """Check a pattern and return the (bytes pattern, flags) workers compile
+
+    Fixed strings are escaped; regular expressions use Python's syntax.
+    Matching is on UTF-8 bytes, so case folding only applies to ASCII.
+    Raises ValueError for empty or invalid patterns.
+    """
+    if not pattern:
+        raise ValueError('Empty pattern')
+    source = pattern.encode('utf-8')
+    if not regex:
+        source = re.escape(source)
+    flags = re.IGNORECASE if ignore_case else 0
+    try:
+        re.compile(source, flags)
+    except re.error as e:
+        raise ValueError(f'Invalid regular expression: {e}')
+    return source, flags
+
+
+def _open_content(path: str):
+    """The stored file's HTML as a buffer: memory-mapped, or decompressed if compressed"""
+    if storage.compression_of(path):
+        with storage.open_binary(path) as f:
+            return f.read(), None
+    f = open(path, 'rb')
+    try:
+        if os.fstat(f.fileno()).st_size == 0:
+            f.close()
+            return b'', None
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), f
+    except Exception:
+        f.close()
+        raise
+
+
+# Case-insensitive fixed strings are found by lowercasing the file a window
+# at a time (bytes.lower() keeps offsets), which is several times faster
+# than an IGNORECASE regex
+LOWER_WINDOW = 8 * 1024 * 1024
+
+
+def _literal_spans(data, needle: bytes, ignore_case: bool) -> Iterator[Tuple[int, int]]:
+    """Non-overlapping (start, end) spans of a fixed byte string"""
+    if not ignore_case:
+        position = data.find(needle)
+        while position >= 0:
+            yield position, position + len(needle)
+            position = data.find(needle, position + len(needle))
+        return
+
+    needle = needle.lower()
+    resume = 0
+    for window_start in range(0, len(data), LOWER_WINDOW):
+        # Overlap the next window so matches crossing the boundary are seen
+        window = data[window_start:window_start + LOWER_WINDOW + len(needle) - 1].lower()
+        position = window.find(needle, max(resume - window_start, 0))
+        while 0 <= position < LOWER_WINDOW:
+            yield window_start + position, window_start + position + len(needle)
+            resume = window_start + position + len(needle)
+            position = window.find(needle, position + len(needle))
+
+
+def grep_file(path: str, filename: str, pattern: bytes, flags: int, literal: Optional[bytes] = None,
+              max_matches: int = 0, context_bytes: int = 120) -> Dict[str, Any]:
+    """Find every match of a pattern in one stored file
+
+    pattern and flags come from compile_pattern(); when literal is given the
+    fixed string is searched for directly instead. Returns {'filename',
+    'bytes', 'matches', 'truncated', 'error'}. Each match has its 1-based
+    line, byte offset and length in the HTML, the matched text and an
+    excerpt of its line clipped to context_bytes either side. Runs in worker
+    processes, so it takes and returns plain data.
+    """
+    result = {'filename': filename, 'bytes': 0, 'matches': [], 'truncated': False, 'error': None}
+    try:
+        data, handle = _open_content(path)
+    except Exception as e:
+        result['error'] = str(e)
+        return result
+
+    try:
+        result['bytes'] = len(data)
+        if literal is not None:
+            spans = _literal_spans(data, literal, bool(flags & re.IGNORECASE))
+        else:
+            spans = (match.span() for match in re.compile(pattern, flags).finditer(data))
+
+        line = 1
+        counted = 0
+        for start, end in spans:
+            if start == end:
+                continue
+            if max_matches and len(result['matches']) >= max_matches:
+                result['truncated'] = True
+                break
+
+            line += data[counted:start].count(b'\n')
+            counted = start
+            line_start = data.rfind(b'\n', 0, start) + 1
+            line_end = data.find(b'\n', end)
+            if line_end < 0:
+                line_end = len(data)
+            excerpt_start = max(line_start, start - context_bytes)
+            excerpt_end = min(line_end, end + context_bytes)
+
+            result['matches'].append({
+                'filename': filename,
+                'line': line,
+                'offset': start,
+                'length': end - start,
+                'match': data[start:end].decode('utf-8', 'replace'),
+                'text': data[excerpt_start:excerpt_end].decode('utf-8', 'replace').strip('\r')
+            })
+    except Exception as e:
+        result['error'] = str(e)
+    finally:
+        if handle:
+            data.close()
+            handle.close()
+    return result
+
+
+# One process pool shared by every search. Workers are started with
+# forkserver (or spawn) rather than forked from a multithreaded web server.
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def shared_executor(workers: int) -> ProcessPoolExecutor:
+    """The grep process pool, created with the given number of workers on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        return _executor
+
+
+def _discard_executor(executor: ProcessPoolExecutor) -> None:
+    """Drop a broken pool so the next search starts a new one"""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+class Grep:
+    """Parallel exact or regex search over the raw bytes of stored exports
+
+    Complements the tokenized search index for things it doesn't capture,
+    such as a script URL or CSS class. Files are memory-mapped (compressed
+    ones are decompressed in the worker) and matched on bytes in a process
+    pool shared by all searches, one file per task, with at most a few
+    tasks per worker queued at a time. Matches are yielded as each file finishes, so memory stays
+    bounded by the files in flight and max_matches per file.
+    """
+
+    def __init__(self, pattern: str, regex: bool = False, ignore_case: bool = False,
+                 max_matches: Optional[int] = None, context_bytes: Optional[int] = None,
+                 workers: Optional[int] = None):
+        self.pattern, self.flags = compile_pattern(pattern, regex, ignore_case)
+        self.literal = None if regex else pattern.encode('utf-8')
+        self.max_matches = config.get('grep.max_matches_per_file', 1000) if max_matches is None else max_matches
+        self.context_bytes = config.get('grep.context_bytes', 120) if context_bytes is None else context_bytes
+        self.workers = workers or config.get('grep.workers', 0) or os.cpu_count() or 1
+        self.stats = self._empty_stats()
+
+    @staticmethod
+    def _empty_stats() -> Dict[str, Any]:
+        return {'files_searched': 0, 'files_matched': 0, 'matches': 0, 'bytes_searched': 0,
+                'truncated_files': [], 'errors': [], 'seconds': 0.0}
+
+    def search(self, records: Iterable) -> Iterator[Dict[str, Any]]:
+        """Yield the matches in records (objects with .path and .filename) as they are found
+
+        self.stats is updated as files finish and is complete once the
+        generator is exhausted.
+        """
+        self.stats = self._empty_stats()
+        started = time.perf_counter()
+        args = (self.pattern, self.flags, self.literal, self.max_matches, self.context_bytes)
+        try:
+            if self.workers == 1:
+                for record in records:
+                    yield from self._collect(grep_file(record.path, record.filename, *args))
+                return
+
+            executor = shared_executor(self.workers)
+            pending = set()
+            try:
+                for record in records:
+                    pending.add(executor.submit(grep_file, record.path, record.filename, *args))
+                    if len(pending) >= self.workers * 4:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            yield from self._collect(future.result())
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield from self._collect(future.result())
+            except BrokenProcessPool:
+                _discard_executor(executor)
+                raise
+            finally:
+                # Also reached when the consumer stops early (e.g. a client disconnects)
+                for future in pending:
+                    future.cancel()
+        finally:
+            self.stats['seconds'] = round(time.perf_counter() - started, 3)
+
+    def _collect(self, result: Dict[str, Any]) -> List[Dict[str, Any]]:
+        stats = self.stats
+        stats['files_searched'] += 1
+        stats['bytes_searched'] += result['bytes']
+        if result['error']:
+            print(f"Error searching {result['filename']}: {result['error']}")
+            stats['errors'].append({'filename': result['filename'], 'error': result['error']})
+        if result['matches']:
+            stats['files_matched'] += 1
+            stats['matches'] += len(result['matches'])
+        if result['truncated']:
+            stats['truncated_files'].append(result['filename'])
+        return result['matches']
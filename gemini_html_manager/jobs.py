@@ -0,0 +1,311 @@
+"""
+Background jobs for long-running batch operations
+"""
+import os
+import json
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from .config import config
+
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+INTERRUPTED = 'interrupted'
+
+FINISHED_STATUSES = (COMPLETED, FAILED, CANCELLED, INTERRUPTED)
+
+# Saving a job rewrites all of its items, so add_item() only saves once
+# this many items or seconds have built up; the final state is always saved
+ITEM_SAVE_BATCH = 100
+ITEM_SAVE_INTERVAL = 1.0
+
+
+class Job:
+    """State of a single background job
+
+    Handlers report progress through set_total() and add_item(), and should
+    check cancel_requested between units of work.
+    """
+
+    def __init__(self, job_type: str, params: Optional[Dict[str, Any]] = None,
+                 job_id: Optional[str] = None):
+        self.id = job_id or uuid.uuid4().hex
+        self.type = job_type
+        self.params = params or {}
+        self.status = QUEUED
+        self.created_time = datetime.now().isoformat()
+        self.started_time = None
+        self.finished_time = None
+        self.total = 0
+        self.items: List[Dict[str, Any]] = []
+        self.result = None
+        self.error = None
+        self.cancel_requested = False
+        self._manager: Optional['JobManager'] = None
+        self._unsaved_items = 0
+        self._last_saved = time.monotonic()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def set_total(self, total: int) -> None:
+        """Set the number of items this job will process"""
+        self.total = total
+        self._save()
+
+    def add_item(self, item: Dict[str, Any]) -> None:
+        """Record the result of one processed item (e.g. one file)
+
+        Items are saved in batches (see ITEM_SAVE_BATCH), so a large job
+        doesn't rewrite its state file for every item.
+        """
+        self.items.append(item)
+        self._unsaved_items += 1
+        if (self._unsaved_items >= ITEM_SAVE_BATCH
+                or time.monotonic() - self._last_saved >= ITEM_SAVE_INTERVAL):
+            self._save()
+
+    def _save(self) -> None:
+        self._unsaved_items = 0
+        self._last_saved = time.monotonic()
+        if self._manager:
+            self._manager.save_job(self)
+
+    def to_dict(self, include_items: bool = True) -> Dict[str, Any]:
+        data = {
+            'id': self.id,
+            'type': self.type,
+            'params': self.params,
+            'status': self.status,
+            'created_time': self.created_time,
+            'started_time': self.started_time,
+            'finished_time': self.finished_time,
+            'progress': {'total': self.total, 'completed': len(self.items)},
+            'result': self.result,
+            'error': self.error,
+            'cancel_requested': self.cancel_requested
+        }
+        if include_items:
+            data['items'] = list(self.items)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Job':
+        job = cls(data['type'], data.get('params'), job_id=data['id'])
+        job.status = data.get('status', QUEUED)
+        job.created_time = data.get('created_time', job.created_time)
+        job.started_time = data.get('started_time')
+        job.finished_time = data.get('finished_time')
+        job.total = data.get('progress', {}).get('total', 0)
+        job.items = data.get('items', [])
+        job.result = data.get('result')
+        job.error = data.get('error')
+        job.cancel_requested = data.get('cancel_requested', False)
+        return job
+
+
+class JobManager:
+    """Runs jobs on bounded worker pools and persists their state to disk
+
+    Job types run on the default pool unless registered with a named one;
+    each named pool is sized by jobs.pools.<name>, so I/O-bound jobs (Drive
+    uploads, listings) can run many at a time without queueing behind, or
+    holding up, local work.
+    """
+
+    def __init__(self, state_directory: Optional[str] = None, max_workers: Optional[int] = None):
+        self.state_directory = state_directory or config.get('jobs.state_directory', '.jobs')
+        self.max_workers = max_workers or config.get('jobs.max_workers', 2)
+        self.max_history = config.get('jobs.max_history', 100)
+        self._handlers: Dict[str, Callable[[Job], Any]] = {}
+        self._pools: Dict[str, Optional[str]] = {}
+        self._keep: Dict[str, int] = {}
+        self._listeners: List[Callable[[Job], None]] = []
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.RLock()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix='gemini-job')
+        self._executors: Dict[str, ThreadPoolExecutor] = {}
+        self.load_jobs()
+
+    def register(self, job_type: str, handler: Callable[[Job], Any], pool: Optional[str] = None,
+                 keep: Optional[int] = None) -> None:
+        """Register the handler for a job type and resume its queued jobs
+
+        Jobs of this type run on the named worker pool, or the default one.
+        With keep, only that many finished jobs of the type (plus its latest
+        completed one) are kept, apart from the jobs.max_history budget, so
+        frequent housekeeping jobs such as listings don't push other
+        results out of the history.
+        """
+        self._handlers[job_type] = handler
+        self._pools[job_type] = pool
+        if keep is not None:
+            self._keep[job_type] = keep
+
+        with self._lock:
+            pending = [job for job in self._jobs.values()
+                       if job.type == job_type and job.status == QUEUED]
+        for job in sorted(pending, key=lambda j: j.created_time):
+            self._executor_for(job_type).submit(self._run, job)
+
+    def _executor_for(self, job_type: str) -> ThreadPoolExecutor:
+        pool = self._pools.get(job_type)
+        if not pool:
+            return self._executor
+        with self._lock:
+            if pool not in self._executors:
+                workers = config.get(f'jobs.pools.{pool}', self.max_workers)
+                self._executors[pool] = ThreadPoolExecutor(max_workers=max(int(workers), 1),
+                                                           thread_name_prefix=f'gemini-job-{pool}')
+            return self._executors[pool]
+
+    def add_listener(self, callback: Callable[[Job], None]) -> None:
+        """Call callback(job) whenever a job's state is saved"""
+        self._listeners.append(callback)
+
+    def submit(self, job_type: str, params: Optional[Dict[str, Any]] = None, reuse_active: bool = False) -> Job:
+        """Queue a job and return it immediately
+
+        With reuse_active, a queued or running job of the same type and
+        parameters is returned instead of starting another one.
+        """
+        if job_type not in self._handlers:
+            raise ValueError(f"Unknown job type: {job_type}")
+
+        job = Job(job_type, params)
+        job._manager = self
+
+        with self._lock:
+            if reuse_active:
+                for active in self._jobs.values():
+                    if active.type == job_type and active.params == job.params and not active.finished:
+                        return active
+            self._jobs[job.id] = job
+            self.save_job(job)
+            self._prune_history()
+
+        self._executor_for(job_type).submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def latest(self, job_type: str, status: str = COMPLETED) -> Optional[Job]:
+        """The most recent job of a type with the given status, if any"""
+        for job in self.list_jobs():
+            if job.type == job_type and job.status == status:
+                return job
+        return None
+
+    def list_jobs(self) -> List[Job]:
+        """All known jobs, newest first"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return sorted(jobs, key=lambda j: j.created_time, reverse=True)
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued job, or ask a running job to stop after its current item"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job or job.finished:
+                return False
+
+            job.cancel_requested = True
+            if job.status == QUEUED:
+                job.status = CANCELLED
+                job.finished_time = datetime.now().isoformat()
+            self.save_job(job)
+            return True
+
+    def _run(self, job: Job) -> None:
+        with self._lock:
+            if job.status != QUEUED:
+                return
+            job.status = RUNNING
+            job.started_time = datetime.now().isoformat()
+            self.save_job(job)
+
+        try:
+            result = self._handlers[job.type](job)
+            status = CANCELLED if job.cancel_requested else COMPLETED
+            error = None
+        except Exception as e:
+            print(f"Job {job.id} ({job.type}) failed: {e}")
+            result, status, error = None, FAILED, str(e)
+
+        with self._lock:
+            job.result = result
+            job.status = status
+            job.error = error
+            job.finished_time = datetime.now().isoformat()
+            self.save_job(job)
+            if job.type in self._keep:
+                self._prune_history()
+
+    def _job_path(self, job_id: str) -> str:
+        return os.path.join(self.state_directory, f"{job_id}.json")
+
+    def save_job(self, job: Job) -> None:
+        """Persist a job's state"""
+        with self._lock:
+            try:
+                os.makedirs(self.state_directory, exist_ok=True)
+                path = self._job_path(job.id)
+                with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                    json.dump(job.to_dict(), f, default=str)
+                os.replace(path + '.tmp', path)
+            except Exception as e:
+                print(f"Error saving job {job.id}: {e}")
+
+            for callback in self._listeners:
+                try:
+                    callback(job)
+                except Exception as e:
+                    print(f"Error notifying job listener: {e}")
+
+    def load_jobs(self) -> None:
+        """Load persisted jobs; jobs that were running when the server stopped are marked interrupted"""
+        if not os.path.isdir(self.state_directory):
+            return
+
+        for name in os.listdir(self.state_directory):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.state_directory, name), 'r', encoding='utf-8') as f:
+                    job = Job.from_dict(json.load(f))
+            except Exception as e:
+                print(f"Error loading job {name}: {e}")
+                continue
+
+            job._manager = self
+            if job.status == RUNNING:
+                job.status = INTERRUPTED
+                job.finished_time = datetime.now().isoformat()
+                self.save_job(job)
+            self._jobs[job.id] = job
+
+    def _prune_history(self) -> None:
+        finished = [job for job in self.list_jobs() if job.finished]
+        expired = [job for job in finished if job.type not in self._keep][self.max_history:]
+        for job_type, keep in self._keep.items():
+            of_type = [job for job in finished if job.type == job_type]
+            latest_completed = next((job for job in of_type if job.status == COMPLETED), None)
+            expired.extend(job for job in of_type[keep:] if job is not latest_completed)
+
+        for job in expired:
+            self._jobs.pop(job.id, None)
+            try:
+                os.remove(self._job_path(job.id))
+            except OSError:
+                pass
@@ -0,0 +1,318 @@
+"""
+HTTP load generator for measuring the web interface's throughput and latency
+"""
+import gzip
+import http.client
+import json
+import logging
+import math
+import multiprocessing
+import os
+import random
+import threading
+import time
+import urllib.parse
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from .config import config
+
+# Route mix used when none is configured: the public gallery, the dashboard
+# and file list, single files, and the search API. {file} and {word} are
+# replaced with a corpus filename and a search word for every request.
+DEFAULT_ROUTES = [
+    (1, '/'),
+    (2, '/gemini-manager/'),
+    (1, '/gemini-manager/files'),
+    (2, '/gemini-manager/file/{file}'),
+    (2, '/gemini-manager/download/{file}'),
+    (3, '/api/search?q={word}'),
+    (1, '/api/file_metadata/{file}')
+]
+
+# Vocabulary of the synthetic corpus, and the words {word} is filled with
+WORDS = ('revenue', 'pipeline', 'roadmap', 'quarterly', 'forecast', 'dashboard', 'customer',
+         'retention', 'launch', 'pricing', 'analysis', 'chart', 'strategy', 'hiring', 'budget',
+         'marketing', 'design', 'prototype', 'research', 'summary', 'metrics', 'growth',
+         'onboarding', 'partner', 'workshop', 'timeline', 'campaign', 'survey', 'churn', 'sales')
+
+
+def seed_corpus(directory: str, count: int, size_kb: int = 20, seed: int = 0) -> List[str]:
+    """Write count synthetic exports to directory and return their filenames
+
+    The same seed always produces the same files (content, sizes and
+    modification times), so results are comparable between runs and
+    machines. A mix of files has images, links and Gemini Canvas markers.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    start = datetime(2025, 1, 1).timestamp()
+    filenames = []
+
+    for index in range(count):
+        filename = f'synthetic_{index:06d}.html'
+        title = ' '.join(rng.choice(WORDS) for _ in range(4)).title()
+        parts = [f'<!DOCTYPE html>\n<html><head><title>{title}</title>\n'
+                 f'<meta name="description" content="{" ".join(rng.sample(WORDS, 6))}">\n</head><body>\n'
+                 f'<h1>{title}</h1>\n']
+        if index % 4 != 0:
+            parts.append('<div class="gemini-canvas">Generated with Gemini Canvas</div>\n')
+        if index % 2 == 0:
+            parts.append(f'<img src="chart-{index}.png" alt="chart">\n')
+        if index % 3 == 0:
+            parts.append(f'<a href="https://example.com/{index}">source</a>\n')
+
+        size = sum(len(part) for part in parts)
+        target = max(size_kb, 1) * 1024 * rng.uniform(0.5, 1.5)
+        while size < target:
+            paragraph = '<p>' + ' '.join(rng.choice(WORDS) for _ in range(40)) + '</p>\n'
+            parts.append(paragraph)
+            size += len(paragraph)
+        parts.append('</body></html>\n')
+
+        path = os.path.join(directory, filename)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(''.join(parts))
+        modified = start + index * 3600 * 7
+        os.utime(path, (modified, modified))
+        filenames.append(filename)
+
+    return filenames
+
+
+def parse_route(spec: str) -> Tuple[float, str]:
+    """Parse a WEIGHT:PATH route spec (e.g. '3:/api/search?q={word}'); raises ValueError"""
+    weight, separator, path = spec.partition(':')
+    if not separator or not path.startswith('/'):
+        raise ValueError(f"Route must be WEIGHT:/path, got {spec!r}")
+    try:
+        weight_value = float(weight)
+    except ValueError:
+        raise ValueError(f"Invalid route weight {weight!r}")
+    if weight_value <= 0:
+        raise ValueError(f"Route weight must be positive: {spec!r}")
+    return weight_value, path
+
+
+def configured_routes() -> List[Tuple[float, str]]:
+    """The route mix from load_test.routes, or DEFAULT_ROUTES"""
+    routes = config.get('load_test.routes')
+    if not routes:
+        return list(DEFAULT_ROUTES)
+    return [parse_route(route) if isinstance(route, str) else (float(route['weight']), route['path'])
+            for route in routes]
+
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    """Nearest-rank percentile of already sorted values"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(fraction * len(sorted_values)), 1)
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def _latency_summary(latencies: List[float]) -> Dict[str, float]:
+    latencies = sorted(latencies)
+    return {
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else 0.0
+    }
+
+
+def _serve(export_directory: Optional[str], state_directory: str, connection) -> None:
+    """Run the web interface on a free local port (in a child process)"""
+    from werkzeug.serving import make_server
+
+    if export_directory:
+        config.set('html_manager.export_directory', export_directory)
+    config.set('jobs.state_directory', state_directory)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    from . import web_interface
+    if export_directory:
+        web_interface.file_manager.export_directory = export_directory
+    web_interface.job_manager.state_directory = state_directory
+
+    # The same threaded development server `web` and app.run() start
+    server = make_server('127.0.0.1', 0, web_interface.app, threaded=True)
+    connection.send(server.server_port)
+    server.serve_forever()
+
+
+class LocalServer:
+    """The web interface in a child process, for the load generator to target
+
+    A separate process keeps the load generator's threads from competing
+    with the server for the GIL, which would skew the measurements.
+    """
+
+    def __init__(self, export_directory: Optional[str] = None, state_directory: Optional[str] = None):
+        self.export_directory = export_directory
+        self.state_directory = state_directory or os.path.join(export_directory or '.', '.jobs')
+        self.process = None
+        self.url = None
+
+    def start(self, timeout: float = 30) -> str:
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        self.process = multiprocessing.Process(target=_serve, daemon=True,
+                                               args=(self.export_directory, self.state_directory, sender))
+        self.process.start()
+        if not receiver.poll(timeout):
+            self.stop()
+            raise RuntimeError('Web interface did not start')
+        self.url = f'http://127.0.0.1:{receiver.recv()}'
+        return self.url
+
+    def stop(self) -> None:
+        if self.process and self.process.is_alive():
+            self.process.terminate()
+            self.process.join(5)
+        self.process = None
+
+    def __enter__(self) -> str:
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+class LoadTest:
+    """Closed-loop load generator for a mix of GET routes
+
+    Each of `concurrency` threads keeps one HTTP/1.1 connection open and
+    sends requests back to back, picking a route from the weighted mix
+    with its own seeded random generator. Requests started during the
+    warmup are not counted. A response with status 400 or above, or a
+    failed connection, counts as an error.
+    """
+
+    def __init__(self, base_url: str, routes: Optional[List[Tuple[float, str]]] = None,
+                 filenames: Optional[List[str]] = None, words: Sequence[str] = WORDS,
+                 timeout: float = 30, seed: int = 0):
+        parsed = urllib.parse.urlsplit(base_url)
+        self.host = parsed.hostname or '127.0.0.1'
+        self.port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+        self.https = parsed.scheme == 'https'
+        self.prefix = parsed.path.rstrip('/')
+        self.routes = routes or configured_routes()
+        self.filenames = filenames
+        self.words = list(words)
+        self.timeout = timeout
+        self.seed = seed
+
+    def _connection(self):
+        connection_class = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        return connection_class(self.host, self.port, timeout=self.timeout)
+
+    def _get(self, connection, path: str) -> Tuple[int, bytes]:
+        connection.request('GET', self.prefix + path, headers={'Accept-Encoding': 'gzip'})
+        response = connection.getresponse()
+        return response.status, response.read()
+
+    def discover_filenames(self) -> List[str]:
+        """Filenames the server lists, used to fill in {file}"""
+        connection = self._connection()
+        try:
+            status, body = self._get(connection, '/api/search?fields=filename')
+        finally:
+            connection.close()
+        if status != 200:
+            raise RuntimeError(f"Could not list files (HTTP {status})")
+        if body[:2] == b'\x1f\x8b':
+            body = gzip.decompress(body)
+        return [entry['filename'] for entry in json.loads(body)['files']]
+
+    def _fill(self, path: str, rng: random.Random) -> str:
+        if '{file}' in path:
+            path = path.replace('{file}', urllib.parse.quote(rng.choice(self.filenames)))
+        if '{word}' in path:
+            path = path.replace('{word}', urllib.parse.quote(rng.choice(self.words)))
+        return path
+
+    def run_level(self, concurrency: int, duration: float, warmup: float = 0) -> Dict[str, Any]:
+        """Run the mix at one concurrency level and summarize it"""
+        if self.filenames is None and any('{file}' in path for _, path in self.routes):
+            self.filenames = self.discover_filenames()
+        routes = [(weight, path) for weight, path in self.routes
+                  if '{file}' not in path or self.filenames]
+        if not routes:
+            raise ValueError('No routes to request (routes with {file} need at least one file)')
+        paths = [path for _, path in routes]
+        weights = [weight for weight, _ in routes]
+
+        measure_from = time.perf_counter() + warmup
+        stop_at = measure_from + duration
+        samples: List[List[Tuple[str, Optional[int], float, int]]] = [[] for _ in range(concurrency)]
+
+        def worker(index: int) -> None:
+            rng = random.Random(self.seed * 1000003 + concurrency * 1009 + index)
+            connection = self._connection()
+            recorded = samples[index]
+            while True:
+                started = time.perf_counter()
+                if started >= stop_at:
+                    break
+                route = rng.choices(paths, weights)[0]
+                try:
+                    status, body = self._get(connection, self._fill(route, rng))
+                    size = len(body)
+                except Exception:
+                    status, size = None, 0
+                    connection.close()
+                    connection = self._connection()
+                if started >= measure_from:
+                    recorded.append((route, status, time.perf_counter() - started, size))
+            connection.close()
+
+        threads = [threading.Thread(target=worker, args=(index,), daemon=True) for index in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = max(time.perf_counter() - measure_from, 1e-9)
+
+        by_route: Dict[str, Dict[str, Any]] = {}
+        latencies = []
+        errors = 0
+        statuses: Dict[str, int] = {}
+        total_bytes = 0
+        for route, status, latency, size in (sample for recorded in samples for sample in recorded):
+            failed = status is None or status >= 400
+            route_stats = by_route.setdefault(route, {'requests': 0, 'errors': 0, 'latencies': []})
+            route_stats['requests'] += 1
+            route_stats['errors'] += failed
+            route_stats['latencies'].append(latency)
+            latencies.append(latency)
+            errors += failed
+            total_bytes += size
+            key = str(status) if status is not None else 'connection_error'
+            statuses[key] = statuses.get(key, 0) + 1
+
+        requests = len(latencies)
+        result = {
+            'concurrency': concurrency,
+            'seconds': round(elapsed, 3),
+            'requests': requests,
+            'errors': errors,
+            'error_rate': round(errors / requests, 4) if requests else 0.0,
+            'requests_per_second': round(requests / elapsed, 1),
+            'mb_per_second': round(total_bytes / elapsed / (1024 * 1024), 2),
+            'statuses': statuses
+        }
+        result.update(_latency_summary(latencies))
+        result['routes'] = {}
+        for route, route_stats in sorted(by_route.items()):
+            summary = {
+                'requests': route_stats['requests'],
+                'errors': route_stats['errors'],
+                'error_rate': round(route_stats['errors'] / route_stats['requests'], 4),
+                'requests_per_second': round(route_stats['requests'] / elapsed, 1)
+            }
+            summary.update(_latency_summary(route_stats['latencies']))
+            result['routes'][route] = summary
+        return result
+
+    def run(self, levels: Sequence[int], duration: float, warmup: float = 0) -> List[Dict[str, Any]]:
+        """Run the mix at each concurrency level in turn"""
+        return [self.run_level(concurrency, duration, warmup) for concurrency in levels]
@@ -0,0 +1,133 @@
+"""
+HTML slimming for imported exports
+
+Conservative, regex-based minification: whitespace and comments are removed
+from markup and inline CSS (leaving its quoted strings and url() values as
+they are), inline JS only loses indentation and blank lines (and is left as
+is if it has template literals), and <pre>/<textarea> content is left
+untouched.
+"""
+import re
+from typing import Dict, List, Tuple
+
+PROTECTED_BLOCK_RE = re.compile(
+    r'(<(pre|textarea|script|style)\b[^>]*>)(.*?)(</\2\s*>)',
+    re.IGNORECASE | re.DOTALL
+)
+HTML_COMMENT_RE = re.compile(r'<!--(?!\[if|<!|>).*?-->', re.DOTALL)
+# Comments, quoted strings and unquoted url() values, matched together so a
+# quote inside a comment (or /* inside a string) is read correctly
+CSS_TOKEN_RE = re.compile(
+    r'/\*.*?\*/|"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|\burl\([^)"\']*\)',
+    re.IGNORECASE | re.DOTALL
+)
+EXTERNAL_ASSET_RE = re.compile(
+    r'<script\b[^>]*\bsrc\s*=\s*["\']([^"\']+)["\'][^>]*>\s*</script\s*>'
+    r'|<link\b[^>]*\brel\s*=\s*["\']?stylesheet["\']?[^>]*>',
+    re.IGNORECASE
+)
+LINK_HREF_RE = re.compile(r'\bhref\s*=\s*["\']([^"\']+)["\']', re.IGNORECASE)
+PLACEHOLDER = '\x00slim{}\x00'
+PLACEHOLDER_RE = re.compile('\x00slim(\\d+)\x00')
+CSS_PLACEHOLDER = '\x00css{}\x00'
+CSS_PLACEHOLDER_RE = re.compile('\x00css(\\d+)\x00')
+
+
+def minify_css(css: str) -> str:
+    """Strip comments and redundant whitespace from a stylesheet
+
+    Strings and url() values are set aside first, so whitespace and
+    punctuation inside them (e.g. content: "a ; b") are kept.
+    """
+    literals: List[str] = []
+
+    def protect(match: re.Match) -> str:
+        if match.group(0).startswith('/*'):
+            return ''
+        literals.append(match.group(0))
+        return CSS_PLACEHOLDER.format(len(literals) - 1)
+
+    css = CSS_TOKEN_RE.sub(protect, css)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,])\s*', r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    # Spaces before a colon only matter in selectors, so only drop them in declarations
+    css = re.sub(r'\{([^{}]*)\}', lambda m: '{' + re.sub(r'\s+:', ':', m.group(1)) + '}', css)
+    css = css.replace(';}', '}')
+    return CSS_PLACEHOLDER_RE.sub(lambda m: literals[int(m.group(1))], css.strip())
+
+
+def minify_js(js: str) -> str:
+    """Strip indentation and blank lines from a script
+
+    Newlines are kept so automatic semicolon insertion behaves as before.
+    Scripts with template literals are left alone, since the whitespace
+    inside a multi-line `...` string is part of its value.
+    """
+    if '`' in js:
+        return js
+    lines = (line.strip() for line in js.splitlines())
+    return '\n'.join(line for line in lines if line)
+
+
+def minify_markup(markup: str) -> str:
+    """Strip comments, indentation and repeated spaces from markup"""
+    markup = HTML_COMMENT_RE.sub('', markup)
+    markup = re.sub(r'[ \t]*\n\s*', '\n', markup)
+    markup = re.sub(r'[ \t]{2,}', ' ', markup)
+    return markup
+
+
+def _dedupe_external_assets(content: str, stats: Dict[str, int]) -> str:
+    """Drop repeated <script src> and stylesheet <link> tags for the same URL"""
+    seen = set()
+
+    def replace(match: re.Match) -> str:
+        if match.group(1) is not None:
+            key = ('script', match.group(1))
+        else:
+            href = LINK_HREF_RE.search(match.group(0))
+            key = ('link', href.group(1) if href else match.group(0))
+
+        if key in seen:
+            stats['duplicate_assets'] += 1
+            return ''
+        seen.add(key)
+        return match.group(0)
+
+    return EXTERNAL_ASSET_RE.sub(replace, content)
+
+
+def slim_html(content: str) -> Tuple[str, Dict[str, int]]:
+    """Minify an HTML document and deduplicate identical inline assets
+
+    Returns the slimmed document and counters describing what was removed.
+    """
+    stats = {'duplicate_styles': 0, 'duplicate_assets': 0}
+    blocks: List[str] = []
+    seen_styles = set()
+
+    def protect(match: re.Match) -> str:
+        open_tag, tag, body, close_tag = match.groups()
+        tag = tag.lower()
+
+        if tag == 'style':
+            body = minify_css(body)
+            # The same rules under a different media/attribute are a different sheet
+            key = (re.sub(r'\s+', ' ', open_tag.lower()), body)
+            if key in seen_styles:
+                stats['duplicate_styles'] += 1
+                return ''
+            seen_styles.add(key)
+        elif tag == 'script':
+            body = minify_js(body)
+
+        blocks.append(open_tag + body + close_tag)
+        return PLACEHOLDER.format(len(blocks) - 1)
+
+    slimmed = _dedupe_external_assets(content, stats)
+    slimmed = PROTECTED_BLOCK_RE.sub(protect, slimmed)
+    slimmed = minify_markup(slimmed)
+    slimmed = PLACEHOLDER_RE.sub(lambda m: blocks[int(m.group(1))], slimmed)
+
+    return slimmed.strip() + '\n', stats
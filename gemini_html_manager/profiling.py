@@ -0,0 +1,254 @@
+"""
+Per-request profiling and slow-request capture for the web interface
+"""
+import cProfile
+import hmac
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from flask import Flask, g, request
+from .config import config
+
+CPROFILE = 'cprofile'
+SAMPLING = 'sampling'
+
+ADMIN_TOKEN_HEADER = 'X-Admin-Token'
+PROFILE_HEADER = 'X-Profile'
+PROFILE_ID_HEADER = 'X-Profile-Id'
+
+
+def _frame_label(code) -> str:
+    """function (package/module.py:line) for a code object"""
+    path = code.co_filename.replace(os.sep, '/')
+    short = '/'.join(path.rsplit('/', 2)[-2:])
+    return f"{code.co_name} ({short}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples the Python stacks of tracked threads at a fixed interval
+
+    A single daemon thread reads sys._current_frames() every interval while
+    at least one thread is tracked, and counts each tracked thread's stack
+    in collapsed form ("outer;...;inner"). It sleeps while nothing is
+    tracked, so it costs nothing between requests.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._tracked: Dict[int, Counter] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def track(self, thread_id: int) -> None:
+        with self._lock:
+            self._tracked[thread_id] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='request-sampler', daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def untrack(self, thread_id: int) -> Counter:
+        """Stop sampling a thread and return its stack counts"""
+        with self._lock:
+            return self._tracked.pop(thread_id, None) or Counter()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while True:
+            self._wake.wait()
+            with self._lock:
+                if not self._tracked:
+                    self._wake.clear()
+                    continue
+                thread_ids = list(self._tracked)
+            frames = sys._current_frames()
+            for thread_id in thread_ids:
+                frame = frames.get(thread_id)
+                if frame is None or thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                with self._lock:
+                    counts = self._tracked.get(thread_id)
+                    if counts is not None:
+                        counts[';'.join(reversed(stack))] += 1
+            del frames
+            time.sleep(self.interval)
+
+
+class RequestProfiler:
+    """Opt-in cProfile of single requests, and sampled profiles of slow ones
+
+    A request is profiled with cProfile when it carries X-Profile together
+    with the admin token in X-Admin-Token, or when its path starts with one
+    of profiling.profile_paths. With profiling.slow_request_ms set, every
+    other request is watched by a StackSampler, and those taking longer
+    than the threshold keep their sampled stacks. Either kind of profile
+    goes into a ring buffer of the last profiling.max_profiles captures.
+
+    Timing runs from before_request to after_request, i.e. the view and
+    its rendering; the body of a streamed response is not included.
+    """
+
+    def __init__(self, app: Optional[Flask] = None):
+        self.admin_token = config.get('profiling.admin_token', '') or ''
+        self.profile_paths = tuple(config.get('profiling.profile_paths', []) or [])
+        self.slow_request_ms = config.get('profiling.slow_request_ms', 0) or 0
+        self.max_profiles = config.get('profiling.max_profiles', 20)
+        self.sampler = StackSampler(config.get('profiling.sample_interval_ms', 5) / 1000)
+        self._profiles: 'deque[Dict[str, Any]]' = deque(maxlen=self.max_profiles)
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+    def is_admin(self) -> bool:
+        """Whether the current request carries the admin token (never true if none is configured)"""
+        supplied = request.headers.get(ADMIN_TOKEN_HEADER, '')
+        return bool(self.admin_token) and hmac.compare_digest(supplied.encode(), self.admin_token.encode())
+
+    def _wants_cprofile(self) -> Optional[str]:
+        if request.headers.get(PROFILE_HEADER) and self.is_admin():
+            return 'header'
+        if self.profile_paths and request.path.startswith(self.profile_paths):
+            return 'config'
+        return None
+
+    def _before_request(self) -> None:
+        if request.path.startswith('/api/admin/'):
+            return
+        trigger = self._wants_cprofile()
+        if trigger:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError as e:
+                # Only one cProfile can run at a time on Python 3.12+
+                print(f"Could not profile {request.path}: {e}")
+            else:
+                g.profile = (CPROFILE, trigger, profile)
+        elif self.slow_request_ms:
+            self.sampler.track(threading.get_ident())
+            g.profile = (SAMPLING, 'slow', None)
+        if 'profile' in g:
+            g.profile_started = (time.perf_counter(), datetime.now())
+
+    def _after_request(self, response):
+        profile = g.pop('profile', None)
+        if profile is None:
+            return response
+
+        kind, trigger, profiler = profile
+        started, started_at = g.pop('profile_started')
+        duration_ms = (time.perf_counter() - started) * 1000
+        record = {
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'duration_ms': round(duration_ms, 2),
+            'started': started_at.isoformat(timespec='milliseconds'),
+            'kind': kind,
+            'trigger': trigger
+        }
+
+        if kind == CPROFILE:
+            profiler.disable()
+            profiler.create_stats()
+            record['data'] = marshal.dumps(profiler.stats)
+            record['calls'] = sum(stat[1] for stat in profiler.stats.values())
+        else:
+            stacks = self.sampler.untrack(threading.get_ident())
+            if duration_ms < self.slow_request_ms or response.is_streamed:
+                return response
+            record['stacks'] = dict(stacks)
+            record['samples'] = sum(stacks.values())
+
+        record['id'] = uuid.uuid4().hex[:12]
+        with self._lock:
+            self._profiles.append(record)
+        response.headers[PROFILE_ID_HEADER] = record['id']
+        return response
+
+    def _teardown_request(self, error=None) -> None:
+        # after_request is skipped when a view raises; stop profiling regardless
+        profile = g.pop('profile', None)
+        if profile is None:
+            return
+        if profile[0] == CPROFILE:
+            profile[2].disable()
+        else:
+            self.sampler.untrack(threading.get_ident())
+
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        """Captured profiles, newest first, without their data"""
+        with self._lock:
+            profiles = list(self._profiles)
+        return [{key: value for key, value in record.items() if key not in ('data', 'stacks')}
+                for record in reversed(profiles)]
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            for record in self._profiles:
+                if record['id'] == profile_id:
+                    return record
+        return None
+
+    @staticmethod
+    def report(record: Dict[str, Any], limit: int = 40) -> str:
+        """Human-readable summary of a captured profile"""
+        out = io.StringIO()
+        out.write(f"{record['method']} {record['path']} -> {record['status']} in {record['duration_ms']:.1f}ms "
+                  f"({record['kind']}, {record['trigger']})\n\n")
+        if record['kind'] == CPROFILE:
+            stats = pstats.Stats(_StatsSource(marshal.loads(record['data'])), stream=out)
+            stats.sort_stats('cumulative').print_stats(limit)
+            return out.getvalue()
+
+        stacks = record['stacks']
+        total = sum(stacks.values()) or 1
+        inclusive: Counter = Counter()
+        own: Counter = Counter()
+        for stack, count in stacks.items():
+            frames = stack.split(';')
+            own[frames[-1]] += count
+            for frame in set(frames):
+                inclusive[frame] += count
+        out.write(f"{total} samples\n\n{'Own %':>7} {'Total %':>8}  Function\n")
+        for frame, count in inclusive.most_common(limit):
+            out.write(f"{own[frame] * 100 / total:>6.1f}% {count * 100 / total:>7.1f}%  {frame}\n")
+        return out.getvalue()
+
+    @staticmethod
+    def download(record: Dict[str, Any]):
+        """(body, mimetype, filename) to save a profile: pstats dump or collapsed stacks"""
+        name = f"profile-{record['id']}"
+        if record['kind'] == CPROFILE:
+            return record['data'], 'application/octet-stream', f'{name}.prof'
+        body = ''.join(f"{stack} {count}\n" for stack, count in sorted(record['stacks'].items()))
+        return body.encode('utf-8'), 'text/plain', f'{name}.folded'
+
+
+class _StatsSource:
+    """Stand-in profile object so pstats.Stats can load stats kept in memory"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self) -> None:
+        pass
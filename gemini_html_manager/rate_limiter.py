@@ -0,0 +1,215 @@
+"""
+Client-side rate limiting and retries for Google API calls
+"""
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+import httplib2
+from googleapiclient.errors import HttpError
+from .config import config
+
+# 403 reasons that mean "slow down" rather than "not allowed"
+RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded', 'sharingRateLimitExceeded')
+USER_RATE_LIMIT_REASONS = ('userRateLimitExceeded', 'sharingRateLimitExceeded')
+SERVER_ERROR_STATUSES = (500, 502, 503, 504)
+TRANSIENT_ERRORS = (ConnectionError, TimeoutError, httplib2.HttpLib2Error)
+
+
+class TokenBucket:
+    """Token bucket whose rate can be lowered and raised while in use
+
+    Tokens refill at `rate` per second up to `capacity`. acquire() takes its
+    tokens straight away, going into debt if there are not enough, and then
+    sleeps until the debt would have been repaid - so callers are served in
+    the order they arrive and never spin.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Take tokens, waiting as long as needed; returns the seconds waited"""
+        with self._lock:
+            self._refill()
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            self._sleep(wait)
+        return wait
+
+    def decrease(self, factor: float, min_rate: float) -> None:
+        """Multiplicative decrease after the server pushed back"""
+        with self._lock:
+            self._refill()
+            self.rate = max(min(min_rate, self.max_rate), self.rate * factor)
+
+    def increase(self, step: float) -> None:
+        """Additive increase after a success, up to the configured rate
+
+        Each success adds step / rate, so a bucket running at full speed
+        regains about `step` requests per second every second.
+        """
+        with self._lock:
+            if self.rate < self.max_rate:
+                self._refill()
+                self.rate = min(self.max_rate, self.rate + step / self.rate)
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+class AdaptiveRateLimiter:
+    """Paces and retries API requests for one user within a shared project quota
+
+    Every request takes a token from the user's bucket and from the
+    project's bucket (shared by every user in the process). Rate-limit
+    responses (429, or 403 rateLimitExceeded / userRateLimitExceeded) halve
+    the rate of the buckets they refer to, and each success raises it again
+    additively (AIMD), so the request rate settles just under what the server
+    accepts. Rate limits, 5xx responses and transport errors are retried with
+    exponential backoff and full jitter, honouring Retry-After.
+    """
+
+    def __init__(self, user_bucket: TokenBucket, project_bucket: TokenBucket,
+                 settings: Optional[Dict[str, Any]] = None,
+                 sleep: Callable[[float], None] = time.sleep, rng: Optional[random.Random] = None):
+        settings = settings if settings is not None else config.get('google.rate_limit', {})
+        self.user_bucket = user_bucket
+        self.project_bucket = project_bucket
+        self.max_retries = settings.get('max_retries', 8)
+        self.initial_backoff = settings.get('initial_backoff', 1.0)
+        self.max_backoff = settings.get('max_backoff', 64.0)
+        self.min_rate = settings.get('min_requests_per_second', 0.5)
+        self.decrease_factor = settings.get('decrease_factor', 0.5)
+        self.additive_increase = settings.get('additive_increase', 1.0)
+        self._sleep = sleep
+        self._random = rng or random.Random()
+        self._lock = threading.Lock()
+        self._stats = {'requests': 0, 'retries': 0, 'rate_limited': 0, 'server_errors': 0,
+                       'transport_errors': 0, 'failures': 0, 'waited_seconds': 0.0}
+
+    def execute(self, request: Any, cost: int = 1) -> Any:
+        """Execute a googleapiclient request (or batch of `cost` calls) with pacing and retries
+
+        Raises the last error once max_retries retries have failed, or at once
+        for errors that a retry cannot fix.
+        """
+        return self.call(request.execute, cost)
+
+    def call(self, function: Callable[[], Any], cost: int = 1) -> Any:
+        """Like execute(), for any function making `cost` API calls (e.g. a download's next_chunk)"""
+        attempt = 0
+        while True:
+            waited = self.user_bucket.acquire(cost) + self.project_bucket.acquire(cost)
+            self._count('requests', waited_seconds=waited)
+            try:
+                result = function()
+            except HttpError as e:
+                kind = self.classify(e)
+                if kind is None or attempt >= self.max_retries:
+                    self._count('failures')
+                    raise
+                if kind == 'server_error':
+                    self._count('server_errors')
+                else:
+                    self._count('rate_limited')
+                    # A project-wide limit also slows every user down, so
+                    # whichever bucket is the tighter one halves either way
+                    self.user_bucket.decrease(self.decrease_factor, self.min_rate)
+                    if kind == 'rate_limit':
+                        self.project_bucket.decrease(self.decrease_factor, self.min_rate)
+                retry_after = _retry_after(e)
+            except TRANSIENT_ERRORS:
+                if attempt >= self.max_retries:
+                    self._count('failures')
+                    raise
+                self._count('transport_errors')
+                retry_after = 0.0
+            else:
+                self.user_bucket.increase(self.additive_increase)
+                self.project_bucket.increase(self.additive_increase)
+                return result
+
+            attempt += 1
+            self._count('retries')
+            self._sleep(max(self.backoff(attempt), min(retry_after, self.max_backoff)))
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter delay before retry number `attempt`"""
+        ceiling = min(self.max_backoff, self.initial_backoff * 2 ** (attempt - 1))
+        with self._lock:
+            return self._random.uniform(0, ceiling)
+
+    @staticmethod
+    def classify(error: HttpError) -> Optional[str]:
+        """'user_rate_limit', 'rate_limit', 'server_error', or None if not retryable"""
+        status = error.resp.status
+        reasons = _error_reasons(error)
+        if status == 429 or (status == 403 and any(reason in RATE_LIMIT_REASONS for reason in reasons)):
+            if any(reason in USER_RATE_LIMIT_REASONS for reason in reasons):
+                return 'user_rate_limit'
+            return 'rate_limit'
+        if status in SERVER_ERROR_STATUSES:
+            return 'server_error'
+        return None
+
+    def _count(self, name: str, waited_seconds: float = 0.0) -> None:
+        with self._lock:
+            self._stats[name] += 1
+            self._stats['waited_seconds'] += waited_seconds
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['waited_seconds'] = round(stats['waited_seconds'], 3)
+        stats['user_rate'] = round(self.user_bucket.rate, 2)
+        stats['project_rate'] = round(self.project_bucket.rate, 2)
+        return stats
+
+
+_limiters: Dict[str, AdaptiveRateLimiter] = {}
+_project_bucket: Optional[TokenBucket] = None
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(user: str) -> AdaptiveRateLimiter:
+    """The limiter for a user, sharing the process-wide project bucket
+
+    Rates come from google.rate_limit when a user's limiter is first created.
+    """
+    global _project_bucket
+    settings = config.get('google.rate_limit', {})
+    burst = settings.get('burst', 10)
+
+    with _limiters_lock:
+        if _project_bucket is None:
+            _project_bucket = TokenBucket(settings.get('project_requests_per_second', 100), burst)
+        if user not in _limiters:
+            user_bucket = TokenBucket(settings.get('user_requests_per_second', 10), burst)
+            _limiters[user] = AdaptiveRateLimiter(user_bucket, _project_bucket, settings)
+        return _limiters[user]
+
+
+def _error_reasons(error: HttpError) -> list:
+    details = error.error_details
+    if isinstance(details, list):
+        return [detail.get('reason') for detail in details if isinstance(detail, dict)]
+    return [details] if details else []
+
+
+def _retry_after(error: HttpError) -> float:
+    try:
+        return float(error.resp.get('retry-after', 0))
+    except (TypeError, ValueError):
+        return 0.0
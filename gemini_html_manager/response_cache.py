@@ -0,0 +1,115 @@
+"""
+Rendered-response cache for catalog-backed views
+"""
+import threading
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Dict, Hashable, Optional, Tuple
+from flask import Response, current_app, get_flashed_messages, request, session
+from .catalog import Catalog
+from .config import config
+
+
+class ResponseCache:
+    """LRU cache of rendered responses, keyed by route, query and catalog generation
+
+    Views wrapped with cached() refresh the catalog first, so a change in the
+    export directory moves the generation on and the next request renders
+    afresh. Entries from older generations are dropped as soon as the catalog
+    reports a change. The cache is bounded by the total size of the cached
+    bodies.
+    """
+
+    def __init__(self, catalog: Catalog, max_bytes: Optional[int] = None, enabled: Optional[bool] = None):
+        self.catalog = catalog
+        self.max_bytes = max_bytes or config.get('cache.max_bytes', 32 * 1024 * 1024)
+        self.enabled = config.get('cache.enabled', True) if enabled is None else enabled
+        self._entries: 'OrderedDict[Hashable, Tuple[bytes, int, Dict[str, str]]]' = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        catalog.add_listener(self._on_catalog_change)
+
+    def cached(self, view):
+        """Decorator for GET views whose output depends only on the catalog and query string"""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            self.catalog.refresh()
+            # Pages render pending flash messages, which belong to one visitor
+            if not self.enabled or request.method != 'GET' or session.get('_flashes'):
+                return view(*args, **kwargs)
+
+            key = (request.endpoint, tuple(sorted(kwargs.items())),
+                   tuple(sorted(request.args.items(multi=True))), self.catalog.generation)
+            cached = self.get(key)
+            if cached is not None:
+                body, status, headers = cached
+                response = Response(body, status=status, headers=headers)
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed and not get_flashed_messages():
+                self.put(key, response.get_data(), response.status_code,
+                         {'Content-Type': response.headers.get('Content-Type', 'text/html')})
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+
+    def get(self, key: Hashable) -> Optional[Tuple[bytes, int, Dict[str, str]]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Hashable, body: bytes, status: int, headers: Dict[str, str]) -> None:
+        if len(body) > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old[0])
+            self._entries[key] = (body, status, headers)
+            self._size += len(body)
+
+            while self._size > self.max_bytes:
+                _, (evicted, _, _) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _on_catalog_change(self, changes: Dict[str, Any]) -> None:
+        """Drop entries rendered from an older catalog generation"""
+        generation = self.catalog.generation
+        with self._lock:
+            for key in [key for key in self._entries if key[-1] != generation]:
+                self._size -= len(self._entries.pop(key)[0])
+                self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'size_bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'generation': self.catalog.generation
+            }
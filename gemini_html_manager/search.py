@@ -0,0 +1,504 @@
+"""
+Structured search over the in-memory catalog
+
+Query language
+--------------
+- Bare words match (by prefix) words in the filename, title, description or
+  text, e.g. ``sales chart``. Quoted phrases match as substrings of the
+  filename, title or description: ``"q3 report"``.
+- Field qualifiers: ``title:``, ``filename:`` (``name:``), ``description:``
+  (``desc:``) match substrings; ``text:`` matches words in the body text.
+- Numeric and date fields: ``size``, ``words``, ``created``, ``modified``
+  with ``:``, ``>``, ``>=``, ``<``, ``<=`` or a ``lo..hi`` range, e.g.
+  ``size>2mb``, ``words<500``, ``created:2025-01..2025-03``.
+  Dates may be ``YYYY``, ``YYYY-MM`` or ``YYYY-MM-DD`` and cover the whole
+  period.
+- Flags: ``has:images``, ``has:links``, ``is:canvas``.
+- Boolean operators: terms are ANDed; ``OR``, ``AND``, ``NOT`` (or a
+  leading ``-``) and parentheses combine them.
+
+Every term is evaluated against columns and indexes built once per catalog
+generation, so no file is opened while searching. Result sets are bitmaps
+(Python ints, bit i = document i).
+
+Facets
+------
+facets() counts a result bitmap against precomputed flag, creation-date and
+size-band bitmaps with one AND and a popcount each, so facet counts never
+look at the matching entries themselves.
+"""
+import re
+import bisect
+from datetime import datetime
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+
+class QueryError(ValueError):
+    """Raised for queries that can't be parsed"""
+
+
+SUBSTRING_FIELDS = {
+    'title': 'title',
+    'filename': 'filename',
+    'name': 'filename',
+    'description': 'description',
+    'desc': 'description',
+}
+NUMERIC_FIELDS = {
+    'size': 'size_bytes',
+    'words': 'word_count',
+    'word_count': 'word_count',
+}
+DATE_FIELDS = {
+    'created': 'created_timestamp',
+    'modified': 'modified_timestamp',
+}
+FLAGS = {
+    ('has', 'images'): 'has_images',
+    ('has', 'image'): 'has_images',
+    ('has', 'links'): 'has_links',
+    ('has', 'link'): 'has_links',
+    ('is', 'canvas'): 'is_gemini_canvas',
+    ('is', 'gemini'): 'is_gemini_canvas',
+}
+KNOWN_FIELDS = set(SUBSTRING_FIELDS) | set(NUMERIC_FIELDS) | set(DATE_FIELDS) | {'text', 'has', 'is'}
+
+SIZE_UNITS = {'': 1, 'b': 1, 'kb': 1024, 'k': 1024, 'mb': 1024 ** 2, 'm': 1024 ** 2,
+              'gb': 1024 ** 3, 'g': 1024 ** 3}
+
+# (label, query term, lower bound, exclusive upper bound) in bytes
+SIZE_BANDS = [
+    ('< 100 KB', 'size<100kb', None, 100 * 1024),
+    ('100 KB - 1 MB', 'size>=100kb size<1mb', 100 * 1024, 1024 ** 2),
+    ('1 - 10 MB', 'size>=1mb size<10mb', 1024 ** 2, 10 * 1024 ** 2),
+    ('> 10 MB', 'size>=10mb', 10 * 1024 ** 2, None),
+]
+FACET_FLAGS = ('is_gemini_canvas', 'has_images', 'has_links')
+
+WORD_RE = re.compile(r'\w+')
+FIELD_TERM_RE = re.compile(r'^([a-z_]+)(>=|<=|:|>|<|=)(.*)$', re.IGNORECASE)
+MAX_TOKEN_LENGTH = 40
+
+
+def tokenize(text: str) -> FrozenSet[str]:
+    """Distinct lowercase words in a piece of text"""
+    return frozenset(token for token in WORD_RE.findall(text.lower()) if len(token) <= MAX_TOKEN_LENGTH)
+
+
+def popcount(bitmap: int) -> int:
+    """Number of documents in a bitmap"""
+    return bitmap.bit_count() if hasattr(bitmap, 'bit_count') else bin(bitmap).count('1')
+
+
+def bitmap_from_ids(ids: Sequence[int], size: int) -> int:
+    """Build a bitmap from document ids"""
+    bits = bytearray((size + 7) // 8)
+    for doc_id in ids:
+        bits[doc_id >> 3] |= 1 << (doc_id & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def ids_from_bitmap(bitmap: int) -> List[int]:
+    """Document ids in a bitmap, in ascending order"""
+    ids = []
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')
+    for byte_index, byte in enumerate(data):
+        if byte:
+            base = byte_index << 3
+            for bit in range(8):
+                if byte & (1 << bit):
+                    ids.append(base + bit)
+    return ids
+
+
+# ---------------------------------------------------------------------------
+# Parsing
+# ---------------------------------------------------------------------------
+
+def _split_query(query: str) -> List[str]:
+    """Split a query into words, quoted strings and parentheses"""
+    tokens = []
+    i = 0
+    while i < len(query):
+        char = query[i]
+        if char.isspace():
+            i += 1
+        elif char in '()':
+            tokens.append(char)
+            i += 1
+        else:
+            start = i
+            in_quotes = False
+            while i < len(query):
+                char = query[i]
+                if char == '"':
+                    in_quotes = not in_quotes
+                elif not in_quotes and (char.isspace() or char in '()'):
+                    break
+                i += 1
+            if in_quotes:
+                raise QueryError('Unterminated quote in query')
+            tokens.append(query[start:i])
+    return tokens
+
+
+class _Parser:
+    """Recursive descent parser producing a small tuple-based syntax tree"""
+
+    def __init__(self, tokens: List[str]):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self) -> Optional[str]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def take(self) -> str:
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            return ('all',)
+        node = self.parse_or()
+        if self.peek() is not None:
+            raise QueryError(f"Unexpected '{self.peek()}' in query")
+        return node
+
+    def parse_or(self):
+        node = self.parse_and()
+        while self.peek() == 'OR':
+            self.take()
+            node = ('or', node, self.parse_and())
+        return node
+
+    def parse_and(self):
+        node = self.parse_unary()
+        while self.peek() not in (None, 'OR', ')'):
+            if self.peek() == 'AND':
+                self.take()
+            node = ('and', node, self.parse_unary())
+        return node
+
+    def parse_unary(self):
+        token = self.peek()
+        if token is None:
+            raise QueryError('Query ends unexpectedly')
+        if token == 'NOT':
+            self.take()
+            return ('not', self.parse_unary())
+        if token.startswith('-') and len(token) > 1:
+            self.tokens[self.position] = token[1:]
+            return ('not', self.parse_unary())
+        if token == '(':
+            self.take()
+            node = self.parse_or()
+            if self.peek() != ')':
+                raise QueryError('Missing closing parenthesis')
+            self.take()
+            return node
+        if token == ')':
+            raise QueryError("Unexpected ')' in query")
+        return parse_term(self.take())
+
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value.startswith('"') and value.endswith('"'):
+        return value[1:-1]
+    return value
+
+
+def parse_size(value: str) -> int:
+    match = re.match(r'^(\d+(?:\.\d+)?)\s*([a-z]*)$', value.strip().lower())
+    if not match or match.group(2) not in SIZE_UNITS:
+        raise QueryError(f"Invalid size: {value}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2)])
+
+
+def parse_date_period(value: str) -> Tuple[float, float]:
+    """Parse YYYY, YYYY-MM or YYYY-MM-DD into a [start, end) timestamp range"""
+    value = value.strip()
+    for fmt, step in (('%Y-%m-%d', 'day'), ('%Y-%m', 'month'), ('%Y', 'year')):
+        try:
+            start = datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        if step == 'day':
+            end = datetime.fromordinal(start.toordinal() + 1)
+        elif step == 'month':
+            end = start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+        else:
+            end = start.replace(year=start.year + 1)
+        return start.timestamp(), end.timestamp()
+    raise QueryError(f"Invalid date: {value}")
+
+
+def _range_term(column: str, op: str, value: str, parse_value) -> tuple:
+    """Build a ('range', column, lo, hi) node with an inclusive lo and exclusive hi"""
+    if op in (':', '=') and '..' in value:
+        lo_text, hi_text = value.split('..', 1)
+        lo = parse_value(lo_text)[0] if lo_text else None
+        hi = parse_value(hi_text)[1] if hi_text else None
+        return ('range', column, lo, hi)
+
+    start, end = parse_value(value)
+    if op in (':', '='):
+        return ('range', column, start, end)
+    if op == '>':
+        return ('range', column, end, None)
+    if op == '>=':
+        return ('range', column, start, None)
+    if op == '<':
+        return ('range', column, None, start)
+    return ('range', column, None, end)
+
+
+def parse_term(token: str) -> tuple:
+    """Parse a single search term into a syntax tree node"""
+    match = FIELD_TERM_RE.match(token)
+    if match and match.group(1).lower() in KNOWN_FIELDS:
+        field, op, value = match.group(1).lower(), match.group(2), _unquote(match.group(3))
+        if not value:
+            raise QueryError(f"Missing value for '{field}'")
+
+        if field in ('has', 'is'):
+            column = FLAGS.get((field, value.lower()))
+            if op != ':' or not column:
+                raise QueryError(f"Unknown flag: {token}")
+            return ('flag', column)
+
+        if field in SUBSTRING_FIELDS:
+            if op != ':':
+                raise QueryError(f"'{field}' only supports ':'")
+            return ('substring', (SUBSTRING_FIELDS[field],), value.lower())
+
+        if field == 'text':
+            if op != ':':
+                raise QueryError("'text' only supports ':'")
+            return ('words', tuple(WORD_RE.findall(value.lower())), ('text',))
+
+        if field in NUMERIC_FIELDS:
+            if field == 'size':
+                parse_value = lambda v: (parse_size(v), parse_size(v) + 1)
+            else:
+                parse_value = lambda v: (_parse_int(v), _parse_int(v) + 1)
+            return _range_term(NUMERIC_FIELDS[field], op, value, parse_value)
+
+        return _range_term(DATE_FIELDS[field], op, value, parse_date_period)
+
+    if token.startswith('"'):
+        return ('substring', ('filename', 'title', 'description'), _unquote(token).lower())
+
+    words = tuple(WORD_RE.findall(token.lower()))
+    if not words:
+        return ('all',)
+    return ('words', words, ('meta', 'text'))
+
+
+def _parse_int(value: str) -> int:
+    try:
+        return int(value)
+    except ValueError:
+        raise QueryError(f"Invalid number: {value}")
+
+
+def refine_query(query: str, term: str) -> str:
+    """Narrow a query with an extra term, e.g. a facet's query"""
+    query = query.strip()
+    if not query:
+        return term
+    if re.search(r'\bOR\b', query):
+        query = f'({query})'
+    return f'{query} {term}'
+
+
+def parse_query(query: str):
+    """Parse a query string into a syntax tree, raising QueryError if it is invalid"""
+    return _Parser(_split_query(query)).parse()
+
+
+# ---------------------------------------------------------------------------
+# Index
+# ---------------------------------------------------------------------------
+
+class SearchIndex:
+    """Columns, sorted numeric arrays, flag bitmaps and word indexes for a set of documents
+
+    entries may be metadata dicts or catalog entries (anything with a dict-style
+    get()); search results are the same objects.
+    """
+
+    def __init__(self, entries: List[Dict[str, Any]], text_tokens: Optional[List[FrozenSet[str]]] = None):
+        self.entries = entries
+        self.size = len(entries)
+        self.all = (1 << self.size) - 1
+
+        self.columns = {
+            'filename': [e.get('filename', '').lower() for e in entries],
+            'title': [(e.get('title') or '').lower() for e in entries],
+            'description': [(e.get('description') or '').lower() for e in entries],
+            'size_bytes': [e.get('size_bytes', 0) for e in entries],
+            'word_count': [e.get('word_count', 0) for e in entries],
+            'created_timestamp': [_entry_timestamp(e, 'created') for e in entries],
+            'modified_timestamp': [_entry_timestamp(e, 'modified') for e in entries],
+        }
+
+        self.flags = {
+            column: bitmap_from_ids([i for i, e in enumerate(entries) if e.get(column)], self.size)
+            for column in set(FLAGS.values())
+        }
+
+        # Sorted (value, doc id) arrays answer range queries with two bisects
+        self.sorted_columns = {}
+        for column in set(NUMERIC_FIELDS.values()) | set(DATE_FIELDS.values()):
+            order = sorted(range(self.size), key=self.columns[column].__getitem__)
+            self.sorted_columns[column] = ([self.columns[column][i] for i in order], order)
+
+        # Facet bitmaps: one per creation date (as organize_files_by_date() groups
+        # them) and one per size band
+        dates: Dict[str, List[int]] = {}
+        for doc_id, timestamp in enumerate(self.columns['created_timestamp']):
+            dates.setdefault(_date_key(timestamp), []).append(doc_id)
+        self.date_buckets = {
+            date: bitmap_from_ids(ids, self.size)
+            for date, ids in sorted(dates.items(), reverse=True) if date
+        }
+        self.size_bands = []
+        values, order = self.sorted_columns['size_bytes']
+        for label, term, lo, hi in SIZE_BANDS:
+            start = bisect.bisect_left(values, lo) if lo is not None else 0
+            end = bisect.bisect_left(values, hi) if hi is not None else len(values)
+            self.size_bands.append((label, term, bitmap_from_ids(order[start:end], self.size)))
+
+        meta_tokens = [
+            tokenize(f"{e.get('filename', '')} {e.get('title') or ''} {e.get('description') or ''}")
+            for e in entries
+        ]
+        text_tokens = text_tokens or [frozenset()] * self.size
+        self.word_indexes = {
+            'meta': self._build_word_index(meta_tokens),
+            'text': self._build_word_index(text_tokens),
+        }
+
+    def _build_word_index(self, token_sets: List[FrozenSet[str]]) -> Tuple[List[str], Dict[str, List[int]]]:
+        """Sorted vocabulary plus a posting list (ascending doc ids) per word"""
+        postings: Dict[str, List[int]] = {}
+        for doc_id, tokens in enumerate(token_sets):
+            for token in tokens:
+                postings.setdefault(token, []).append(doc_id)
+        return sorted(postings), postings
+
+    def _prefix_bitmap(self, index_name: str, prefix: str) -> int:
+        """Bitmap of documents containing a word starting with prefix"""
+        vocabulary, postings = self.word_indexes[index_name]
+        ids: List[int] = []
+        position = bisect.bisect_left(vocabulary, prefix)
+        while position < len(vocabulary) and vocabulary[position].startswith(prefix):
+            ids.extend(postings[vocabulary[position]])
+            position += 1
+        return bitmap_from_ids(ids, self.size)
+
+    def evaluate(self, node) -> int:
+        """Evaluate a syntax tree to a bitmap of matching documents"""
+        kind = node[0]
+
+        if kind == 'all':
+            return self.all
+        if kind == 'and':
+            return self.evaluate(node[1]) & self.evaluate(node[2])
+        if kind == 'or':
+            return self.evaluate(node[1]) | self.evaluate(node[2])
+        if kind == 'not':
+            return self.all & ~self.evaluate(node[1])
+        if kind == 'flag':
+            return self.flags[node[1]]
+
+        if kind == 'words':
+            _, words, index_names = node
+            result = self.all
+            for word in words:
+                matches = 0
+                for index_name in index_names:
+                    matches |= self._prefix_bitmap(index_name, word)
+                result &= matches
+            return result
+
+        if kind == 'substring':
+            _, columns, needle = node
+            ids = [i for i in range(self.size)
+                   if any(needle in self.columns[column][i] for column in columns)]
+            return bitmap_from_ids(ids, self.size)
+
+        if kind == 'range':
+            _, column, lo, hi = node
+            values, order = self.sorted_columns[column]
+            start = bisect.bisect_left(values, lo) if lo is not None else 0
+            end = bisect.bisect_left(values, hi) if hi is not None else len(values)
+            return bitmap_from_ids(order[start:end], self.size)
+
+        raise QueryError(f"Unknown query node: {kind}")
+
+    def search_bitmap(self, query: str) -> int:
+        return self.evaluate(parse_query(query))
+
+    def search(self, query: str) -> List[Dict[str, Any]]:
+        """Entries matching a query, in index order"""
+        return self.entries_for(self.search_bitmap(query))
+
+    def entries_for(self, bitmap: int) -> List[Dict[str, Any]]:
+        return [self.entries[i] for i in ids_from_bitmap(bitmap)]
+
+    def facets(self, bitmap: int) -> Dict[str, Any]:
+        """Facet counts for a result bitmap
+
+        Flags count matching documents with the flag set, date buckets
+        (newest first) and size bands include only non-empty buckets. Each
+        bucket carries the query term that narrows a search to it.
+        """
+        created_date = []
+        for date, date_bitmap in self.date_buckets.items():
+            count = popcount(bitmap & date_bitmap)
+            if count:
+                created_date.append({'value': date, 'query': f'created:{date}', 'count': count})
+
+        size = []
+        for label, term, band_bitmap in self.size_bands:
+            count = popcount(bitmap & band_bitmap)
+            if count:
+                size.append({'value': label, 'query': term, 'count': count})
+
+        return {
+            'total': popcount(bitmap),
+            'flags': {column: popcount(bitmap & self.flags[column]) for column in FACET_FLAGS},
+            'created_date': created_date,
+            'size': size,
+        }
+
+    def search_with_facets(self, query: str) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Entries matching a query plus facet counts, from a single evaluation"""
+        bitmap = self.search_bitmap(query)
+        return self.entries_for(bitmap), self.facets(bitmap)
+
+
+def _entry_timestamp(entry, prefix: str) -> float:
+    """Epoch timestamp of an entry's created/modified time
+
+    Catalog entries carry epoch values; plain metadata dicts only ISO strings.
+    """
+    timestamp = entry.get(f'{prefix}_timestamp')
+    if timestamp is not None:
+        return timestamp
+    return _timestamp(entry.get(f'{prefix}_time'))
+
+
+def _timestamp(iso_time: Optional[str]) -> float:
+    try:
+        return datetime.fromisoformat(iso_time).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _date_key(timestamp: float) -> str:
+    if not timestamp:
+        return ''
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d')
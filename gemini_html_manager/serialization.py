@@ -0,0 +1,58 @@
+"""
+JSON serialization and field projection for API and CLI output
+"""
+import json
+from typing import Any, Dict, Iterable, List, Optional
+from .file_manager import METADATA_FIELDS
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def encoder_name() -> str:
+    """Name of the JSON encoder in use"""
+    return 'orjson' if orjson is not None else 'json'
+
+
+def dumps(data: Any, indent: bool = False, use_orjson: Optional[bool] = None) -> bytes:
+    """Encode data as UTF-8 JSON with sorted keys, using orjson when it is installed"""
+    if use_orjson is None:
+        use_orjson = orjson is not None
+
+    if use_orjson:
+        options = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=str, option=options)
+
+    return json.dumps(data, default=str, sort_keys=True, indent=2 if indent else None,
+                      separators=None if indent else (',', ':')).encode('utf-8')
+
+
+def parse_fields(value: Optional[str]) -> Optional[List[str]]:
+    """Parse a comma-separated fields= value, or return None for all fields
+
+    Raises ValueError for unknown field names.
+    """
+    if not value:
+        return None
+
+    fields = []
+    for field in value.split(','):
+        field = field.strip()
+        if not field:
+            continue
+        if field not in METADATA_FIELDS:
+            raise ValueError(f"Unknown field '{field}' (available: {', '.join(METADATA_FIELDS)})")
+        if field not in fields:
+            fields.append(field)
+    return fields or None
+
+
+def project(entries: Iterable[Dict[str, Any]], fields: Optional[List[str]]) -> List[Dict[str, Any]]:
+    """Copies of metadata dicts restricted to fields (all fields if None)"""
+    if fields is None:
+        return [dict(entry) for entry in entries]
+    return [{field: entry.get(field) for field in fields} for entry in entries]
@@ -0,0 +1,362 @@
+"""
+Static pre-rendered build of the gallery and file browser
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote, urlencode
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from .config import config
+from .file_manager import HTMLFileManager
+from .catalog import Catalog
+from .search import SearchIndex, refine_query, tokenize
+from .client_index import ClientSearchIndex
+from . import storage
+from . import serialization
+
+BUILD_MANIFEST = '.build-manifest.json'
+ASSET_DIRECTORY = 'assets'
+
+# Bumped when the output layout changes, forcing a full rebuild
+BUILD_VERSION = 2
+
+PACKAGE_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+REPOSITORY_DIRECTORY = os.path.dirname(PACKAGE_DIRECTORY)
+
+# Dynamic routes -> where the pre-rendered page lives under the output directory
+PAGE_PATHS = {
+    'index': 'gemini-manager/index.html',
+    'list_files': 'gemini-manager/files/index.html',
+}
+FILE_PAGE_DIRECTORY = 'gemini-manager/file'
+EXPORT_DIRECTORY = 'html_exports'
+SEARCH_INDEX_MANIFEST = 'search-index.json'
+
+# Public content served by the Flask app as-is
+PUBLIC_FILES = ('index.html',)
+PUBLIC_DIRECTORIES = ('projects',)
+
+# Inline <style> and <script> blocks (no attributes) become hashed asset files
+INLINE_ASSET_RE = re.compile(r'<(style|script)>(.*?)</\1>', re.DOTALL)
+ASSET_EXTENSIONS = {'style': 'css', 'script': 'js'}
+
+# Metadata that stays on the server (local paths) is left out of the catalog
+CATALOG_EXCLUDED_FIELDS = ('path',)
+
+
+class StaticSiteBuilder:
+    """Renders the gallery and file browser into a directory of static files
+
+    The output mirrors the web interface's URLs, so any static file server
+    can serve it with no Python per request:
+
+        index.html, projects/...           public landing page and projects
+        gemini-manager/index.html          dashboard
+        gemini-manager/files/index.html    file list
+        gemini-manager/file/<filename>     per-file page
+        html_exports/<filename>            exports, decompressed
+        assets/<name>.<hash>.<ext>         CSS, JS, the JSON catalog and the
+                                           client-side search index
+        catalog.json                       points at the current catalog asset
+        search-index.json                  search index manifest (see ClientSearchIndex)
+
+    Inline styles and scripts are moved into assets named by their content
+    hash, so they can be cached forever. Builds are incremental: the state
+    of the last build (.build-manifest.json) records each export's size and
+    modification time, and only pages of changed files are re-rendered and
+    only changed files copied. The dashboard, file list and catalog are
+    re-rendered when any file changes; a template change rebuilds every page.
+    """
+
+    def __init__(self, file_manager: HTMLFileManager, output_directory: Optional[str] = None,
+                 base_url: Optional[str] = None, templates_directory: Optional[str] = None,
+                 public_directory: Optional[str] = None):
+        self.file_manager = file_manager
+        self.output_directory = output_directory or config.get('static_site.output_directory', 'site')
+        self.base_url = (base_url or config.get('static_site.base_url', '/')).rstrip('/') + '/'
+        self.templates_directory = templates_directory or os.path.join(REPOSITORY_DIRECTORY, 'templates')
+        self.public_directory = public_directory or REPOSITORY_DIRECTORY
+        self.environment = Environment(loader=FileSystemLoader(self.templates_directory),
+                                       autoescape=select_autoescape(['html']))
+        self.manifest_path = os.path.join(self.output_directory, BUILD_MANIFEST)
+
+    def build(self, force: bool = False) -> Dict[str, Any]:
+        """Bring the output directory up to date and return what was done"""
+        start = time.perf_counter()
+        previous = {} if force else self._load_manifest()
+        fingerprint = self._fingerprint()
+        full_rebuild = previous.get('fingerprint') != fingerprint
+        previous_files = previous.get('files', {})
+        page_assets = {} if full_rebuild else previous.get('page_assets', {})
+
+        stats = {'files': 0, 'pages_rendered': 0, 'pages_unchanged': 0, 'exports_copied': 0,
+                 'public_copied': 0, 'removed': 0, 'full_rebuild': full_rebuild}
+        files = {}
+        changed = []
+
+        for record in self.file_manager.iter_html_files():
+            signature = [record.modified_ns, record.size_bytes]
+            known = previous_files.get(record.filename)
+            if (known and known['signature'] == signature
+                    and os.path.exists(self._output(self.export_path(record.filename)))):
+                files[record.filename] = known
+                continue
+
+            files[record.filename] = {
+                'signature': signature,
+                'created': record.created_timestamp,
+                'metadata': record.to_dict(),
+                'tokens': sorted(tokenize(record.text))
+            }
+            changed.append(record.filename)
+            self._copy_export(record.path, record.filename)
+            stats['exports_copied'] += 1
+
+        stats['files'] = len(files)
+        removed = set(previous_files) - set(files)
+        for filename in removed:
+            for relative_path in (self.file_page_path(filename), self.export_path(filename)):
+                self._remove(relative_path)
+            page_assets.pop(self.file_page_path(filename), None)
+        stats['removed'] += len(removed)
+
+        # Per-file pages
+        for filename in sorted(files):
+            page = self.file_page_path(filename)
+            if full_rebuild or filename in changed or not os.path.exists(self._output(page)):
+                page_assets[page] = self._render_page(page, 'view_file.html', self._file_context(files[filename]))
+                stats['pages_rendered'] += 1
+            else:
+                stats['pages_unchanged'] += 1
+
+        # Listing pages and catalog
+        listing_key = hashlib.sha256(json.dumps(
+            [fingerprint, sorted((name, entry['signature']) for name, entry in files.items())]
+        ).encode()).hexdigest()
+        if full_rebuild or listing_key != previous.get('listing_key') or not os.path.exists(
+                self._output(PAGE_PATHS['index'])):
+            newest_first = sorted(files.values(), key=lambda entry: entry['created'], reverse=True)
+            entries = [entry['metadata'] for entry in newest_first]
+            page_assets['catalog'] = [self._write_catalog(entries)]
+            page_assets['search'] = self._write_search_index(
+                SearchIndex(entries, [frozenset(entry['tokens']) for entry in newest_first]))
+            page_assets[PAGE_PATHS['index']] = self._render_page(PAGE_PATHS['index'], 'dashboard.html', {
+                'files': entries[:10],
+                'organized_files': Catalog.organize_by_date(entries),
+                'stats': Catalog.summarize(entries)
+            })
+            page_assets[PAGE_PATHS['list_files']] = self._render_page(PAGE_PATHS['list_files'], 'files.html', {
+                'files': entries,
+                'matching': set(files),
+                'facets': None,
+                'search_query': '',
+                'refine_query': refine_query
+            })
+            stats['pages_rendered'] += 2
+        else:
+            stats['pages_unchanged'] += 2
+
+        public = self._copy_public(previous.get('public', {}), stats)
+        stats['removed'] += self._remove_unused_assets(page_assets)
+
+        self._save_manifest({
+            'version': BUILD_VERSION,
+            'fingerprint': fingerprint,
+            'listing_key': listing_key,
+            'files': files,
+            'public': public,
+            'page_assets': page_assets
+        })
+
+        stats['seconds'] = round(time.perf_counter() - start, 3)
+        return stats
+
+    def url_for(self, endpoint: str, **values) -> str:
+        """Static counterpart of flask.url_for for the endpoints templates link to
+
+        Endpoints that only exist on the server (upload, Google Drive) link to
+        the dashboard.
+        """
+        filename = values.pop('filename', None)
+        if endpoint == 'api_search_index':
+            path = SEARCH_INDEX_MANIFEST
+        elif endpoint == 'view_file':
+            path = f"{FILE_PAGE_DIRECTORY}/{quote(filename)}"
+        elif endpoint == 'download_file':
+            path = f"{EXPORT_DIRECTORY}/{quote(filename)}"
+        else:
+            path = os.path.dirname(PAGE_PATHS.get(endpoint, PAGE_PATHS['index'])) + '/'
+
+        url = self.base_url + path
+        if values:
+            url += '?' + urlencode(values)
+        return url
+
+    def file_page_path(self, filename: str) -> str:
+        return f"{FILE_PAGE_DIRECTORY}/{filename}"
+
+    def export_path(self, filename: str) -> str:
+        return f"{EXPORT_DIRECTORY}/{filename}"
+
+    def _file_context(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        metadata = entry['metadata']
+        path = self.file_manager.resolve_path(metadata['filename'])
+        with self.file_manager.open_html(path) as f:
+            content = f.read()
+        return {'filename': metadata['filename'], 'metadata': metadata, 'content': content}
+
+    def _render_page(self, relative_path: str, template_name: str, context: Dict[str, Any]) -> List[str]:
+        """Render a template to a page, moving inline styles and scripts into assets
+
+        Returns the assets the page references.
+        """
+        html = self.environment.get_template(template_name).render(
+            context, url_for=self.url_for, get_flashed_messages=lambda **kwargs: [], static_site=True
+        )
+        assets = []
+
+        def extract(match):
+            tag, body = match.group(1), match.group(2)
+            asset = self._write_asset(tag, ASSET_EXTENSIONS[tag], body.encode('utf-8'))
+            assets.append(asset)
+            if tag == 'style':
+                return f'<link rel="stylesheet" href="{self.base_url}{asset}">'
+            return f'<script src="{self.base_url}{asset}"></script>'
+
+        html = INLINE_ASSET_RE.sub(extract, html)
+        self._write_if_changed(relative_path, html.encode('utf-8'))
+        return assets
+
+    def _write_asset(self, name: str, extension: str, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        relative_path = f"{ASSET_DIRECTORY}/{name}.{digest}.{extension}"
+        if not os.path.exists(self._output(relative_path)):
+            self._write(relative_path, data)
+        return relative_path
+
+    def _write_catalog(self, entries: List[Dict[str, Any]]) -> str:
+        catalog = [
+            dict({key: value for key, value in entry.items() if key not in CATALOG_EXCLUDED_FIELDS},
+                 url=self.url_for('download_file', filename=entry['filename']),
+                 page=self.url_for('view_file', filename=entry['filename']))
+            for entry in entries
+        ]
+        asset = self._write_asset('catalog', 'json', serialization.dumps(catalog))
+        self._write_if_changed('catalog.json', serialization.dumps({
+            'catalog': self.base_url + asset,
+            'files': len(entries),
+            'built': datetime.now().isoformat(timespec='seconds')
+        }, indent=True))
+        return asset
+
+    def _write_search_index(self, index: SearchIndex) -> List[str]:
+        client_index = ClientSearchIndex(index)
+        assets = []
+        for name, body in client_index.files.items():
+            relative_path = f"{ASSET_DIRECTORY}/{name}"
+            if not os.path.exists(self._output(relative_path)):
+                self._write(relative_path, body)
+            assets.append(relative_path)
+        manifest = client_index.manifest(f"{self.base_url}{ASSET_DIRECTORY}/")
+        self._write_if_changed(SEARCH_INDEX_MANIFEST, serialization.dumps(manifest))
+        return assets
+
+    def _copy_export(self, source_path: str, filename: str) -> None:
+        destination = self._output(self.export_path(filename))
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        with storage.open_binary(source_path) as source, open(destination + '.tmp', 'wb') as out:
+            shutil.copyfileobj(source, out, storage.CHUNK_SIZE)
+        os.replace(destination + '.tmp', destination)
+
+    def _copy_public(self, previous: Dict[str, List[int]], stats: Dict[str, Any]) -> Dict[str, List[int]]:
+        """Copy the public landing page and projects, skipping unchanged files"""
+        sources = [name for name in PUBLIC_FILES if os.path.isfile(os.path.join(self.public_directory, name))]
+        for directory in PUBLIC_DIRECTORIES:
+            for root, _, names in os.walk(os.path.join(self.public_directory, directory)):
+                sources += [os.path.relpath(os.path.join(root, name), self.public_directory) for name in names]
+
+        public = {}
+        for relative_path in sources:
+            source = os.path.join(self.public_directory, relative_path)
+            stat = os.stat(source)
+            public[relative_path] = [stat.st_mtime_ns, stat.st_size]
+            if previous.get(relative_path) != public[relative_path] or not os.path.exists(self._output(relative_path)):
+                os.makedirs(os.path.dirname(self._output(relative_path)), exist_ok=True)
+                shutil.copy2(source, self._output(relative_path))
+                stats['public_copied'] += 1
+
+        for relative_path in set(previous) - set(public):
+            self._remove(relative_path)
+            stats['removed'] += 1
+        return public
+
+    def _remove_unused_assets(self, page_assets: Dict[str, List[str]]) -> int:
+        used = {asset for assets in page_assets.values() for asset in assets}
+        removed = 0
+        try:
+            names = os.listdir(self._output(ASSET_DIRECTORY))
+        except FileNotFoundError:
+            return 0
+        for name in names:
+            if f"{ASSET_DIRECTORY}/{name}" not in used:
+                os.remove(os.path.join(self._output(ASSET_DIRECTORY), name))
+                removed += 1
+        return removed
+
+    def _fingerprint(self) -> str:
+        """Changes whenever a template, the base URL or the output layout does"""
+        digest = hashlib.sha256(f"{BUILD_VERSION}:{self.base_url}".encode())
+        for root, _, names in sorted(os.walk(self.templates_directory)):
+            for name in sorted(names):
+                digest.update(name.encode())
+                with open(os.path.join(root, name), 'rb') as f:
+                    digest.update(f.read())
+        return digest.hexdigest()
+
+    def _output(self, relative_path: str) -> str:
+        return os.path.join(self.output_directory, *relative_path.split('/'))
+
+    def _write(self, relative_path: str, data: bytes) -> None:
+        path = self._output(relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+
+    def _write_if_changed(self, relative_path: str, data: bytes) -> None:
+        """Write a file unless it already has this content (keeps its mtime for sync tools)"""
+        try:
+            with open(self._output(relative_path), 'rb') as f:
+                if f.read() == data:
+                    return
+        except FileNotFoundError:
+            pass
+        self._write(relative_path, data)
+
+    def _remove(self, relative_path: str) -> None:
+        try:
+            os.remove(self._output(relative_path))
+        except FileNotFoundError:
+            pass
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            return manifest if manifest.get('version') == BUILD_VERSION else {}
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"Error reading build manifest, rebuilding everything: {e}")
+            return {}
+
+    def _save_manifest(self, manifest: Dict[str, Any]) -> None:
+        os.makedirs(self.output_directory, exist_ok=True)
+        with open(self.manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(self.manifest_path + '.tmp', self.manifest_path)
@@ -0,0 +1,197 @@
+"""
+Storage helpers for the export directory: compression at rest and layout
+"""
+import os
+import io
+import re
+import gzip
+import hashlib
+import shutil
+import tempfile
+from typing import Optional, Iterator, BinaryIO, TextIO, List
+from .config import config
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Compression method -> file suffix appended to the stored HTML filename
+COMPRESSION_SUFFIXES = {
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+
+# Compression method -> HTTP Content-Encoding token
+CONTENT_ENCODINGS = {
+    'gzip': 'gzip',
+    'zstd': 'zstd',
+}
+
+CHUNK_SIZE = 64 * 1024
+
+# Export directory layouts: everything in one directory, or spread over
+# hash-prefixed subdirectories (ab/cd/<file>)
+LAYOUTS = ('flat', 'sharded')
+SHARD_NAME_RE = re.compile(r'^[0-9a-f]{2}$')
+
+
+def get_storage_compression() -> Optional[str]:
+    """Get the configured compression method for new exports, or None"""
+    method = config.get('html_manager.storage_compression', 'none')
+    if not method or str(method).lower() == 'none':
+        return None
+
+    method = str(method).lower()
+    if method not in COMPRESSION_SUFFIXES:
+        print(f"Unsupported storage compression '{method}', storing files uncompressed")
+        return None
+
+    if method == 'zstd' and zstandard is None:
+        print("zstandard is not installed, storing files uncompressed")
+        return None
+
+    return method
+
+
+def compression_of(path: str) -> Optional[str]:
+    """Get the compression method a stored file uses, based on its suffix"""
+    for method, suffix in COMPRESSION_SUFFIXES.items():
+        if path.endswith(suffix):
+            return method
+    return None
+
+
+def strip_compression_suffix(filename: str) -> str:
+    """Remove a compression suffix, e.g. 'page.html.gz' -> 'page.html'"""
+    method = compression_of(filename)
+    if method:
+        return filename[:-len(COMPRESSION_SUFFIXES[method])]
+    return filename
+
+
+def logical_filename(path: str) -> str:
+    """Get the HTML filename a stored file represents"""
+    return strip_compression_suffix(os.path.basename(path))
+
+
+def get_layout() -> str:
+    """Get the configured export directory layout"""
+    layout = str(config.get('html_manager.layout', 'flat')).lower()
+    if layout not in LAYOUTS:
+        print(f"Unsupported export layout '{layout}', using flat")
+        return 'flat'
+    return layout
+
+
+def shard_prefix(filename: str) -> str:
+    """Shard subdirectory for an HTML filename, e.g. 'page.html' -> '0f/3a'"""
+    digest = hashlib.md5(filename.encode('utf-8')).hexdigest()
+    return os.path.join(digest[:2], digest[2:4])
+
+
+def layout_directory(directory: str, filename: str, layout: str) -> str:
+    """Directory an HTML filename is stored in under a layout"""
+    if layout == 'sharded':
+        return os.path.join(directory, shard_prefix(filename))
+    return directory
+
+
+def iter_file_entries(directory: str) -> Iterator[os.DirEntry]:
+    """Yield directory entries for the files of an export directory in either layout
+
+    Files at the top level and in two-level shard subdirectories are yielded,
+    so a directory that is part-way through a migration lists completely.
+    """
+    shards = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if SHARD_NAME_RE.match(entry.name) and entry.is_dir():
+                    shards.append(entry.path)
+                else:
+                    yield entry
+    except OSError as e:
+        print(f"Error scanning directory {directory}: {e}")
+        return
+
+    for shard in shards:
+        try:
+            with os.scandir(shard) as subshards:
+                subshard_paths = [e.path for e in subshards if SHARD_NAME_RE.match(e.name) and e.is_dir()]
+            for subshard in subshard_paths:
+                with os.scandir(subshard) as files:
+                    yield from files
+        except OSError as e:
+            print(f"Error scanning directory {shard}: {e}")
+
+
+def storage_path(directory: str, filename: str, method: Optional[str]) -> str:
+    """Get the on-disk path for an HTML filename stored with a compression method"""
+    path = os.path.join(directory, filename)
+    if method:
+        path += COMPRESSION_SUFFIXES[method]
+    return path
+
+
+def candidate_paths(path: str) -> List[str]:
+    """All on-disk paths an HTML file may be stored under, plain first"""
+    return [path] + [path + suffix for suffix in COMPRESSION_SUFFIXES.values()]
+
+
+def open_binary(path: str) -> BinaryIO:
+    """Open a stored file for reading, decompressing transparently"""
+    method = compression_of(path)
+
+    if method == 'gzip':
+        return gzip.open(path, 'rb')
+
+    if method == 'zstd':
+        if zstandard is None:
+            raise RuntimeError(f"zstandard is required to read {path}")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+
+    return open(path, 'rb')
+
+
+def open_text(path: str, encoding: str = 'utf-8') -> TextIO:
+    """Open a stored file as text, decompressing transparently"""
+    if compression_of(path) is None:
+        return open(path, 'r', encoding=encoding)
+    return io.TextIOWrapper(open_binary(path), encoding=encoding)
+
+
+def iter_decompressed(path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield the decompressed content of a stored file in chunks"""
+    with open_binary(path) as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def spool_decompressed(path: str, max_memory: int = 8 * 1024 * 1024) -> BinaryIO:
+    """Decompress a stored file into a seekable buffer (spills to disk when large)"""
+    spooled = tempfile.SpooledTemporaryFile(max_size=max_memory)
+    with open_binary(path) as f:
+        shutil.copyfileobj(f, spooled, CHUNK_SIZE)
+    spooled.seek(0)
+    return spooled
+
+
+def write_compressed(source: BinaryIO, destination_path: str, method: Optional[str]) -> None:
+    """Write a stream to destination_path using the given compression method"""
+    if method == 'gzip':
+        with gzip.open(destination_path, 'wb') as out:
+            shutil.copyfileobj(source, out, CHUNK_SIZE)
+    elif method == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("zstandard is required for zstd storage")
+        with open(destination_path, 'wb') as raw:
+            with zstandard.ZstdCompressor().stream_writer(raw) as out:
+                shutil.copyfileobj(source, out, CHUNK_SIZE)
+    else:
+        with open(destination_path, 'wb') as out:
+            shutil.copyfileobj(source, out, CHUNK_SIZE)
@@ -0,0 +1,289 @@
+"""
+Resumable chunked uploads of HTML exports from the browser
+"""
+import os
+import re
+import json
+import math
+import time
+import uuid
+import hashlib
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from .config import config
+from . import storage
+
+SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+class UploadError(Exception):
+    """A refused upload request, with the HTTP status to answer it with"""
+
+    def __init__(self, status: int, message: str, details: Optional[Dict[str, Any]] = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.details = details or {}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.details, error=self.message)
+
+
+class UploadSession:
+    """State of one file being uploaded in chunks
+
+    The file is split into total_chunks chunks of chunk_size bytes (the last
+    may be shorter), which can arrive in any order and more than once.
+    """
+
+    def __init__(self, filename: str, size: int, chunk_size: int, sha256: Optional[str] = None,
+                 new_name: Optional[str] = None, session_id: Optional[str] = None):
+        self.id = session_id or uuid.uuid4().hex
+        self.filename = filename
+        self.size = size
+        self.chunk_size = chunk_size
+        self.sha256 = sha256
+        self.new_name = new_name
+        self.received: set = set()
+        self.created_time = datetime.now().isoformat()
+        self.updated = time.time()
+        self.finalizing = False
+
+    @property
+    def total_chunks(self) -> int:
+        return math.ceil(self.size / self.chunk_size)
+
+    def chunk_length(self, index: int) -> int:
+        return min(self.chunk_size, self.size - index * self.chunk_size)
+
+    def missing(self) -> List[int]:
+        return [index for index in range(self.total_chunks) if index not in self.received]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'new_name': self.new_name,
+            'size': self.size,
+            'sha256': self.sha256,
+            'chunk_size': self.chunk_size,
+            'total_chunks': self.total_chunks,
+            'received': sorted(self.received),
+            'missing': self.missing(),
+            'received_bytes': sum(self.chunk_length(index) for index in self.received),
+            'created_time': self.created_time,
+            'updated': self.updated
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'UploadSession':
+        session = cls(data['filename'], data['size'], data['chunk_size'], data.get('sha256'),
+                      data.get('new_name'), session_id=data['id'])
+        session.received = set(data.get('received', []))
+        session.created_time = data.get('created_time', session.created_time)
+        session.updated = data.get('updated', session.updated)
+        return session
+
+
+class UploadSessionManager:
+    """Chunked, resumable uploads that end in HTMLFileManager.import_html_file()
+
+    A client opens a session with the file's name, size and (optionally)
+    SHA-256, then sends its chunks, several at a time and in any order, and
+    finally asks for the session to be completed. The size limit is checked
+    when the session is opened, before any content is sent. Chunks are
+    written straight into place in a preallocated file under
+    uploads.directory, and the set of received chunks is saved with each
+    one, so an interrupted upload (or a restarted server) resumes with just
+    the missing chunks. Opening a session for a file already being uploaded
+    (same name, size and checksum) returns the existing session.
+
+    Completing checks the assembled file against the checksum and imports
+    it. Sessions untouched for uploads.session_ttl_hours are removed.
+    """
+
+    def __init__(self, file_manager, directory: Optional[str] = None):
+        self.file_manager = file_manager
+        self.directory = directory or config.get('uploads.directory', '.uploads')
+        self.chunk_size = config.get('uploads.chunk_size', 1024 * 1024)
+        self.session_ttl = config.get('uploads.session_ttl_hours', 24) * 3600
+        self._sessions: Dict[str, UploadSession] = {}
+        self._lock = threading.Lock()
+        self.load_sessions()
+
+    # Persistence
+
+    def _state_path(self, session_id: str) -> str:
+        return os.path.join(self.directory, f"{session_id}.json")
+
+    def _data_path(self, session_id: str) -> str:
+        return os.path.join(self.directory, f"{session_id}.part")
+
+    def _save(self, session: UploadSession) -> None:
+        """Persist a session's state (call with the lock held)"""
+        path = self._state_path(session.id)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(session.to_dict(), f)
+        os.replace(path + '.tmp', path)
+
+    def load_sessions(self) -> None:
+        """Load the sessions of a previous run whose data file is still there"""
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), 'r', encoding='utf-8') as f:
+                    session = UploadSession.from_dict(json.load(f))
+            except Exception as e:
+                print(f"Error loading upload session {name}: {e}")
+                continue
+            if os.path.exists(self._data_path(session.id)):
+                self._sessions[session.id] = session
+
+    def _remove(self, session_id: str) -> None:
+        """Forget a session and delete its files (call with the lock held)"""
+        self._sessions.pop(session_id, None)
+        for path in (self._state_path(session_id), self._data_path(session_id)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def expire(self) -> int:
+        """Remove sessions that have not been touched within the session TTL"""
+        cutoff = time.time() - self.session_ttl
+        with self._lock:
+            expired = [session.id for session in self._sessions.values()
+                       if session.updated < cutoff and not session.finalizing]
+            for session_id in expired:
+                self._remove(session_id)
+        return len(expired)
+
+    # Protocol
+
+    def create(self, filename: str, size: Any, sha256: Optional[str] = None,
+               new_name: Optional[str] = None) -> Tuple[UploadSession, bool]:
+        """Open a session (or find the open one for the same file); returns (session, resumed)"""
+        filename = os.path.basename(str(filename or '').replace('\\', '/'))
+        if not filename.lower().endswith(('.html', '.htm')):
+            raise UploadError(400, 'Only .html and .htm files can be uploaded')
+        try:
+            size = int(size)
+        except (TypeError, ValueError):
+            raise UploadError(400, 'size must be a number of bytes')
+        if size <= 0:
+            raise UploadError(400, 'The file is empty')
+        max_size_mb = config.get('html_manager.max_file_size', 10)
+        if size > max_size_mb * 1024 * 1024:
+            raise UploadError(413, f"File too large: {size / (1024 * 1024):.2f}MB (max: {max_size_mb}MB)")
+        if sha256 is not None:
+            sha256 = str(sha256).lower()
+            if not SHA256_RE.match(sha256):
+                raise UploadError(400, 'sha256 must be 64 hexadecimal characters')
+        new_name = os.path.basename(str(new_name).replace('\\', '/')).strip() if new_name else None
+
+        self.expire()
+        with self._lock:
+            if sha256:
+                for session in self._sessions.values():
+                    if (session.filename, session.size, session.sha256, session.new_name) == \
+                            (filename, size, sha256, new_name) and not session.finalizing:
+                        session.updated = time.time()
+                        return session, True
+
+            session = UploadSession(filename, size, self.chunk_size, sha256, new_name)
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self._data_path(session.id), 'wb') as f:
+                f.truncate(size)
+            self._sessions[session.id] = session
+            self._save(session)
+        return session, False
+
+    def get(self, session_id: str) -> UploadSession:
+        with self._lock:
+            session = self._sessions.get(session_id)
+        if session is None:
+            raise UploadError(404, 'Upload session not found')
+        return session
+
+    def write_chunk(self, session_id: str, index: int, data: bytes,
+                    checksum: Optional[str] = None) -> UploadSession:
+        """Store one chunk; checksum is the chunk's SHA-256 if the client sent one"""
+        session = self.get(session_id)
+        if session.finalizing:
+            raise UploadError(409, 'Upload is being completed')
+        if not 0 <= index < session.total_chunks:
+            raise UploadError(400, f"Chunk index must be between 0 and {session.total_chunks - 1}")
+        expected = session.chunk_length(index)
+        if len(data) != expected:
+            raise UploadError(400, f"Chunk {index} must be {expected} bytes, got {len(data)}")
+        if checksum and hashlib.sha256(data).hexdigest() != checksum.lower():
+            raise UploadError(422, f"Chunk {index} does not match its checksum")
+
+        # Chunks occupy separate ranges, so concurrent writes don't overlap
+        with open(self._data_path(session.id), 'r+b') as f:
+            f.seek(index * session.chunk_size)
+            f.write(data)
+
+        with self._lock:
+            if session.id not in self._sessions:
+                raise UploadError(404, 'Upload session not found')
+            session.received.add(index)
+            session.updated = time.time()
+            self._save(session)
+        return session
+
+    def complete(self, session_id: str) -> Dict[str, Any]:
+        """Verify the assembled file and import it into the export directory"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                raise UploadError(404, 'Upload session not found')
+            if session.finalizing:
+                raise UploadError(409, 'Upload is already being completed')
+            missing = session.missing()
+            if missing:
+                raise UploadError(409, f"{len(missing)} chunk(s) missing", {'missing': missing})
+            session.finalizing = True
+
+        data_path = self._data_path(session.id)
+        try:
+            digest = hashlib.sha256()
+            with open(data_path, 'rb') as f:
+                for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+                    digest.update(block)
+            sha256 = digest.hexdigest()
+            if session.sha256 and sha256 != session.sha256:
+                # Some chunk was corrupted on the way; the client has to send them again
+                with self._lock:
+                    session.received.clear()
+                    self._save(session)
+                raise UploadError(422, 'The uploaded file does not match its checksum',
+                                  {'missing': session.missing()})
+
+            name = session.new_name or session.filename
+            if name.lower().endswith('.htm'):
+                name = name[:-4] + '.html'
+            result = self.file_manager.import_html_file(data_path, name)
+            if not result:
+                raise UploadError(500, 'Failed to import the uploaded file')
+        except Exception:
+            session.finalizing = False
+            raise
+
+        with self._lock:
+            self._remove(session.id)
+        return {'filename': storage.logical_filename(result), 'size': session.size, 'sha256': sha256}
+
+    def abort(self, session_id: str) -> None:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                raise UploadError(404, 'Upload session not found')
+            if session.finalizing:
+                raise UploadError(409, 'Upload is being completed')
+            self._remove(session_id)
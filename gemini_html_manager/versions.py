@@ -0,0 +1,262 @@
+"""
+Delta-compressed version history for re-imported exports
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import zlib
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from .config import config
+
+# Subdirectory of the export directory holding version history
+VERSIONS_DIRECTORY = '.versions'
+INDEX_FILE = 'index.json'
+
+DELTA_MAGIC = b'GHD1'
+OP_INSERT = 0
+OP_COPY = 1
+
+# HTML exports are matched a tag or line at a time; tokens shorter than this
+# are too common to be worth a copy instruction on their own
+TOKEN_RE = re.compile(rb'[^\n>]*[\n>]|[^\n>]+')
+MIN_MATCH = 8
+COMPARE_STEP = 4096
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, pos: int):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _match_length(base: bytes, base_pos: int, target: bytes, target_pos: int) -> int:
+    """Length of the common run starting at base[base_pos] and target[target_pos]"""
+    limit = min(len(base) - base_pos, len(target) - target_pos)
+    length = 0
+    step = COMPARE_STEP
+    while step:
+        end = length + step
+        if end <= limit and base[base_pos + length:base_pos + end] == target[target_pos + length:target_pos + end]:
+            length = end
+        else:
+            step //= 2
+    return length
+
+
+def make_delta(base: bytes, target: bytes, level: int = 9) -> bytes:
+    """Encode target as copy/insert instructions against base, zlib-compressed
+
+    Both sides are split into tags and lines; each target token that also
+    occurs in base starts a copy, which is then extended byte by byte as far
+    as the two agree, so unchanged stretches of any length cost a few bytes.
+    """
+    index: Dict[bytes, int] = {}
+    for match in TOKEN_RE.finditer(base):
+        token = match.group()
+        if len(token) >= MIN_MATCH:
+            index.setdefault(token, match.start())
+
+    out = bytearray(DELTA_MAGIC)
+    _write_varint(out, len(target))
+    literal_start = 0
+    position = 0
+
+    while position < len(target):
+        token_end = TOKEN_RE.match(target, position).end()
+        base_position = index.get(target[position:token_end]) if token_end - position >= MIN_MATCH else None
+        if base_position is None:
+            position = token_end
+            continue
+
+        length = _match_length(base, base_position, target, position)
+        if literal_start < position:
+            out.append(OP_INSERT)
+            _write_varint(out, position - literal_start)
+            out += target[literal_start:position]
+        out.append(OP_COPY)
+        _write_varint(out, base_position)
+        _write_varint(out, length)
+        position += length
+        literal_start = position
+
+    if literal_start < len(target):
+        out.append(OP_INSERT)
+        _write_varint(out, len(target) - literal_start)
+        out += target[literal_start:]
+
+    return zlib.compress(bytes(out), level)
+
+
+def apply_delta(base: bytes, delta: bytes) -> bytes:
+    """Rebuild the target a delta from make_delta() was made for"""
+    data = zlib.decompress(delta)
+    if not data.startswith(DELTA_MAGIC):
+        raise ValueError('Not a version delta')
+
+    size, pos = _read_varint(data, len(DELTA_MAGIC))
+    out = bytearray()
+    while pos < len(data):
+        op = data[pos]
+        pos += 1
+        if op == OP_COPY:
+            offset, pos = _read_varint(data, pos)
+            length, pos = _read_varint(data, pos)
+            out += base[offset:offset + length]
+        elif op == OP_INSERT:
+            length, pos = _read_varint(data, pos)
+            out += data[pos:pos + length]
+            pos += length
+        else:
+            raise ValueError(f'Unknown delta instruction {op}')
+
+    if len(out) != size:
+        raise ValueError('Delta produced the wrong number of bytes')
+    return bytes(out)
+
+
+class VersionStore:
+    """Version history of exports that were re-imported under the same name
+
+    The latest version of a file is the export itself, stored in full. Each
+    older version is kept as a reverse delta - the instructions to rebuild it
+    from the version after it - in <export_directory>/.versions/<filename>/,
+    next to an index.json listing every version's size, checksum and date.
+    Version n is rebuilt by applying the deltas from the latest version back
+    to n, checking each step against the recorded checksum.
+
+    Iterated exports of the same document differ in a few places, so a delta
+    is typically a small fraction of a compressed full copy.
+    """
+
+    def __init__(self, export_directory: str):
+        self.export_directory = export_directory
+        self.max_versions = config.get('html_manager.max_versions', 50)
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self) -> str:
+        return os.path.join(self.export_directory, VERSIONS_DIRECTORY)
+
+    def history_directory(self, filename: str) -> str:
+        return os.path.join(self.directory, filename)
+
+    def record(self, filename: str, previous: bytes, current: bytes) -> Dict[str, Any]:
+        """Record that the export `filename` changed from previous to current
+
+        Call once current has been written to the export directory. Returns
+        the new version's index entry.
+        """
+        with self._lock:
+            history = self._load_index(filename)
+            versions = history['versions']
+            previous_checksum = hashlib.md5(previous).hexdigest()
+
+            if versions and versions[-1]['checksum'] != previous_checksum:
+                # The export was changed outside the store, so the newest
+                # delta no longer applies to it; start the history again
+                print(f"{filename} changed since its last recorded version, restarting its history")
+                self._remove_history(filename)
+                versions = history['versions'] = []
+
+            now = datetime.now().isoformat(timespec='seconds')
+            if not versions:
+                versions.append(self._entry(1, previous, previous_checksum, now))
+
+            directory = self.history_directory(filename)
+            os.makedirs(directory, exist_ok=True)
+            delta = make_delta(current, previous)
+            with open(self._delta_path(filename, versions[-1]['version']), 'wb') as f:
+                f.write(delta)
+            versions[-1]['delta_bytes'] = len(delta)
+
+            entry = self._entry(versions[-1]['version'] + 1, current, hashlib.md5(current).hexdigest(), now)
+            versions.append(entry)
+
+            while self.max_versions and len(versions) > self.max_versions:
+                oldest = versions.pop(0)
+                try:
+                    os.remove(self._delta_path(filename, oldest['version']))
+                except FileNotFoundError:
+                    pass
+
+            self._save_index(filename, history)
+            return dict(entry)
+
+    def list_versions(self, filename: str) -> List[Dict[str, Any]]:
+        """Index entries for a file's versions, oldest first; empty if it has no history"""
+        with self._lock:
+            versions = self._load_index(filename)['versions']
+        return [dict(entry, current=(i == len(versions) - 1)) for i, entry in enumerate(versions)]
+
+    def get_version(self, filename: str, version: int, current: bytes) -> Optional[bytes]:
+        """Rebuild a past version from the export's current content
+
+        Returns None if the version is not in the history; raises ValueError
+        if current is not the latest recorded version or a delta is damaged.
+        """
+        with self._lock:
+            versions = self._load_index(filename)['versions']
+            numbers = [entry['version'] for entry in versions]
+            if version not in numbers:
+                return None
+            if hashlib.md5(current).hexdigest() != versions[-1]['checksum']:
+                raise ValueError(f"{filename} changed since its last recorded version")
+
+            content = current
+            for entry in reversed(versions[numbers.index(version):-1]):
+                with open(self._delta_path(filename, entry['version']), 'rb') as f:
+                    content = apply_delta(content, f.read())
+                if hashlib.md5(content).hexdigest() != entry['checksum']:
+                    raise ValueError(f"Version {entry['version']} of {filename} failed its checksum")
+            return content
+
+    def usage(self, filename: str) -> Dict[str, int]:
+        """Bytes the history takes on disk against keeping every version in full"""
+        versions = self.list_versions(filename)
+        return {
+            'versions': len(versions),
+            'full_bytes': sum(entry['size'] for entry in versions[:-1]),
+            'delta_bytes': sum(entry.get('delta_bytes') or 0 for entry in versions[:-1])
+        }
+
+    def _entry(self, version: int, content: bytes, checksum: str, created: str) -> Dict[str, Any]:
+        return {'version': version, 'created': created, 'size': len(content),
+                'checksum': checksum, 'delta_bytes': None}
+
+    def _delta_path(self, filename: str, version: int) -> str:
+        return os.path.join(self.history_directory(filename), f'{version}.delta')
+
+    def _load_index(self, filename: str) -> Dict[str, Any]:
+        try:
+            with open(os.path.join(self.history_directory(filename), INDEX_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'filename': filename, 'versions': []}
+        except Exception as e:
+            print(f"Error reading version index for {filename}: {e}")
+            return {'filename': filename, 'versions': []}
+
+    def _save_index(self, filename: str, history: Dict[str, Any]) -> None:
+        index_path = os.path.join(self.history_directory(filename), INDEX_FILE)
+        with open(index_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(history, f, indent=2)
+        os.replace(index_path + '.tmp', index_path)
+
+    def _remove_history(self, filename: str) -> None:
+        shutil.rmtree(self.history_directory(filename), ignore_errors=True)
@@ -1,17 +1,32 @@
 """
 Web interface for Gemini HTML Manager
 """
-from flask import Flask, render_template, request, jsonify, send_file, redirect, url_for, flash, send_from_directory
+from flask import Flask, Response, render_template, request, jsonify, send_file, redirect, url_for, flash, send_from_directory, abort, stream_with_context
+from werkzeug.security import safe_join
+import fnmatch
+import mimetypes
 import os
 import sys
+import threading
 from datetime import datetime
 
 # Add the parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from gemini_html_manager.file_manager import HTMLFileManager
-from gemini_html_manager.google_workspace import GoogleWorkspaceManager
+from gemini_html_manager.google_workspace import GoogleWorkspaceManager, conversion_error
+from gemini_html_manager.drive_mirror import DriveMirror
 from gemini_html_manager.config import config
+from gemini_html_manager import storage
+from gemini_html_manager.jobs import JobManager
+from gemini_html_manager.catalog import Catalog
+from gemini_html_manager.search import QueryError, refine_query
+from gemini_html_manager.grep import Grep
+from gemini_html_manager.events import EventBroker, CatalogWatcher, stream_events
+from gemini_html_manager.response_cache import ResponseCache
+from gemini_html_manager.profiling import RequestProfiler
+from gemini_html_manager.upload_sessions import UploadError, UploadSessionManager
+from gemini_html_manager import serialization
 
 app = Flask(__name__, template_folder='../templates')
 app.secret_key = 'your-secret-key-change-this'  # Change this in production
@@ -19,6 +34,77 @@ app.secret_key = 'your-secret-key-change-this'  # Change this in production
 # Initialize managers
 file_manager = HTMLFileManager()
 workspace_manager = GoogleWorkspaceManager()
+job_manager = JobManager()
+catalog = Catalog(file_manager)
+event_broker = EventBroker()
+catalog_watcher = CatalogWatcher(catalog, event_broker)
+response_cache = ResponseCache(catalog)
+profiler = RequestProfiler(app)
+upload_sessions = UploadSessionManager(file_manager)
+grep_slots = threading.BoundedSemaphore(config.get('grep.max_concurrent', 2))
+job_manager.add_listener(
+    lambda job: event_broker.publish('job_progress', job.to_dict(include_items=False))
+)
+
+
+def find_export_file(directory: str, filename: str):
+    """Locate an export in either layout and storage form
+
+    Returns (path, compression method) or (None, None). Plain files win over
+    compressed ones, and the flat location over the shard location.
+    """
+    relative_paths = [filename]
+    if '/' not in filename:
+        relative_paths.append(os.path.join(storage.shard_prefix(filename), filename))
+    
+    for relative_path in relative_paths:
+        plain_path = safe_join(os.path.abspath(directory), relative_path)
+        if plain_path is None:
+            abort(404)
+        for candidate in storage.candidate_paths(plain_path):
+            if os.path.isfile(candidate):
+                return candidate, storage.compression_of(candidate)
+    
+    return None, None
+
+
+def send_export_file(directory: str, filename: str, as_attachment: bool = False):
+    """Send an export file, passing compressed-at-rest bytes straight through
+
+    Files stored compressed are sent as-is with a Content-Encoding header when
+    the client accepts that encoding, and decompressed on the fly otherwise.
+    Files in the sharded layout are found by their plain filename.
+    """
+    path, method = find_export_file(directory, filename)
+    if path is None:
+        abort(404)
+    
+    if method is None:
+        return send_file(path, as_attachment=as_attachment, download_name=os.path.basename(filename))
+    
+    mimetype = mimetypes.guess_type(filename)[0] or 'text/html'
+    encoding = storage.CONTENT_ENCODINGS[method]
+    if encoding in request.accept_encodings:
+        response = send_file(path, mimetype=mimetype,
+                             as_attachment=as_attachment, download_name=os.path.basename(filename))
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = Response(storage.iter_decompressed(path), mimetype=mimetype)
+        if as_attachment:
+            response.headers['Content-Disposition'] = f'attachment; filename="{os.path.basename(filename)}"'
+    
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def json_response(data, status: int = 200) -> Response:
+    """JSON response encoded with the fastest available encoder (see serialization.dumps)"""
+    return Response(serialization.dumps(data), status=status, mimetype='application/json')
+
+
+def requested_fields():
+    """Fields listed in the fields= query parameter, or None for all; raises ValueError"""
+    return serialization.parse_fields(request.args.get('fields'))
 
 
 @app.route('/')
@@ -28,17 +114,13 @@ def public_index():
 
 @app.route('/gemini-manager')
 @app.route('/gemini-manager/')
+@response_cache.cached
 def index():
     """Main dashboard"""
-    files = file_manager.list_html_files()
-    organized_files = file_manager.organize_files_by_date()
-    
-    stats = {
-        'total_files': len(files),
-        'total_size_mb': sum(f.get('size_mb', 0) for f in files),
-        'gemini_canvas_files': sum(1 for f in files if f.get('is_gemini_canvas', False)),
-        'files_with_images': sum(1 for f in files if f.get('has_images', False))
-    }
+    # The cache decorator refreshes the catalog; only changed files are re-parsed
+    files = catalog.entries()
+    organized_files = Catalog.organize_by_date(files)
+    stats = catalog.stats()
     
     return render_template('dashboard.html', 
                          files=files[:10],  # Show latest 10 files
@@ -47,24 +129,31 @@ def index():
 
 
 @app.route('/gemini-manager/files')
+@response_cache.cached
 def list_files():
     """List all files"""
     search_query = request.args.get('search', '')
     
-    if search_query:
-        files = file_manager.search_files(search_query)
-    else:
-        files = file_manager.list_html_files()
+    # Every file is rendered and non-matches hidden, so the page can search
+    # client-side from then on (see /api/search_index/)
+    files = catalog.entries()
+    try:
+        matches, facets = catalog.search_with_facets(search_query, ['filename'])
+        matching = {match['filename'] for match in matches}
+    except QueryError as e:
+        flash(f'Invalid search: {e}', 'error')
+        matching, facets = set(), None
     
-    return render_template('files.html', files=files, search_query=search_query)
+    return render_template('files.html', files=files, matching=matching, facets=facets,
+                           search_query=search_query, refine_query=refine_query)
 
 
 @app.route('/gemini-manager/file/<path:filename>')
 def view_file(filename):
     """View HTML file"""
-    file_path = os.path.join(file_manager.export_directory, filename)
+    file_path = file_manager.resolve_path(filename)
     
-    if not os.path.exists(file_path):
+    if not file_path:
         flash(f'File not found: {filename}', 'error')
         return redirect(url_for('list_files'))
     
@@ -73,7 +162,7 @@ def view_file(filename):
     
     # Read file content
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
+        with file_manager.open_html(file_path) as f:
             content = f.read()
     except Exception as e:
         flash(f'Error reading file: {e}', 'error')
@@ -112,6 +201,7 @@ def upload_file():
                 os.remove(temp_path)
                 
                 if result:
+                    catalog_watcher.notify()
                     flash(f'Successfully uploaded: {os.path.basename(result)}', 'success')
                 else:
                     flash('Failed to upload file', 'error')
@@ -119,28 +209,121 @@ def upload_file():
             except Exception as e:
                 flash(f'Error uploading file: {e}', 'error')
     
-    return render_template('upload.html')
+    return render_template('upload.html',
+                           chunk_size=upload_sessions.chunk_size,
+                           parallel_chunks=config.get('uploads.parallel_chunks', 4),
+                           max_file_size=config.get('html_manager.max_file_size', 10))
+
+
+@app.route('/api/uploads', methods=['POST'])
+def api_create_upload():
+    """Open a chunked upload session (or resume the open one for the same file)"""
+    data = request.get_json(silent=True) or {}
+    try:
+        session, resumed = upload_sessions.create(data.get('filename'), data.get('size'),
+                                                  data.get('sha256'), data.get('new_name'))
+    except UploadError as e:
+        return jsonify(e.to_dict()), e.status
+    return jsonify(dict(session.to_dict(), resumed=resumed)), 200 if resumed else 201
+
+
+@app.route('/api/uploads/<session_id>', methods=['GET'])
+def api_get_upload(session_id):
+    """Upload session state, including the chunks still missing"""
+    try:
+        return jsonify(upload_sessions.get(session_id).to_dict())
+    except UploadError as e:
+        return jsonify(e.to_dict()), e.status
+
+
+def read_body(limit):
+    """Up to limit bytes of the request body"""
+    parts = []
+    remaining = limit
+    while remaining > 0:
+        part = request.stream.read(remaining)
+        if not part:
+            break
+        parts.append(part)
+        remaining -= len(part)
+    return b''.join(parts)
+
+
+@app.route('/api/uploads/<session_id>/chunks/<int:index>', methods=['PUT'])
+def api_upload_chunk(session_id, index):
+    """Store one chunk of an upload; X-Chunk-Sha256 is checked when present"""
+    try:
+        session = upload_sessions.get(session_id)
+        too_large = jsonify({'error': f"Chunks are at most {session.chunk_size} bytes"}), 413
+        # Refuse an oversized chunk before reading its body
+        if request.content_length is not None and request.content_length > session.chunk_size:
+            return too_large
+        # Without a Content-Length (chunked transfer encoding) read one byte
+        # past the limit, never the whole body
+        data = read_body(session.chunk_size + 1)
+        if len(data) > session.chunk_size:
+            return too_large
+        session = upload_sessions.write_chunk(session_id, index, data, request.headers.get('X-Chunk-Sha256'))
+    except UploadError as e:
+        return jsonify(e.to_dict()), e.status
+    return jsonify({'index': index, 'received_chunks': len(session.received),
+                    'total_chunks': session.total_chunks})
+
+
+@app.route('/api/uploads/<session_id>/complete', methods=['POST'])
+def api_complete_upload(session_id):
+    """Verify the uploaded file against its checksum and import it"""
+    try:
+        result = upload_sessions.complete(session_id)
+    except UploadError as e:
+        return jsonify(e.to_dict()), e.status
+    catalog_watcher.notify()
+    return jsonify(dict(result, success=True))
+
+
+@app.route('/api/uploads/<session_id>', methods=['DELETE'])
+def api_abort_upload(session_id):
+    """Abandon an upload session and delete what was received"""
+    try:
+        upload_sessions.abort(session_id)
+    except UploadError as e:
+        return jsonify(e.to_dict()), e.status
+    return jsonify({'success': True})
 
 
 @app.route('/gemini-manager/google_drive')
 def google_drive():
-    """Google Drive integration page"""
+    """Google Drive integration page
+
+    Renders straight away from the last Drive listing; the page then lists
+    the folder again through a background job, so no request thread waits
+    on Google.
+    """
     if not workspace_manager.credentials:
         flash('Google Workspace not configured. Please run setup first.', 'warning')
         return render_template('google_drive.html', files=[], authenticated=False)
     
-    try:
-        drive_files = workspace_manager.list_gemini_files()
-        return render_template('google_drive.html', files=drive_files, authenticated=True)
-    except Exception as e:
-        flash(f'Error accessing Google Drive: {e}', 'error')
-        return render_template('google_drive.html', files=[], authenticated=False)
+    listing = job_manager.latest('list_drive_files')
+    return render_template('google_drive.html', authenticated=True,
+                           files=listing.result['files'] if listing else None,
+                           listed_time=listing.finished_time if listing else None)
+
+
+@app.route('/api/list_drive_files', methods=['POST'])
+def api_list_drive_files():
+    """API endpoint for listing the Drive exports folder (runs as a background job)"""
+    if not workspace_manager.credentials:
+        return jsonify({'error': 'Google Workspace not configured'}), 400
+    
+    # Every view of the Drive page asks for a listing; share the one in progress
+    job = job_manager.submit('list_drive_files', reuse_active=True)
+    return jsonify({'job_id': job.id, 'status': job.status}), 202
 
 
 @app.route('/api/upload_to_drive', methods=['POST'])
 def api_upload_to_drive():
-    """API endpoint to upload file to Google Drive"""
-    data = request.json
+    """API endpoint to upload file to Google Drive (runs as a background job)"""
+    data = request.get_json(silent=True) or {}
     file_path = data.get('file_path')
     convert = data.get('convert', False)
     title = data.get('title')
@@ -151,136 +334,458 @@ def api_upload_to_drive():
     if not workspace_manager.credentials:
         return jsonify({'error': 'Google Workspace not configured'}), 400
     
+    job = job_manager.submit('upload_to_drive', {'file_path': file_path, 'title': title,
+                                                 'convert': bool(convert)})
+    return jsonify({'job_id': job.id, 'status': job.status}), 202
+
+
+def run_upload_job(job):
+    """Background job: upload one file to Google Drive"""
+    file_path = job.params['file_path']
+    title = job.params.get('title')
+    conversion_stats = None
     try:
-        if convert:
-            file_id = workspace_manager.convert_html_to_google_doc(file_path, title)
+        if job.params.get('convert'):
+            doc_ids, conversion_stats = workspace_manager.convert_html_with_stats(file_path, title)
+            error = conversion_error(doc_ids, conversion_stats)
+            if error:
+                raise RuntimeError(error)
+            file_id = doc_ids[0] if doc_ids else None
             file_type = 'Google Doc'
         else:
             file_id = workspace_manager.upload_html_file(file_path, title)
             file_type = 'HTML file'
         
-        if file_id:
-            file_info = workspace_manager.get_file_info(file_id)
-            return jsonify({
-                'success': True,
-                'file_id': file_id,
-                'file_type': file_type,
-                'name': file_info.get('name') if file_info else title,
-                'link': file_info.get('webViewLink') if file_info else None
-            })
-        else:
-            return jsonify({'error': 'Upload failed'}), 500
-            
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        if not file_id:
+            raise RuntimeError('Upload failed')
+        
+        file_info = workspace_manager.get_file_info(file_id)
+        result = {
+            'success': True,
+            'file_id': file_id,
+            'file_type': file_type,
+            'name': file_info.get('name') if file_info else title,
+            'link': file_info.get('webViewLink') if file_info else None
+        }
+        if conversion_stats:
+            result['conversion'] = conversion_stats
+        return result
+    finally:
+        workspace_manager.release_client()
+
+
+def run_list_drive_files_job(job):
+    """Background job: list the files in the Drive exports folder"""
+    try:
+        files = workspace_manager.list_gemini_files()
+    finally:
+        workspace_manager.release_client()
+    return {'files': files, 'count': len(files)}
 
 
-@app.route('/api/batch_upload_to_drive', methods=['POST'])
-def api_batch_upload_to_drive():
-    """API endpoint for batch upload to Google Drive"""
-    data = request.json
-    convert = data.get('convert', False)
-    
-    if not workspace_manager.credentials:
-        return jsonify({'error': 'Google Workspace not configured'}), 400
-    
+def run_batch_upload_job(job):
+    """Background job: upload every local file to Google Drive"""
     try:
-        files = file_manager.list_html_files()
-        results = []
+        convert = job.params.get('convert', False)
+        files = list(file_manager.iter_html_files())
+        job.set_total(len(files))
         
-        for file_info in files:
+        for record in files:
+            if job.cancel_requested:
+                break
+            
             try:
-                file_path = file_info['path']
-                filename = file_info['filename']
-                
+                conversion_stats = None
                 if convert:
-                    file_id = workspace_manager.convert_html_to_google_doc(file_path)
+                    doc_ids, conversion_stats = workspace_manager.convert_html_with_stats(record.path)
+                    error = conversion_error(doc_ids, conversion_stats)
+                    if error:
+                        job.add_item({
+                            'filename': record.filename,
+                            'success': False,
+                            'error': error,
+                            'partial_file_ids': doc_ids
+                        })
+                        continue
+                    file_id = doc_ids[0] if doc_ids else None
                     file_type = 'Google Doc'
                 else:
-                    file_id = workspace_manager.upload_html_file(file_path)
+                    file_id = workspace_manager.upload_html_file(record.path)
                     file_type = 'HTML file'
                 
                 if file_id:
-                    results.append({
-                        'filename': filename,
+                    item = {
+                        'filename': record.filename,
                         'success': True,
                         'file_id': file_id,
                         'file_type': file_type
-                    })
+                    }
+                    if conversion_stats:
+                        item['bytes_saved'] = conversion_stats['bytes_saved']
+                        item['seconds'] = conversion_stats['seconds']
+                    job.add_item(item)
                 else:
-                    results.append({
-                        'filename': filename,
+                    job.add_item({
+                        'filename': record.filename,
                         'success': False,
                         'error': 'Upload failed'
                     })
                     
             except Exception as e:
-                results.append({
-                    'filename': file_info.get('filename', 'unknown'),
+                job.add_item({
+                    'filename': record.filename,
                     'success': False,
                     'error': str(e)
                 })
-        
-        successful_uploads = sum(1 for r in results if r['success'])
-        
-        return jsonify({
-            'total_files': len(files),
-            'successful_uploads': successful_uploads,
-            'results': results
-        })
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    finally:
+        workspace_manager.release_client()
+    
+    return {
+        'total_files': len(files),
+        'successful_uploads': sum(1 for item in job.items if item['success']),
+        'bytes_saved': sum(item.get('bytes_saved', 0) for item in job.items)
+    }
+
+
+def run_cleanup_job(job):
+    """Background job: remove duplicate files"""
+    duplicates = file_manager.cleanup_duplicates()
+    catalog_watcher.notify()
+    return {
+        'removed_files': duplicates,
+        'count': len(duplicates)
+    }
+
+
+def run_pull_from_drive_job(job):
+    """Background job: mirror the Drive exports folder into the export directory"""
+    mirror = DriveMirror(workspace_manager, file_manager)
+    try:
+        return mirror.pull(progress=job.add_item, should_stop=lambda: job.cancel_requested,
+                           on_total=job.set_total)
+    finally:
+        workspace_manager.release_client()
+        catalog_watcher.notify()
+
+
+# Drive jobs mostly wait on Google, so they run on their own (larger) pool
+job_manager.register('upload_to_drive', run_upload_job, pool='drive')
+job_manager.register('list_drive_files', run_list_drive_files_job, pool='drive', keep=1)
+job_manager.register('batch_upload', run_batch_upload_job, pool='drive')
+job_manager.register('pull_from_drive', run_pull_from_drive_job, pool='drive')
+job_manager.register('cleanup_duplicates', run_cleanup_job)
+
+
+@app.route('/api/batch_upload_to_drive', methods=['POST'])
+def api_batch_upload_to_drive():
+    """API endpoint for batch upload to Google Drive (runs as a background job)"""
+    data = request.get_json(silent=True) or {}
+    convert = data.get('convert', False)
+    
+    if not workspace_manager.credentials:
+        return jsonify({'error': 'Google Workspace not configured'}), 400
+    
+    job = job_manager.submit('batch_upload', {'convert': bool(convert)})
+    return jsonify({'job_id': job.id, 'status': job.status}), 202
+
+
+@app.route('/api/pull_from_drive', methods=['POST'])
+def api_pull_from_drive():
+    """API endpoint for mirroring the Drive folder to local storage (runs as a background job)"""
+    if not workspace_manager.credentials:
+        return jsonify({'error': 'Google Workspace not configured'}), 400
+    
+    job = job_manager.submit('pull_from_drive')
+    return jsonify({'job_id': job.id, 'status': job.status}), 202
 
 
 @app.route('/api/search', methods=['GET'])
+@response_cache.cached
 def api_search():
     """API endpoint for searching files"""
     query = request.args.get('q', '')
     
-    if not query:
-        files = file_manager.list_html_files()
-    else:
-        files = file_manager.search_files(query)
+    try:
+        fields = requested_fields()
+        files, facets = catalog.search_with_facets(query, fields)
+    except QueryError as e:
+        return jsonify({'error': f'Invalid search: {e}'}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    return jsonify({'files': files})
+    return json_response({'files': files, 'facets': facets})
+
+
+@app.route('/api/search_index/')
+def api_search_index():
+    """API endpoint for the client-side search index manifest (revalidated by ETag)"""
+    catalog.refresh()
+    index = catalog.client_search_index()
+    
+    response = json_response(index.manifest(url_for('api_search_index')))
+    response.set_etag(index.version)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+
+@app.route('/api/search_index/<name>')
+def api_search_index_file(name):
+    """API endpoint for a client-side search index file (content-addressed, cached for good)"""
+    index = catalog.client_search_index()
+    compressed = 'gzip' in request.accept_encodings
+    body = index.get(name, compressed=compressed)
+    if body is None:
+        return jsonify({'error': 'Search index file not found'}), 404
+    
+    response = Response(body, mimetype='application/json')
+    if compressed:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.set_etag(index.etag(name) + ('-gzip' if compressed else ''))
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    response.vary.add('Accept-Encoding')
+    return response.make_conditional(request)
+
+
+@app.route('/api/grep')
+def api_grep():
+    """API endpoint for exact or regex search of the raw HTML, streamed as NDJSON
+
+    One JSON object per match, written as each file finishes, then a final
+    {"summary": {...}} line. Regular expressions need the admin token unless
+    grep.api_regex is set, and at most grep.max_concurrent searches run at
+    once.
+    """
+    pattern = request.args.get('q', '')
+    max_count = request.args.get('max_count', type=int)
+    regex = request.args.get('regex') in ('1', 'true')
+    if regex and not (config.get('grep.api_regex', False) or profiler.is_admin()):
+        return jsonify({'error': 'Regular expression search requires the admin token'}), 403
+    try:
+        searcher = Grep(pattern,
+                        regex=regex,
+                        ignore_case=request.args.get('ignore_case') in ('1', 'true'),
+                        max_matches=max_count)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if not grep_slots.acquire(blocking=False):
+        return jsonify({'error': 'Too many searches running, try again shortly'}), 429
+    released = []
+    
+    def release():
+        # Reached from the generator, and from closing a response it never ran for
+        if not released:
+            released.append(True)
+            grep_slots.release()
+    
+    file_glob = request.args.get('files')
+    records = file_manager.iter_html_files()
+    if file_glob:
+        records = (record for record in records if fnmatch.fnmatch(record.filename, file_glob))
+    
+    def generate():
+        try:
+            for match in searcher.search(records):
+                yield serialization.dumps(match) + b'\n'
+            yield serialization.dumps({'summary': searcher.stats}) + b'\n'
+        finally:
+            release()
+    
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                        headers={'Cache-Control': 'no-store', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(release)
+    return response
+
+
+def admin_error():
+    """Error response unless the request carries the admin token; None if it does"""
+    if not profiler.admin_token:
+        return jsonify({'error': 'Admin endpoints are disabled (set profiling.admin_token)'}), 404
+    if not profiler.is_admin():
+        return jsonify({'error': 'Admin token required'}), 403
+    return None
+
+
+@app.route('/api/admin/profiles')
+def api_list_profiles():
+    """Captured request profiles, newest first"""
+    error = admin_error()
+    if error:
+        return error
+    return json_response({'profiles': profiler.list_profiles(), 'max_profiles': profiler.max_profiles,
+                          'slow_request_ms': profiler.slow_request_ms})
+
+
+@app.route('/api/admin/profiles/<profile_id>')
+def api_get_profile(profile_id):
+    """A captured profile's summary, as JSON or (?format=text) plain text"""
+    error = admin_error()
+    if error:
+        return error
+    record = profiler.get(profile_id)
+    if not record:
+        return jsonify({'error': 'Profile not found'}), 404
+    
+    report = profiler.report(record, limit=request.args.get('limit', 40, type=int))
+    if request.args.get('format') == 'text':
+        return Response(report, mimetype='text/plain')
+    summary = {key: value for key, value in record.items() if key not in ('data', 'stacks')}
+    return json_response(dict(summary, report=report))
+
+
+@app.route('/api/admin/profiles/<profile_id>/download')
+def api_download_profile(profile_id):
+    """A captured profile as a pstats file (cProfile) or collapsed stacks (sampling)"""
+    error = admin_error()
+    if error:
+        return error
+    record = profiler.get(profile_id)
+    if not record:
+        return jsonify({'error': 'Profile not found'}), 404
+    
+    body, mimetype, download_name = profiler.download(record)
+    return Response(body, mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{download_name}"'})
+
+
+@app.route('/api/cache/stats')
+def api_cache_stats():
+    """Response cache hit ratio and size counters"""
+    return jsonify(response_cache.stats())
+
+
+@app.route('/api/events')
+def api_events():
+    """Server-Sent Events stream of catalog changes, stats and job progress"""
+    subscriber = event_broker.subscribe()
+    if subscriber is None:
+        return jsonify({'error': 'Too many event stream connections'}), 503
+    
+    catalog_watcher.start()
+    catalog.refresh()
+    initial_events = [('stats', catalog_watcher.current_stats())]
+    
+    return Response(
+        stream_events(event_broker, subscriber, initial_events),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 
 @app.route('/api/file_metadata/<path:filename>')
 def api_file_metadata(filename):
     """API endpoint to get file metadata"""
-    file_path = os.path.join(file_manager.export_directory, filename)
+    file_path = file_manager.resolve_path(filename)
     
-    if not os.path.exists(file_path):
+    if not file_path:
         return jsonify({'error': 'File not found'}), 404
     
-    metadata = file_manager.get_file_metadata(file_path)
-    return jsonify(metadata)
+    try:
+        fields = requested_fields()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Only the requested fields are computed, e.g. no HTML parse for fields=filename,size_bytes
+    metadata = file_manager.get_file_metadata(file_path, fields)
+    return json_response(metadata)
+
+
+@app.route('/api/versions/<path:filename>')
+def api_list_versions(filename):
+    """API endpoint to list the recorded versions of a file"""
+    if not file_manager.resolve_path(filename):
+        return jsonify({'error': 'File not found'}), 404
+    
+    return jsonify({
+        'filename': filename,
+        'versions': file_manager.list_versions(filename),
+        'usage': file_manager.versions.usage(filename)
+    })
+
+
+@app.route('/api/versions/<path:filename>/<int:version>')
+def api_get_version(filename, version):
+    """API endpoint to download a past version of a file, rebuilt from its deltas"""
+    try:
+        content = file_manager.get_version(filename, version)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 409
+    
+    if content is None:
+        return jsonify({'error': 'Version not found'}), 404
+    
+    name, ext = os.path.splitext(os.path.basename(filename))
+    response = Response(content, mimetype=mimetypes.guess_type(filename)[0] or 'text/html')
+    if request.args.get('download'):
+        response.headers['Content-Disposition'] = f'attachment; filename="{name}_v{version}{ext}"'
+    return response
+
+
+@app.route('/api/versions/<path:filename>/<int:version>/restore', methods=['POST'])
+def api_restore_version(filename, version):
+    """API endpoint to make a past version of a file the current one"""
+    try:
+        result = file_manager.restore_version(filename, version)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 409
+    
+    if not result:
+        return jsonify({'error': 'Version not found'}), 404
+    
+    catalog_watcher.notify()
+    return jsonify({'filename': filename, 'version': file_manager.list_versions(filename)[-1]['version']})
 
 
 @app.route('/api/cleanup_duplicates', methods=['POST'])
 def api_cleanup_duplicates():
-    """API endpoint to cleanup duplicate files"""
-    try:
-        duplicates = file_manager.cleanup_duplicates()
-        return jsonify({
-            'removed_files': duplicates,
-            'count': len(duplicates)
-        })
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    """API endpoint to cleanup duplicate files (runs as a background job)"""
+    job = job_manager.submit('cleanup_duplicates')
+    return jsonify({'job_id': job.id, 'status': job.status}), 202
+
+
+@app.route('/api/jobs', methods=['GET'])
+def api_list_jobs():
+    """API endpoint to list background jobs"""
+    return jsonify({'jobs': [job.to_dict(include_items=False) for job in job_manager.list_jobs()]})
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def api_job_status(job_id):
+    """API endpoint to get a job's status, per-file progress and results"""
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify(job.to_dict())
+
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def api_cancel_job(job_id):
+    """API endpoint to cancel a queued or running job"""
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    if not job_manager.cancel(job_id):
+        return jsonify({'error': f'Job already {job.status}'}), 409
+    
+    return jsonify({'job_id': job.id, 'status': job.status, 'cancel_requested': True})
 
 
 @app.route('/gemini-manager/download/<path:filename>')
 def download_file(filename):
     """Download HTML file"""
-    file_path = os.path.join(file_manager.export_directory, filename)
-    
-    if not os.path.exists(file_path):
+    if not file_manager.resolve_path(filename):
         flash(f'File not found: {filename}', 'error')
         return redirect(url_for('list_files'))
     
-    return send_file(file_path, as_attachment=True)
+    return send_export_file(file_manager.export_directory, filename, as_attachment=True)
+
+
+@app.teardown_request
+def release_google_clients(error=None):
+    """Hand this thread's Drive/Docs clients back to the pool for other requests"""
+    workspace_manager.release_client()
 
 
 @app.errorhandler(404)
@@ -300,7 +805,7 @@ def internal_error(error):
 @app.route('/html_exports/<path:filename>')
 def serve_html_exports(filename):
     """Serve HTML export files"""
-    return send_from_directory(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'html_exports'), filename)
+    return send_export_file(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'html_exports'), filename)
 
 @app.route('/projects/<path:filename>')
 def serve_projects(filename):
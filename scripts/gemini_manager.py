@@ -3,6 +3,7 @@
 Command Line Interface for Gemini HTML Manager
 """
 import click
+import fnmatch
 import os
 import sys
 from typing import List
@@ -11,8 +12,14 @@ from typing import List
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from gemini_html_manager.file_manager import HTMLFileManager
-from gemini_html_manager.google_workspace import GoogleWorkspaceManager
+from gemini_html_manager.google_workspace import GoogleWorkspaceManager, conversion_error
 from gemini_html_manager.config import config
+from gemini_html_manager import storage
+from gemini_html_manager.catalog import Catalog
+from gemini_html_manager.static_site import StaticSiteBuilder
+from gemini_html_manager.search import QueryError
+from gemini_html_manager.grep import Grep
+from gemini_html_manager import serialization
 
 
 @click.group()
@@ -39,18 +46,28 @@ def import_file(source_path: str, name: str):
 
 @cli.command()
 @click.option('--format', 'output_format', type=click.Choice(['table', 'json']), default='table')
-def list_files(output_format: str):
+@click.option('--fields', help='Comma-separated metadata fields to include in JSON output, e.g. filename,title')
+def list_files(output_format: str, fields: str):
     """List all HTML files in the export directory"""
+    try:
+        field_list = serialization.parse_fields(fields)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='--fields')
+    
     manager = HTMLFileManager()
-    files = manager.list_html_files()
+    if field_list and output_format == 'json':
+        # Only the requested fields are computed for each file
+        records = sorted(manager.iter_html_files(), key=lambda r: r.created_timestamp, reverse=True)
+        files = [record.to_dict(field_list) for record in records]
+    else:
+        files = manager.list_html_files()
     
     if not files:
         click.echo("No HTML files found in export directory")
         return
     
     if output_format == 'json':
-        import json
-        click.echo(json.dumps(files, indent=2, default=str))
+        click.echo(serialization.dumps(files, indent=True).decode('utf-8'))
     else:
         # Table format
         click.echo(f"{'Filename':<30} {'Size (MB)':<10} {'Title':<40} {'Created':<20}")
@@ -68,9 +85,22 @@ def list_files(output_format: str):
 @cli.command()
 @click.argument('query')
 def search(query: str):
-    """Search HTML files by filename, title, or content"""
-    manager = HTMLFileManager()
-    results = manager.search_files(query)
+    """Search HTML files with a structured query
+
+    \b
+    Examples:
+      search "sales chart"
+      search 'title:roadmap size>2mb'
+      search 'is:canvas has:images created:2025-01..2025-03'
+      search 'NOT has:links OR words<100'
+    """
+    catalog = Catalog(HTMLFileManager())
+    catalog.refresh()
+    try:
+        results, facets = catalog.search_with_facets(query)
+    except QueryError as e:
+        click.echo(f"Invalid search: {e}", err=True)
+        sys.exit(1)
     
     if not results:
         click.echo(f"No files found matching: {query}")
@@ -84,6 +114,56 @@ def search(query: str):
         filename = file_info.get('filename', '')[:29]
         title = file_info.get('title', '')[:39]
         click.echo(f"{filename:<30} {title:<40}")
+    
+    flags = facets['flags']
+    click.echo("-" * 70)
+    click.echo(f"Gemini Canvas: {flags['is_gemini_canvas']}  With images: {flags['has_images']}  "
+               f"With links: {flags['has_links']}")
+    click.echo("Size: " + ", ".join(f"{band['value']} ({band['count']})" for band in facets['size']))
+
+
+@cli.command()
+@click.argument('pattern')
+@click.option('--ignore-case', '-i', is_flag=True, help='Match ASCII letters regardless of case')
+@click.option('--regex', '-E', is_flag=True, help='Treat PATTERN as a regular expression (Python syntax)')
+@click.option('--files', 'file_glob', default=None, help='Only search files whose name matches this glob, e.g. "report*"')
+@click.option('--max-count', '-m', type=int, default=None,
+              help='Stop after this many matches per file (default: grep.max_matches_per_file, 0 for no limit)')
+@click.option('--workers', type=int, default=None, help='Worker processes (default: grep.workers, or one per CPU)')
+@click.option('--json', 'as_json', is_flag=True, help='Print one JSON object per match')
+def grep(pattern: str, ignore_case: bool, regex: bool, file_glob: str, max_count: int, workers: int, as_json: bool):
+    """Search the raw HTML of every file for exact bytes or a regex
+
+    \b
+    Examples:
+      grep 'cdn.plot.ly'
+      grep -i 'class="chart-container'
+      grep -E 'https://[a-z.]+/gtag/js'
+    """
+    try:
+        searcher = Grep(pattern, regex=regex, ignore_case=ignore_case, max_matches=max_count, workers=workers)
+    except ValueError as e:
+        click.echo(f"Invalid pattern: {e}", err=True)
+        sys.exit(1)
+    
+    records = HTMLFileManager().iter_html_files()
+    if file_glob:
+        records = (record for record in records if fnmatch.fnmatch(record.filename, file_glob))
+    
+    for match in searcher.search(records):
+        if as_json:
+            click.echo(serialization.dumps(match).decode('utf-8'))
+        else:
+            click.echo(f"{match['filename']}:{match['line']}:{match['offset']}: {match['text']}")
+    
+    stats = searcher.stats
+    click.echo(f"{stats['matches']} matches in {stats['files_matched']} of {stats['files_searched']} files "
+               f"({stats['bytes_searched'] / 1024 / 1024:.1f} MB in {stats['seconds']:.2f}s)", err=True)
+    if stats['truncated_files']:
+        click.echo(f"Stopped early in {len(stats['truncated_files'])} files after {searcher.max_matches} matches",
+                   err=True)
+    if not stats['matches']:
+        sys.exit(1)
 
 
 @cli.command()
@@ -98,8 +178,16 @@ def upload(file_path: str, title: str, convert: bool):
         click.echo("Google Workspace authentication failed. Please check credentials.", err=True)
         sys.exit(1)
     
+    conversion_stats = None
     if convert:
-        file_id = workspace_manager.convert_html_to_google_doc(file_path, title)
+        doc_ids, conversion_stats = workspace_manager.convert_html_with_stats(file_path, title)
+        error = conversion_error(doc_ids, conversion_stats)
+        if error:
+            click.echo(f"Failed to convert {file_path}: {error}", err=True)
+            if doc_ids:
+                click.echo(f"Created before the failure: {', '.join(doc_ids)}", err=True)
+            sys.exit(1)
+        file_id = doc_ids[0]
         file_type = "Google Doc"
     else:
         file_id = workspace_manager.upload_html_file(file_path, title)
@@ -112,6 +200,10 @@ def upload(file_path: str, title: str, convert: bool):
             click.echo(f"View link: {file_info['webViewLink']}")
         else:
             click.echo(f"Uploaded {file_type} with ID: {file_id}")
+        if conversion_stats:
+            click.echo(f"Saved {conversion_stats['bytes_saved'] / 1024:.1f} KB of "
+                       f"{conversion_stats['original_bytes'] / 1024:.1f} KB, "
+                       f"converted in {conversion_stats['seconds']:.2f}s")
     else:
         click.echo(f"Failed to upload {file_type}", err=True)
         sys.exit(1)
@@ -135,18 +227,9 @@ def batch_upload(directory: str, convert: bool):
         click.echo(f"Directory not found: {directory}", err=True)
         sys.exit(1)
     
-    # Get list of HTML files
+    # Get list of HTML files (paths only, so no file is opened or parsed here)
     manager = HTMLFileManager()
-    if directory == manager.export_directory:
-        files = manager.list_html_files()
-        file_paths = [f['path'] for f in files]
-    else:
-        # Scan directory for HTML files
-        supported_extensions = config.get('html_manager.supported_extensions', ['.html', '.htm'])
-        file_paths = []
-        for filename in os.listdir(directory):
-            if any(filename.lower().endswith(ext) for ext in supported_extensions):
-                file_paths.append(os.path.join(directory, filename))
+    file_paths = [record.path for record in manager.iter_html_files(directory)]
     
     if not file_paths:
         click.echo(f"No HTML files found in {directory}")
@@ -159,8 +242,14 @@ def batch_upload(directory: str, convert: bool):
         filename = os.path.basename(file_path)
         
         try:
+            conversion_stats = None
             if convert:
-                file_id = workspace_manager.convert_html_to_google_doc(file_path)
+                doc_ids, conversion_stats = workspace_manager.convert_html_with_stats(file_path)
+                error = conversion_error(doc_ids, conversion_stats)
+                if error:
+                    click.echo(f"✗ Failed to convert {filename}: {error}")
+                    continue
+                file_id = doc_ids[0]
                 file_type = "Google Doc"
             else:
                 file_id = workspace_manager.upload_html_file(file_path)
@@ -168,7 +257,12 @@ def batch_upload(directory: str, convert: bool):
             
             if file_id:
                 uploaded_count += 1
-                click.echo(f"✓ Uploaded {filename} as {file_type}")
+                if conversion_stats:
+                    click.echo(f"✓ Uploaded {filename} as {file_type} "
+                               f"({conversion_stats['bytes_saved'] / 1024:.1f} KB saved, "
+                               f"{conversion_stats['seconds']:.2f}s)")
+                else:
+                    click.echo(f"✓ Uploaded {filename} as {file_type}")
             else:
                 click.echo(f"✗ Failed to upload {filename}")
                 
@@ -178,6 +272,35 @@ def batch_upload(directory: str, convert: bool):
     click.echo(f"\nCompleted: {uploaded_count}/{len(file_paths)} files uploaded successfully")
 
 
+@cli.command()
+@click.option('--workers', type=int, default=None, help='Concurrent downloads (default: mirror.workers)')
+def pull(workers: int):
+    """Download the Google Drive folder into the export directory (Docs as HTML)"""
+    from gemini_html_manager.drive_mirror import DriveMirror
+
+    workspace_manager = GoogleWorkspaceManager()
+    
+    if not workspace_manager.credentials:
+        click.echo("Google Workspace authentication failed. Please check credentials.", err=True)
+        sys.exit(1)
+    
+    def report(item):
+        if item['status'] == 'downloaded':
+            click.echo(f"✓ Downloaded {item['filename']} ({item['bytes'] / 1024:.1f} KB)")
+        elif item['status'] == 'failed':
+            click.echo(f"✗ Failed to download {item['filename']}: {item.get('error')}")
+    
+    mirror = DriveMirror(workspace_manager, HTMLFileManager(), workers=workers)
+    result = mirror.pull(progress=report)
+    
+    click.echo(f"\nCompleted: {result['downloaded']} downloaded, {result['skipped']} unchanged, "
+               f"{result['failed']} failed of {result['total_files']} files")
+    click.echo(f"Throughput: {result['files_per_second']:.1f} files/s, {result['mb_per_second']:.2f} MB/s "
+               f"({result['bytes'] / (1024 * 1024):.2f} MB in {result['seconds']:.1f}s)")
+    if result['failed']:
+        sys.exit(1)
+
+
 @cli.command()
 def list_drive_files():
     """List files in Google Drive Gemini folder"""
@@ -222,6 +345,145 @@ def cleanup():
         click.echo("No duplicates found")
 
 
+@cli.command()
+@click.option('--method', type=click.Choice(['none', 'gzip', 'zstd']), default=None,
+              help='Storage compression to apply (default: html_manager.storage_compression)')
+@click.option('--dry-run', is_flag=True, help='Show which files would be converted without changing them')
+def compress_exports(method: str, dry_run: bool):
+    """Convert stored exports to the configured compressed-at-rest format"""
+    if method is None:
+        method = config.get('html_manager.storage_compression', 'none')
+    method = None if method == 'none' else method
+    
+    if method == 'zstd' and storage.zstandard is None:
+        click.echo("zstd storage requires the 'zstandard' package", err=True)
+        sys.exit(1)
+    
+    manager = HTMLFileManager()
+    converted = manager.convert_storage(method, dry_run=dry_run)
+    
+    if not converted:
+        click.echo("All files already use the requested storage format")
+        return
+    
+    label = method or 'uncompressed'
+    if dry_run:
+        click.echo(f"Would convert {len(converted)} files to {label} storage:")
+        for result in converted:
+            click.echo(f"  - {result['filename']}")
+        return
+    
+    old_total = sum(r['old_size'] for r in converted)
+    new_total = sum(r['new_size'] for r in converted)
+    click.echo(f"Converted {len(converted)} files to {label} storage")
+    click.echo(f"Size on disk: {old_total / 1024:.1f}KB -> {new_total / 1024:.1f}KB")
+
+
+@cli.command()
+@click.option('--layout', type=click.Choice(list(storage.LAYOUTS)), default=None,
+              help='Layout to migrate to (default: html_manager.layout)')
+@click.option('--dry-run', is_flag=True, help='Show which files would be moved without moving them')
+def migrate_layout(layout: str, dry_run: bool):
+    """Move stored exports between the flat and sharded (ab/cd/<file>) layouts"""
+    if layout is None:
+        layout = storage.get_layout()
+    
+    manager = HTMLFileManager()
+    moved = manager.migrate_layout(layout, dry_run=dry_run)
+    
+    if not moved:
+        click.echo(f"All files already use the {layout} layout")
+        return
+    
+    if dry_run:
+        click.echo(f"Would move {len(moved)} files to the {layout} layout:")
+        for result in moved:
+            click.echo(f"  - {result['old_path']} -> {result['new_path']}")
+        return
+    
+    failed = [result for result in moved if result['new_path'] is None]
+    click.echo(f"Moved {len(moved) - len(failed)} files to the {layout} layout")
+    for result in failed:
+        click.echo(f"✗ Could not move {result['old_path']}", err=True)
+    if layout != config.get('html_manager.layout', 'flat'):
+        click.echo(f"Set html_manager.layout: {layout} in config.yaml so new imports use it")
+
+
+@cli.command()
+@click.argument('filename')
+def versions(filename: str):
+    """List the recorded versions of an export"""
+    manager = HTMLFileManager()
+    if not manager.resolve_path(filename):
+        click.echo(f"File not found: {filename}", err=True)
+        sys.exit(1)
+    
+    history = manager.list_versions(filename)
+    if not history:
+        click.echo(f"{filename} has a single version (never re-imported)")
+        return
+    
+    click.echo(f"{'Version':<9} {'Created':<20} {'Size':>10} {'Stored':>10}")
+    for entry in history:
+        stored = 'current' if entry['current'] else f"{entry['delta_bytes']}B"
+        click.echo(f"{entry['version']:<9} {entry['created']:<20} {entry['size']:>9}B {stored:>10}")
+    
+    usage = manager.versions.usage(filename)
+    if usage['delta_bytes']:
+        click.echo(f"\nPast versions: {usage['full_bytes']}B in full, stored as {usage['delta_bytes']}B of deltas "
+                   f"({usage['full_bytes'] / usage['delta_bytes']:.1f}x)")
+
+
+@cli.command()
+@click.argument('filename')
+@click.argument('version', type=int)
+@click.option('--output', '-o', type=click.Path(), help='Write the version to a file instead of stdout')
+@click.option('--restore', is_flag=True, help='Make this version the current one')
+def show_version(filename: str, version: int, output: str, restore: bool):
+    """Rebuild a past version of an export"""
+    manager = HTMLFileManager()
+    try:
+        content = manager.get_version(filename, version)
+    except ValueError as e:
+        click.echo(f"✗ {e}", err=True)
+        sys.exit(1)
+    
+    if content is None:
+        click.echo(f"No version {version} of {filename}", err=True)
+        sys.exit(1)
+    
+    if restore:
+        if manager.restore_version(filename, version):
+            click.echo(f"✓ Restored version {version} of {filename}")
+        else:
+            click.echo("✗ Restore failed", err=True)
+            sys.exit(1)
+    elif output:
+        with open(output, 'wb') as f:
+            f.write(content)
+        click.echo(f"Wrote version {version} of {filename} to {output}")
+    else:
+        click.echo(content.decode('utf-8', errors='replace'), nl=False)
+
+
+@cli.command()
+@click.option('--output', '-o', default=None, help='Output directory (default: static_site.output_directory)')
+@click.option('--base-url', default=None, help='URL path the output is served under (default: static_site.base_url)')
+@click.option('--force', is_flag=True, help='Re-render every page, ignoring the previous build')
+def build_static(output: str, base_url: str, force: bool):
+    """Pre-render the gallery and file browser for any static file server"""
+    builder = StaticSiteBuilder(HTMLFileManager(), output_directory=output, base_url=base_url)
+    result = builder.build(force=force)
+    
+    click.echo(f"Built {builder.output_directory} in {result['seconds']:.2f}s"
+               f"{' (full rebuild)' if result['full_rebuild'] else ''}")
+    click.echo(f"  Files: {result['files']} ({result['exports_copied']} copied)")
+    click.echo(f"  Pages: {result['pages_rendered']} rendered, {result['pages_unchanged']} unchanged")
+    click.echo(f"  Public files copied: {result['public_copied']}")
+    if result['removed']:
+        click.echo(f"  Removed: {result['removed']} stale files")
+
+
 @cli.command()
 @click.option('--format', 'export_format', type=click.Choice(['csv', 'json']), default='csv')
 def export_list(export_format: str):
@@ -231,6 +493,271 @@ def export_list(export_format: str):
     click.echo(f"Exported file list to: {filename}")
 
 
+def synthetic_entries(count: int) -> List[dict]:
+    """Metadata dicts shaped like catalog entries, for benchmarking without a corpus"""
+    entries = []
+    for i in range(count):
+        entries.append({
+            'filename': f'gemini_export_{i:06d}.html',
+            'path': os.path.abspath(os.path.join('html_exports', f'gemini_export_{i:06d}.html')),
+            'size_bytes': 20000 + (i * 7919) % 3000000,
+            'size_mb': round((20000 + (i * 7919) % 3000000) / (1024 * 1024), 2),
+            'created_time': f'2025-{i % 12 + 1:02d}-{i % 28 + 1:02d}T10:{i % 60:02d}:00',
+            'modified_time': f'2025-{i % 12 + 1:02d}-{i % 28 + 1:02d}T11:{i % 60:02d}:00',
+            'checksum': f'{i:032x}',
+            'bytes_saved': 0,
+            'title': f'Gemini Canvas export {i}',
+            'description': 'Synthetic entry used for benchmarking',
+            'word_count': 100 + i % 5000,
+            'has_images': i % 2 == 0,
+            'has_links': i % 3 == 0,
+            'is_gemini_canvas': i % 4 != 0
+        })
+    return entries
+
+
+def measure_catalog_memory(entries: List[dict]):
+    """Bytes allocated to hold entries as metadata dicts vs CatalogEntry records"""
+    import json
+    import tracemalloc
+    from datetime import datetime
+    from gemini_html_manager.catalog import CatalogEntry
+
+    # Decode fresh copies so neither side shares strings with the input
+    body = json.dumps(entries)
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        dicts = json.loads(body)
+        dict_bytes = tracemalloc.get_traced_memory()[0] - base
+        del dicts
+
+        base = tracemalloc.get_traced_memory()[0]
+        source = json.loads(body)
+        compact = [
+            CatalogEntry(e['path'], e, datetime.fromisoformat(e['created_time']).timestamp(),
+                         int(datetime.fromisoformat(e['modified_time']).timestamp() * 1_000_000_000))
+            for e in source
+        ]
+        del source
+        compact_bytes = tracemalloc.get_traced_memory()[0] - base
+        del compact
+    finally:
+        tracemalloc.stop()
+    return dict_bytes, compact_bytes
+
+
+@cli.command()
+@click.option('--fields', default='filename,title', show_default=True,
+              help='Projection to compare against full metadata')
+@click.option('--synthetic', type=int, default=0, help='Benchmark N synthetic entries instead of the export directory')
+@click.option('--repeat', type=int, default=5, show_default=True, help='Runs per measurement (best is reported)')
+def benchmark(fields: str, synthetic: int, repeat: int):
+    """Measure JSON response size, encode time and catalog memory"""
+    import time
+
+    try:
+        field_list = serialization.parse_fields(fields)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='--fields')
+
+    if synthetic:
+        entries = synthetic_entries(synthetic)
+    else:
+        catalog = Catalog(HTMLFileManager())
+        start = time.perf_counter()
+        catalog.refresh()
+        click.echo(f"Catalog refresh: {(time.perf_counter() - start) * 1000:.1f}ms")
+        entries = catalog.entries()
+
+    click.echo(f"JSON serialization of {len(entries)} entries (best of {repeat}):")
+    click.echo(f"{'Encoder':<10} {'Fields':<30} {'Size (KB)':>12} {'Encode (ms)':>12}")
+    click.echo("-" * 67)
+
+    encoders = [('json', False)] + ([('orjson', True)] if serialization.orjson is not None else [])
+    for payload_fields in (None, field_list):
+        payload = {'files': serialization.project(entries, payload_fields)}
+        label = 'all' if payload_fields is None else ','.join(payload_fields)
+        for name, use_orjson in encoders:
+            timings = []
+            for _ in range(max(repeat, 1)):
+                start = time.perf_counter()
+                body = serialization.dumps(payload, use_orjson=use_orjson)
+                timings.append(time.perf_counter() - start)
+            click.echo(f"{name:<10} {label[:30]:<30} {len(body) / 1024:>12.1f} {min(timings) * 1000:>12.2f}")
+
+    click.echo(f"API responses use: {serialization.encoder_name()}")
+
+    dict_bytes, compact_bytes = measure_catalog_memory(entries)
+    click.echo(f"\nCatalog memory for {len(entries)} entries:")
+    click.echo(f"{'Metadata dicts':<30} {dict_bytes / (1024 * 1024):>10.1f} MB")
+    click.echo(f"{'CatalogEntry records':<30} {compact_bytes / (1024 * 1024):>10.1f} MB")
+
+
+@cli.command()
+@click.option('--host', default=None, help='Interface to listen on (default: emulator.host)')
+@click.option('--port', type=int, default=None, help='Port to listen on (default: emulator.port)')
+@click.option('--latency-ms', type=float, default=None, help='Delay added to every request')
+@click.option('--latency-jitter-ms', type=float, default=None, help='Random extra delay, up to this much')
+@click.option('--error-rate', type=float, default=None, help='Fraction of requests failed with a 500')
+@click.option('--rate-limit-rate', type=float, default=None, help='Fraction of requests failed with a 429')
+@click.option('--max-requests-per-second', type=float, default=None, help='Answer requests beyond this rate with a 429')
+def drive_emulator(host: str, port: int, **faults):
+    """Run a local Drive v3 emulator for offline testing and benchmarks"""
+    from gemini_html_manager.drive_emulator import DriveEmulator
+
+    faults = {name: value for name, value in faults.items() if value is not None}
+    try:
+        emulator = DriveEmulator(host, port, **faults)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+    click.echo(f"Drive emulator listening at {emulator.url}")
+    click.echo(f"Point the manager at it with google.api_endpoint: {emulator.url}")
+    click.echo(f"Fault injection: {emulator.stats()['faults']}")
+    try:
+        emulator.serve_forever()
+    except KeyboardInterrupt:
+        click.echo(f"\nRequests served: {emulator.stats()['statuses']}")
+
+
+@cli.command()
+@click.option('--files', 'file_count', type=int, default=50, show_default=True, help='Number of files to upload')
+@click.option('--size-kb', type=int, default=20, show_default=True, help='Size of each generated file')
+@click.option('--workers', type=int, default=4, show_default=True, help='Concurrent uploads')
+@click.option('--latency-ms', type=float, default=0, show_default=True, help='Emulated API latency per request')
+@click.option('--error-rate', type=float, default=0, show_default=True, help='Fraction of requests failed with a 500')
+@click.option('--rate-limit-rate', type=float, default=0, show_default=True,
+              help='Fraction of requests failed with a 429')
+@click.option('--max-requests-per-second', type=float, default=0, show_default=True,
+              help='Emulated quota: requests beyond this rate get a 429 (0 = no limit)')
+def benchmark_upload(file_count: int, size_kb: int, workers: int, latency_ms: float, error_rate: float,
+                     rate_limit_rate: float, max_requests_per_second: float):
+    """Measure batch upload throughput and retries against a local Drive emulator"""
+    import tempfile
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from gemini_html_manager.drive_emulator import DriveEmulator
+
+    try:
+        emulator = DriveEmulator('127.0.0.1', 0, latency_ms=latency_ms, error_rate=error_rate,
+                                 rate_limit_rate=rate_limit_rate,
+                                 max_requests_per_second=max_requests_per_second)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+    config.set('google.api_endpoint', emulator.start())
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            paths = []
+            paragraph = '<p>' + 'lorem ipsum dolor sit amet ' * 4 + '</p>\n'
+            for index in range(file_count):
+                path = os.path.join(directory, f'benchmark-{index:05d}.html')
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(f'<html><head><title>Benchmark {index}</title></head><body>\n')
+                    f.write(paragraph * max(size_kb * 1024 // len(paragraph), 1))
+                    f.write('</body></html>\n')
+                paths.append(path)
+
+            workspace_manager = GoogleWorkspaceManager()
+            # Create the folder up front so workers don't race to create it
+            workspace_manager.get_or_create_gemini_folder()
+
+            def upload(path):
+                try:
+                    return workspace_manager.upload_html_file(path)
+                finally:
+                    workspace_manager.release_client()
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+                results = list(executor.map(upload, paths))
+            elapsed = time.perf_counter() - start
+    finally:
+        emulator.stop()
+
+    stats = emulator.stats()
+    uploaded = sum(1 for file_id in results if file_id)
+    total_mb = stats['uploaded_bytes'] / (1024 * 1024)
+    click.echo(f"Uploaded {uploaded}/{file_count} files with {workers} worker(s) in {elapsed:.2f}s")
+    click.echo(f"Throughput: {uploaded / elapsed:.1f} files/s, {total_mb / elapsed:.2f} MB/s")
+    click.echo(f"API requests: {stats['requests']} ({stats['rate_limited']} rate limited, "
+               f"{stats['injected_errors']} server errors)")
+    limiter = workspace_manager.rate_limiter.stats()
+    click.echo(f"Client: {limiter['retries']} retries, {limiter['failures']} failed calls, "
+               f"{limiter['waited_seconds']:.1f}s waiting for quota (all workers), "
+               f"settled at {min(limiter['user_rate'], limiter['project_rate']):.1f} requests/s")
+    if uploaded < file_count:
+        click.echo(f"Failed uploads: {file_count - uploaded}")
+
+
+@cli.command()
+@click.option('--url', default=None, help='Server to test (default: start the web interface on a free local port)')
+@click.option('--seed-corpus', 'corpus_size', type=int, default=0,
+              help='Serve N synthetic exports from a temporary directory instead of the export directory')
+@click.option('--size-kb', type=int, default=20, show_default=True, help='Average size of each synthetic export')
+@click.option('--concurrency', default='1,4,16', show_default=True, help='Comma-separated concurrency levels')
+@click.option('--duration', type=float, default=10, show_default=True, help='Seconds measured at each level')
+@click.option('--warmup', type=float, default=1, show_default=True, help='Seconds of unmeasured requests per level')
+@click.option('--route', 'routes', multiple=True,
+              help='WEIGHT:PATH to request, repeatable; {file} and {word} are filled in (default: load_test.routes)')
+@click.option('--seed', type=int, default=0, show_default=True, help='Seed for the corpus and route choices')
+@click.option('--json', 'as_json', is_flag=True, help='Print the full results as JSON')
+def load_test(url: str, corpus_size: int, size_kb: int, concurrency: str, duration: float, warmup: float,
+              routes: tuple, seed: int, as_json: bool):
+    """Measure requests/s, latency percentiles and errors for a mix of routes"""
+    import tempfile
+    from gemini_html_manager.load_test import LoadTest, LocalServer, configured_routes, parse_route, seed_corpus
+
+    try:
+        levels = [int(level) for level in concurrency.split(',') if level.strip()]
+        route_mix = [parse_route(route) for route in routes] if routes else configured_routes()
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    if not levels or min(levels) < 1:
+        raise click.BadParameter('Concurrency levels must be positive integers', param_hint='--concurrency')
+    if url and corpus_size:
+        raise click.BadParameter('--seed-corpus starts its own server and cannot be used with --url')
+
+    with tempfile.TemporaryDirectory() as directory:
+        filenames = None
+        export_directory = None
+        if corpus_size:
+            export_directory = os.path.join(directory, 'exports')
+            filenames = seed_corpus(export_directory, corpus_size, size_kb, seed)
+            click.echo(f"Seeded {corpus_size} synthetic exports (seed {seed})", err=True)
+
+        server = None
+        if not url:
+            server = LocalServer(export_directory, state_directory=os.path.join(directory, 'jobs'))
+            url = server.start()
+            click.echo(f"Started web interface at {url}", err=True)
+        try:
+            tester = LoadTest(url, route_mix, filenames=filenames, seed=seed)
+            results = []
+            for level in levels:
+                click.echo(f"Running {len(route_mix)} routes at concurrency {level} for {duration:g}s...", err=True)
+                results.append(tester.run_level(level, duration, warmup))
+        finally:
+            if server:
+                server.stop()
+
+    if as_json:
+        click.echo(serialization.dumps({'url': url, 'routes': route_mix, 'levels': results}, indent=True).decode('utf-8'))
+        return
+
+    header = f"{'Route':<40} {'Req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'Errors':>8}"
+    for result in results:
+        click.echo(f"\nConcurrency {result['concurrency']}: {result['requests']} requests in {result['seconds']:.1f}s, "
+                   f"{result['mb_per_second']} MB/s")
+        click.echo(header)
+        click.echo("-" * len(header))
+        rows = list(result['routes'].items()) + [('All routes', result)]
+        for route, stats in rows:
+            click.echo(f"{route[:40]:<40} {stats['requests_per_second']:>8.1f} {stats['p50_ms']:>8.1f} "
+                       f"{stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f} {stats['error_rate']:>7.1%}")
+
+
 @cli.command()
 def setup():
     """Setup Google Workspace credentials"""
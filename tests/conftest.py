@@ -0,0 +1,21 @@
+"""
+Shared test fixtures
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gemini_html_manager.file_manager import HTMLFileManager
+
+
+@pytest.fixture
+def make_manager():
+    """Factory for managers pointed at a temporary export directory"""
+    def make(directory):
+        manager = HTMLFileManager()
+        manager.export_directory = str(directory)
+        return manager
+    return make
@@ -0,0 +1,86 @@
+"""
+Tests for the prebuilt client-side search index
+"""
+import gzip
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gemini_html_manager.client_index import ClientSearchIndex
+from gemini_html_manager.search import SearchIndex, tokenize
+
+ENTRIES = [
+    {'filename': 'sales.html', 'title': 'Sales Report', 'description': '', 'size_bytes': 10,
+     'word_count': 5, 'created_time': '2025-01-02T00:00:00', 'has_images': True},
+    {'filename': 'notes.html', 'title': 'Salary notes', 'description': 'Team', 'size_bytes': 20,
+     'word_count': 7, 'created_time': '2025-02-03T00:00:00', 'is_gemini_canvas': True},
+]
+
+
+def decode(gaps):
+    ids, doc_id = [], 0
+    for gap in gaps:
+        doc_id += gap
+        ids.append(doc_id)
+    return ids
+
+
+def test_shards_hold_prefix_postings():
+    index = SearchIndex(ENTRIES, [tokenize('quarterly sales chart'), tokenize('chart notes')])
+    client_index = ClientSearchIndex(index)
+    manifest = client_index.manifest('/idx/')
+
+    assert manifest['format'] == 1
+    assert set(manifest['shards']) == {'ch', 'no', 'qu', 're', 'sa', 'te', 'ht'}
+    shard = json.loads(client_index.get(manifest['shards']['sa'][len('/idx/'):]))
+    assert decode(shard['meta']['sales']) == [0]
+    assert decode(shard['meta']['salary']) == [1]
+    assert decode(shard['text']['sales']) == [0]
+    chart = json.loads(client_index.get(manifest['shards']['ch'][len('/idx/'):]))
+    assert decode(chart['text']['chart']) == [0, 1]
+
+    documents = json.loads(client_index.get(manifest['documents'][len('/idx/'):]))
+    assert documents['filename'] == ['sales.html', 'notes.html']
+    assert documents['flags'] == [1, 4]
+    assert manifest['flags']['has:images'] == 1
+
+    # Names and the version only depend on content
+    again = ClientSearchIndex(SearchIndex(ENTRIES, [tokenize('quarterly sales chart'), tokenize('chart notes')]))
+    assert again.version == client_index.version and again.files.keys() == client_index.files.keys()
+    assert ClientSearchIndex(SearchIndex(ENTRIES[:1])).version != client_index.version
+
+
+def test_search_index_api_uses_etags(tmp_path, monkeypatch):
+    from gemini_html_manager import web_interface
+
+    monkeypatch.setattr(web_interface.file_manager, 'export_directory', str(tmp_path))
+    (tmp_path / 'report.html').write_text('<html><title>Quarterly report</title><body>sales</body></html>')
+    client = web_interface.app.test_client()
+
+    response = client.get('/api/search_index/')
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'no-cache'
+    manifest = response.get_json()
+    etag = response.headers['ETag']
+    assert client.get('/api/search_index/', headers={'If-None-Match': etag}).status_code == 304
+
+    shard_url = manifest['shards']['qu']
+    response = client.get(shard_url, headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'immutable' in response.headers['Cache-Control']
+    assert 'quarterly' in json.loads(gzip.decompress(response.data))['meta']
+    assert client.get(shard_url, headers={'Accept-Encoding': 'gzip', 'If-None-Match': response.headers['ETag']}
+                      ).status_code == 304
+    assert client.get('/api/search_index/search-shard.0000.json').status_code == 404
+
+    (tmp_path / 'other.html').write_text('<html><title>Other</title></html>')
+    response = client.get('/api/search_index/', headers={'If-None-Match': etag})
+    assert response.status_code == 200 and response.headers['ETag'] != etag
+
+    # The files page renders every file and hides the ones a search excludes
+    page = client.get('/gemini-manager/files?search=quarterly').get_data(as_text=True)
+    assert 'data-filename="report.html"' in page
+    assert 'd-none" data-filename="other.html"' in page
+    assert 'd-none" data-filename="report.html"' not in page
@@ -0,0 +1,96 @@
+"""
+Tests for Google Docs conversion preprocessing
+"""
+import os
+import sys
+import base64
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gemini_html_manager import conversion
+
+LOGO = base64.b64encode(b'\x89PNG fake logo bytes').decode('ascii')
+CHART = base64.b64encode(b'\x89PNG fake chart bytes').decode('ascii')
+
+
+def test_inline_images_are_deduplicated():
+    html = (f'<html><body><img src="data:image/png;base64,{LOGO}">'
+            f'<p>Text</p><img src="data:image/png;base64,{LOGO}">'
+            f'<img src="data:image/png;base64,{CHART}"></body></html>')
+    uploads = []
+    
+    def uploader(data, mime_type, digest):
+        uploads.append(digest)
+        return f'https://example.com/{digest[:8]}.png'
+    
+    processed, stats = conversion.process_inline_images(html, uploader)
+    
+    assert len(uploads) == 2
+    assert stats['inline_images'] == 3
+    assert stats['unique_images'] == 2
+    assert 'data:image' not in processed
+    assert processed.count(f'https://example.com/{uploads[0][:8]}.png') == 2
+
+
+def test_split_html_respects_max_size():
+    paragraphs = ''.join(f'<p>Paragraph {i} {"x" * 80}</p>' for i in range(50))
+    html = f'<html><head><title>Doc</title></head><body>{paragraphs}</body></html>'
+    
+    parts = conversion.split_html(html, 1000)
+    
+    assert len(parts) > 1
+    assert all(len(part) <= 1000 for part in parts)
+    assert all('<title>Doc</title>' in part for part in parts)
+    assert sum(part.count('<p>') for part in parts) == 50
+
+
+def test_small_documents_are_not_split():
+    html = '<html><body><p>Short</p></body></html>'
+    assert conversion.split_html(html, 1000) == [html]
+
+
+PAGE = '''<html><head><title>Report</title>
+<link rel="stylesheet" href="https://cdn.example.com/theme.css">
+<style>
+@import url("fonts.css");
+:root { --brand: #336699; }
+.title, .sidebar { color: var(--brand); transition: color 1s; font-weight: bold; }
+.title:hover { color: red; }
+@media (max-width: 600px) { .title { font-size: 10px; } }
+@media print { .note { font-style: italic; } }
+.unused { color: blue; }
+</style>
+<script src="https://cdn.example.com/chart.js"></script>
+</head><body onload="draw()">
+<h1 class="title hero" data-id="1" style="color: var(--brand); cursor: pointer">Quarterly report</h1>
+<canvas id="chart"></canvas><script>draw();</script><!-- build 42 -->
+<noscript><p class="note">Chart needs JavaScript</p></noscript>
+</body></html>'''
+
+
+def test_slim_html_keeps_only_referenced_styles():
+    slimmed, stats = conversion.slim_html(PAGE)
+
+    for removed in ('<script', '<canvas', '<link', 'onload', 'data-id', 'build 42', 'cursor', 'transition',
+                    'var(', ':hover', '10px', '.unused', '.sidebar', 'hero', '@import'):
+        assert removed not in slimmed
+    assert '.title{color:#336699;font-weight:bold}' in slimmed
+    assert '.note{font-style:italic}' in slimmed
+    assert '<h1 class="title" style="color:#336699">Quarterly report</h1>' in slimmed
+    assert '<p class="note">Chart needs JavaScript</p>' in slimmed
+    assert stats['removed_elements'] == 4
+    assert stats['css_rules_kept'] == 2
+
+
+def test_slim_html_drops_styling_without_preserve_formatting(monkeypatch):
+    from gemini_html_manager.config import config
+    monkeypatch.setitem(config.get('conversion'), 'preserve_formatting', False)
+
+    slimmed, _ = conversion.slim_html(PAGE)
+
+    assert '<style' not in slimmed and 'class=' not in slimmed and 'style=' not in slimmed
+    assert '<h1>Quarterly report</h1>' in slimmed
+
+    parts, stats = conversion.prepare_html_for_docs(PAGE)
+    assert stats['upload_bytes'] < stats['original_bytes'] / 2
+    assert stats['bytes_saved'] == stats['original_bytes'] - stats['upload_bytes']
@@ -0,0 +1,88 @@
+"""
+Tests for the thread-safe Google API client pool
+"""
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gemini_html_manager.drive_clients import ServiceClientPool, SharedCredentials
+
+
+class ExpiringCredentials:
+    """Minimal credentials object: invalid until refreshed"""
+
+    def __init__(self):
+        self.valid = False
+        self.token = None
+        self.refreshes = 0
+
+    def refresh(self, request):
+        self.refreshes += 1
+        self.token = f'token-{self.refreshes}'
+        self.valid = True
+
+    def apply(self, headers):
+        headers['authorization'] = f'Bearer {self.token}'
+
+
+def test_pool_gives_each_thread_its_own_client():
+    pool = ServiceClientPool(object, max_clients=2)
+    main_client = pool.acquire()
+    assert pool.acquire() is main_client
+    
+    seen = []
+    thread = threading.Thread(target=lambda: seen.append(pool.acquire()))
+    thread.start()
+    thread.join()
+    assert seen[0] is not main_client
+    
+    # The exited thread's client is reused rather than building a third one
+    pool.release()
+    assert pool.acquire() in (main_client, seen[0])
+    other = []
+    thread = threading.Thread(target=lambda: other.append(pool.acquire()))
+    thread.start()
+    thread.join()
+    assert pool.stats()['created'] == 2
+
+
+def test_shared_credentials_refresh_once():
+    credentials = ExpiringCredentials()
+    refreshed = []
+    shared = SharedCredentials(credentials, on_refresh=refreshed.append)
+    headers = [{} for _ in range(8)]
+    
+    threads = [threading.Thread(target=shared.before_request, args=(None, 'GET', '/', h)) for h in headers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert credentials.refreshes == 1
+    assert refreshed == [credentials]
+    assert all(h['authorization'] == 'Bearer token-1' for h in headers)
+    
+    # A burst of 401s for the same token triggers a single refresh
+    shared.refresh(None)
+    assert credentials.refreshes == 1
+    assert shared.token == 'token-1'
+
+
+def test_acquire_times_out_when_the_pool_is_exhausted():
+    pool = ServiceClientPool(object, max_clients=1, timeout=0.2)
+    pool.acquire()
+
+    errors = []
+
+    def acquire():
+        try:
+            pool.acquire()
+        except TimeoutError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=acquire)
+    thread.start()
+    thread.join(5)
+    assert not thread.is_alive() and len(errors) == 1
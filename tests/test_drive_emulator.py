@@ -0,0 +1,179 @@
+"""
+Tests for the local Drive v3 emulator, driven through GoogleWorkspaceManager
+"""
+import io
+import os
+import sys
+
+import pytest
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaIoBaseUpload
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gemini_html_manager.config import config
+from gemini_html_manager.drive_emulator import DriveEmulator, EmulatorError
+from gemini_html_manager.google_workspace import GoogleWorkspaceManager, conversion_error
+
+
+@pytest.fixture
+def emulator(monkeypatch):
+    emulator = DriveEmulator('127.0.0.1', 0, seed=1)
+    monkeypatch.setitem(config._config.setdefault('google', {}), 'api_endpoint', emulator.start())
+    yield emulator
+    emulator.stop()
+
+
+def write_html(tmp_path, name='page.html'):
+    path = tmp_path / name
+    path.write_text('<html><head><title>Page</title></head><body><p>Hello</p></body></html>')
+    return str(path)
+
+
+def test_upload_list_and_share(emulator, tmp_path):
+    manager = GoogleWorkspaceManager()
+    file_id = manager.upload_html_file(write_html(tmp_path))
+    assert file_id
+
+    info = manager.get_file_info(file_id)
+    assert info['name'] == 'page.html'
+    assert info['mimeType'] == 'text/html'
+    assert int(info['size']) == os.path.getsize(tmp_path / 'page.html')
+
+    assert [f['id'] for f in manager.list_gemini_files()] == [file_id]
+    permissions = manager.drive_service.permissions().list(fileId=file_id).execute()['permissions']
+    assert permissions == [{'kind': 'drive#permission', 'id': 'anyoneWithLink', 'type': 'anyone', 'role': 'reader'}]
+
+
+def test_retried_create_does_not_duplicate_a_file(emulator, tmp_path, monkeypatch):
+    monkeypatch.setitem(config.get('google.rate_limit'), 'initial_backoff', 0.001)
+    manager = GoogleWorkspaceManager()
+    manager.get_or_create_gemini_folder()
+    store_file = emulator._store_file
+    lost = []
+
+    def store_then_fail(metadata, content, content_type):
+        # The file is created, but the response is lost to a server error
+        resource = store_file(metadata, content, content_type)
+        if not lost:
+            lost.append(resource['id'])
+            raise EmulatorError(500, 'backendError', 'Backend Error')
+        return resource
+
+    monkeypatch.setattr(emulator, '_store_file', store_then_fail)
+    file_id = manager.upload_html_file(write_html(tmp_path))
+
+    assert file_id == lost[0]
+    assert [f['id'] for f in manager.list_gemini_files()] == [file_id]
+    assert emulator.stats()['statuses'].get('409') == 1
+
+
+def test_chunked_resumable_upload(emulator):
+    drive = GoogleWorkspaceManager().drive_service
+    data = os.urandom(600 * 1024)
+    request = drive.files().create(
+        body={'name': 'big.bin'},
+        media_body=MediaIoBaseUpload(io.BytesIO(data), mimetype='application/octet-stream',
+                                     chunksize=256 * 1024, resumable=True),
+        fields='id,size')
+
+    response, chunks = None, 0
+    while response is None:
+        _, response = request.next_chunk()
+        chunks += 1
+
+    assert chunks == 3
+    assert response['size'] == str(len(data))
+    assert drive.files().get_media(fileId=response['id']).execute() == data
+
+
+def test_batch_requests_and_changes_feed(emulator, tmp_path):
+    manager = GoogleWorkspaceManager()
+    drive = manager.drive_service
+    token = drive.changes().getStartPageToken().execute()['startPageToken']
+    file_id = manager.upload_html_file(write_html(tmp_path))
+
+    results = {}
+    batch = drive.new_batch_http_request(callback=lambda request_id, response, error:
+                                         results.setdefault(request_id, (response, error)))
+    batch.add(drive.files().get(fileId=file_id, fields='id,name'))
+    batch.add(drive.files().get(fileId='missing'))
+    batch.execute()
+
+    assert results['1'] == ({'id': file_id, 'name': 'page.html'}, None)
+    assert results['2'][1].status_code == 404
+
+    changes = drive.changes().list(pageToken=token).execute()
+    assert file_id in {change['fileId'] for change in changes['changes']}
+    assert 'newStartPageToken' in changes
+
+
+def test_injected_rate_limits_and_errors(emulator):
+    drive = GoogleWorkspaceManager().drive_service
+
+    emulator.configure(rate_limit_rate=1.0)
+    with pytest.raises(HttpError) as raised:
+        drive.files().list().execute()
+    assert raised.value.status_code == 429
+    assert raised.value.error_details[0]['reason'] == 'rateLimitExceeded'
+
+    emulator.configure(rate_limit_rate=0, error_rate=1.0)
+    with pytest.raises(HttpError) as raised:
+        drive.files().list().execute()
+    assert raised.value.status_code == 500
+
+    stats = emulator.stats()
+    assert stats['rate_limited'] == 1
+    assert stats['injected_errors'] == 1
+
+
+def test_unsupported_query_is_rejected(emulator):
+    drive = GoogleWorkspaceManager().drive_service
+    with pytest.raises(HttpError) as raised:
+        drive.files().list(q="fullText contains 'x'").execute()
+    assert raised.value.status_code == 400
+
+
+def test_conversion_upload_is_slimmed_and_compressed(emulator, tmp_path):
+    path = tmp_path / 'report.html'
+    paragraphs = ''.join(f'<p class="body">Quarterly revenue paragraph {i}</p>' for i in range(200))
+    path.write_text(f'<html><head><title>Report</title><style>.body {{ color: #333; }}</style>'
+                    f'<script>{"var data = [1, 2, 3];" * 500}</script></head>'
+                    f'<body><canvas id="chart"></canvas>{paragraphs}</body></html>')
+    manager = GoogleWorkspaceManager()
+
+    doc_ids, stats = manager.convert_html_with_stats(str(path))
+
+    assert len(doc_ids) == 1
+    assert stats['sent_bytes'] < stats['upload_bytes'] < stats['original_bytes']
+    assert stats['bytes_saved'] == stats['original_bytes'] - stats['sent_bytes']
+    assert stats['seconds'] >= stats['convert_seconds'] >= 0
+    assert emulator.stats()['received_bytes'] < stats['upload_bytes']
+
+    exported = manager.drive_service.files().export(fileId=doc_ids[0], mimeType='text/html').execute()
+    assert b'<script' not in exported and b'<canvas' not in exported
+    assert exported.count(b'Quarterly revenue paragraph') == 200
+
+
+def test_failed_conversion_is_not_reported_as_success(emulator, tmp_path, monkeypatch):
+    monkeypatch.setitem(config.get('conversion'), 'max_doc_size', 400)
+    path = tmp_path / 'long.html'
+    path.write_text('<html><body>' + ''.join(f'<p>Paragraph {i} {"x" * 100}</p>' for i in range(10))
+                    + '</body></html>')
+    manager = GoogleWorkspaceManager()
+    create_doc = manager._create_doc
+    calls = []
+
+    def fail_second_part(*args):
+        calls.append(args)
+        if len(calls) >= 2:
+            raise RuntimeError('connection reset')
+        return create_doc(*args)
+
+    monkeypatch.setattr(manager, '_create_doc', fail_second_part)
+
+    doc_ids, stats = manager.convert_html_with_stats(str(path))
+    assert len(doc_ids) == 1 and stats['error'] == 'connection reset'
+    assert stats['parts_converted'] == 1 and stats['seconds'] >= 0 and 'bytes_saved' in stats
+    assert conversion_error(doc_ids, stats) == f"Only 1 of {stats['parts']} parts converted: connection reset"
+    assert manager.convert_html_to_google_doc(str(path)) is None
@@ -0,0 +1,84 @@
+"""
+Tests for mirroring the Drive folder into the export directory
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gemini_html_manager.config import config
+from gemini_html_manager.drive_emulator import DriveEmulator
+from gemini_html_manager.drive_mirror import DriveMirror
+from gemini_html_manager.file_manager import HTMLFileManager
+from gemini_html_manager.google_workspace import GoogleWorkspaceManager
+
+
+@pytest.fixture
+def workspace(monkeypatch, tmp_path):
+    emulator = DriveEmulator('127.0.0.1', 0)
+    monkeypatch.setitem(config.get('google'), 'api_endpoint', emulator.start())
+    monkeypatch.setitem(config.get('google.rate_limit'), 'user_requests_per_second', 1000)
+    monkeypatch.setitem(config.get('html_manager'), 'export_directory', str(tmp_path / 'exports'))
+    yield GoogleWorkspaceManager()
+    emulator.stop()
+
+
+def write_html(directory, name, body):
+    directory.mkdir(exist_ok=True)
+    path = directory / name
+    path.write_text(f'<html><head><title>{name}</title></head><body><p>{body}</p></body></html>')
+    return str(path)
+
+
+def test_pull_downloads_files_and_docs_then_skips_unchanged(workspace, tmp_path):
+    source = tmp_path / 'source'
+    for index in range(3):
+        workspace.upload_html_file(write_html(source, f'page-{index}.html', 'x' * 5000 * index))
+    workspace.convert_html_to_google_doc(write_html(source, 'notes.html', 'Meeting notes'), 'Notes')
+
+    file_manager = HTMLFileManager()
+    items = []
+    result = DriveMirror(workspace, file_manager, workers=3, chunk_size=1024).pull(progress=items.append)
+
+    assert result['total_files'] == 4
+    assert result['downloaded'] == 4 and result['failed'] == 0
+    assert result['bytes'] > 10000
+    for index in range(3):
+        pulled = file_manager.resolve_path(f'page-{index}.html')
+        with open(pulled, encoding='utf-8') as f, open(source / f'page-{index}.html', encoding='utf-8') as g:
+            assert f.read() == g.read()
+    assert 'Meeting notes' in open(file_manager.resolve_path('Notes.html'), encoding='utf-8').read()
+    assert sorted(item['filename'] for item in items) == ['Notes.html', 'page-0.html', 'page-1.html', 'page-2.html']
+
+    again = DriveMirror(workspace, file_manager).pull()
+    assert again['skipped'] == 4 and again['downloaded'] == 0
+
+
+def test_pull_skips_local_files_with_matching_checksum(workspace, tmp_path):
+    file_manager = HTMLFileManager()
+    local_path = file_manager.import_html_file(write_html(tmp_path / 'source', 'same.html', 'Same content'))
+    workspace.upload_html_file(local_path)
+
+    result = DriveMirror(workspace, file_manager).pull()
+    assert result['skipped'] == 1 and result['downloaded'] == 0
+    assert len(os.listdir(file_manager.export_directory)) == 2  # same.html and the mirror manifest
+
+
+def test_drive_files_sharing_a_name_get_their_own_local_files(workspace, tmp_path):
+    first = workspace.upload_html_file(write_html(tmp_path / 'one', 'dup.html', 'First'))
+    second = workspace.upload_html_file(write_html(tmp_path / 'two', 'dup.html', 'Second'))
+
+    file_manager = HTMLFileManager()
+    result = DriveMirror(workspace, file_manager, workers=2).pull()
+    assert result['downloaded'] == 2
+
+    names = sorted(record.filename for record in file_manager.iter_html_files())
+    assert names[0] == 'dup.html' and names[1] in (f'dup_{first}.html', f'dup_{second}.html')
+    bodies = {open(file_manager.resolve_path(name), encoding='utf-8').read() for name in names}
+    assert {'First' in body for body in bodies} == {True, False}
+
+    again = DriveMirror(workspace, file_manager, workers=2).pull()
+    assert again['skipped'] == 2 and again['downloaded'] == 0
+    assert sorted(record.filename for record in file_manager.iter_html_files()) == names
@@ -0,0 +1,102 @@
+"""
+Tests for the Drive-bound web routes running as background jobs
+"""
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gemini_html_manager.config import config
+from gemini_html_manager.drive_emulator import DriveEmulator
+from gemini_html_manager.google_workspace import GoogleWorkspaceManager
+
+
+@pytest.fixture
+def web(monkeypatch, tmp_path):
+    from gemini_html_manager import web_interface
+
+    emulator = DriveEmulator('127.0.0.1', 0, seed=1)
+    monkeypatch.setitem(config.get('google'), 'api_endpoint', emulator.start())
+    monkeypatch.setitem(config.get('google.rate_limit'), 'user_requests_per_second', 1000)
+    monkeypatch.setattr(web_interface, 'workspace_manager', GoogleWorkspaceManager())
+    monkeypatch.setattr(web_interface.job_manager, 'state_directory', str(tmp_path / 'jobs'))
+    yield web_interface, emulator
+    emulator.stop()
+
+
+def wait_for_job(client, job_id, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = client.get(f'/api/jobs/{job_id}').get_json()
+        if job['status'] in ('completed', 'failed', 'cancelled', 'interrupted'):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_drive_routes_return_before_drive_answers(web, tmp_path):
+    web_interface, emulator = web
+    client = web_interface.app.test_client()
+    paths = []
+    for index in range(4):
+        path = tmp_path / f'page-{index}.html'
+        path.write_text(f'<html><head><title>Page {index}</title></head><body><p>{index}</p></body></html>')
+        paths.append(str(path))
+    emulator.latency_ms = 200
+
+    started = time.time()
+    job_ids = []
+    for path in paths:
+        response = client.post('/api/upload_to_drive', json={'file_path': path, 'convert': path.endswith('0.html')})
+        assert response.status_code == 202
+        job_ids.append(response.get_json()['job_id'])
+    assert client.get('/gemini-manager/google_drive').status_code == 200
+    # Every request was answered without waiting on a single Drive call
+    assert time.time() - started < 0.2
+
+    jobs = [wait_for_job(client, job_id) for job_id in job_ids]
+    assert [job['status'] for job in jobs] == ['completed'] * 4
+    assert jobs[0]['result']['file_type'] == 'Google Doc'
+    assert jobs[1]['result']['name'] == 'page-1.html' and jobs[1]['result']['link']
+
+    listing = wait_for_job(client, client.post('/api/list_drive_files').get_json()['job_id'])
+    assert listing['result']['count'] == 4
+    page = client.get('/gemini-manager/google_drive').get_data(as_text=True)
+    assert 'page-3.html' in page
+
+    assert client.post('/api/upload_to_drive', json={'file_path': str(tmp_path / 'missing.html')}).status_code == 400
+
+
+def test_partial_conversion_is_reported_as_failed(web, tmp_path, monkeypatch):
+    web_interface, _ = web
+    client = web_interface.app.test_client()
+    exports = tmp_path / 'exports'
+    exports.mkdir()
+    (exports / 'long.html').write_text('<html><body>' + ''.join(f'<p>{i} {"x" * 100}</p>' for i in range(10))
+                                       + '</body></html>')
+    monkeypatch.setattr(web_interface.file_manager, 'export_directory', str(exports))
+    monkeypatch.setitem(config.get('conversion'), 'max_doc_size', 400)
+    manager = web_interface.workspace_manager
+    create_doc = manager._create_doc
+    created = []
+
+    def fail_after_first(*args):
+        if created:
+            raise RuntimeError('connection reset')
+        created.append(create_doc(*args))
+        return created[-1]
+
+    monkeypatch.setattr(manager, '_create_doc', fail_after_first)
+
+    job = wait_for_job(client, client.post('/api/batch_upload_to_drive', json={'convert': True}).get_json()['job_id'])
+    item, = job['items']
+    assert not item['success'] and 'connection reset' in item['error']
+    assert item['partial_file_ids'] == [created[0]['id']]
+    assert job['result']['successful_uploads'] == 0
+
+    job = wait_for_job(client, client.post('/api/upload_to_drive', json={
+        'file_path': str(exports / 'long.html'), 'convert': True}).get_json()['job_id'])
+    assert job['status'] == 'failed' and job['error'] == 'connection reset'
@@ -0,0 +1,173 @@
+"""
+Tests for the in-memory catalog and Server-Sent Events broker
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gemini_html_manager.file_manager import HTMLFileManager
+from gemini_html_manager.catalog import Catalog, CatalogEntry
+from gemini_html_manager.events import EventBroker, CatalogWatcher, format_event
+
+
+def make_catalog(tmp_path):
+    manager = HTMLFileManager()
+    manager.export_directory = str(tmp_path)
+    return Catalog(manager)
+
+
+def test_catalog_refresh_reports_changes(tmp_path):
+    catalog = make_catalog(tmp_path)
+    page = tmp_path / 'page.html'
+    page.write_text('<html><title>One</title></html>', encoding='utf-8')
+    
+    changes = catalog.refresh()
+    assert [m['filename'] for m in changes['added']] == ['page.html']
+    assert catalog.generation == 1
+    
+    # Nothing changed - nothing is re-parsed and the generation stays put
+    assert not any(catalog.refresh().values())
+    assert catalog.generation == 1
+    
+    page.write_text('<html><title>Two, longer</title></html>', encoding='utf-8')
+    changes = catalog.refresh()
+    assert [m['title'] for m in changes['changed']] == ['Two, longer']
+    
+    page.unlink()
+    changes = catalog.refresh()
+    assert [m['filename'] for m in changes['removed']] == ['page.html']
+    assert catalog.stats()['total_files'] == 0
+
+
+def test_overlapping_refreshes_apply_each_change_once(tmp_path, monkeypatch):
+    catalog = make_catalog(tmp_path)
+    parsed = []
+    from_record = CatalogEntry.from_record
+    
+    def slow_from_record(record):
+        # Parsing takes a while, so refreshes overlap
+        parsed.append(record.filename)
+        time.sleep(0.01)
+        return from_record(record)
+    
+    monkeypatch.setattr(CatalogEntry, 'from_record', staticmethod(slow_from_record))
+    page = tmp_path / 'page.html'
+    page.write_text('<html><title>Version 0</title></html>', encoding='utf-8')
+    
+    results = []
+    
+    def refresh_many(count):
+        for _ in range(count):
+            results.append(catalog.refresh())
+    
+    # A new file is parsed and announced once, however many refreshes see it
+    threads = [threading.Thread(target=refresh_many, args=(1,)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert parsed == ['page.html'] and catalog.generation == 1
+    assert [changes for changes in results if any(changes.values())] == [
+        {'added': catalog.entries(), 'changed': [], 'removed': []}]
+    
+    del parsed[:], results[:]
+    threads = [threading.Thread(target=refresh_many, args=(20,)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for version in range(1, 6):
+        page.write_text(f'<html><title>Version {version}</title>' + ' ' * version + '</html>', encoding='utf-8')
+        (tmp_path / f'new-{version}.html').write_text('<html></html>', encoding='utf-8')
+    for thread in threads:
+        thread.join()
+    results.append(catalog.refresh())
+    
+    # Every file is added once and never reported removed while it exists
+    added = [entry['filename'] for changes in results for entry in changes['added']]
+    assert sorted(added) == ['new-1.html', 'new-2.html', 'new-3.html', 'new-4.html', 'new-5.html']
+    assert not any(changes['removed'] for changes in results)
+    assert catalog.generation == 1 + sum(1 for changes in results if any(changes.values()))
+    assert len(parsed) == len(added) + sum(len(changes['changed']) for changes in results)
+    titles = {entry['filename']: entry['title'] for entry in catalog.entries()}
+    assert titles['page.html'] == 'Version 5' and len(titles) == 6
+
+
+def test_catalog_entry_round_trips_metadata(tmp_path):
+    catalog = make_catalog(tmp_path)
+    page = tmp_path / 'page.html'
+    page.write_text('<html><title>Gemini chart</title><img src="a.png"></html>', encoding='utf-8')
+    
+    record = next(catalog.file_manager.iter_html_files())
+    expected = record.to_dict()
+    entry = CatalogEntry.from_record(record)
+    metadata = entry.to_dict()
+    
+    # Times are kept at whole-second precision
+    assert metadata['created_time'] == expected['created_time'][:19]
+    for field in ('created_time', 'modified_time'):
+        expected.pop(field), metadata.pop(field)
+    assert metadata == expected
+    assert entry.signature == (record.modified_ns, record.size_bytes)
+    assert entry.to_dict(['filename', 'has_images']) == {'filename': 'page.html', 'has_images': True}
+
+
+def test_watcher_publishes_file_and_stats_events(tmp_path):
+    catalog = make_catalog(tmp_path)
+    broker = EventBroker(max_subscribers=1)
+    CatalogWatcher(catalog, broker)
+    subscriber = broker.subscribe()
+    
+    assert broker.subscribe() is None  # connection limit reached
+    
+    (tmp_path / 'new.html').write_text('<html><title>New</title></html>', encoding='utf-8')
+    catalog.refresh()
+    
+    events = [subscriber.get_nowait() for _ in range(subscriber.qsize())]
+    assert [event_type for event_type, _ in events] == ['file_added', 'stats']
+    assert events[0][1]['title'] == 'New'
+    assert events[1][1]['total_files'] == 1
+
+
+def test_watcher_publishes_each_change_once_in_order(tmp_path):
+    catalog = make_catalog(tmp_path)
+    broker = EventBroker(max_subscribers=1)
+    CatalogWatcher(catalog, broker)
+    subscriber = broker.subscribe()
+    
+    def refresh_many():
+        for _ in range(30):
+            catalog.refresh()
+    
+    threads = [threading.Thread(target=refresh_many) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for index in range(10):
+        page = tmp_path / f'page-{index % 3}.html'
+        if page.exists() and index % 2:
+            page.unlink()
+        else:
+            page.write_text(f'<html><title>{index}</title>' + ' ' * index + '</html>', encoding='utf-8')
+        time.sleep(0.005)
+    for thread in threads:
+        thread.join()
+    catalog.refresh()
+    
+    events = [subscriber.get_nowait() for _ in range(subscriber.qsize())]
+    present = set()
+    for event_type, data in events:
+        if event_type == 'file_added':
+            assert data['filename'] not in present
+            present.add(data['filename'])
+        elif event_type in ('file_changed', 'file_removed'):
+            assert data['filename'] in present
+            if event_type == 'file_removed':
+                present.remove(data['filename'])
+    assert present == {path.name for path in tmp_path.glob('*.html')}
+    generations = [data['generation'] for event_type, data in events if event_type == 'stats']
+    assert generations == list(range(1, catalog.generation + 1))
+
+
+def test_format_event():
+    assert format_event('stats', {'total_files': 2}) == 'event: stats\ndata: {"total_files": 2}\n\n'
@@ -0,0 +1,190 @@
+"""
+Tests for the local HTML file manager
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SAMPLE_HTML = """<html><head><title>{title}</title>
+<meta name="description" content="Sample export"></head>
+<body><p>Gemini canvas chart</p><img src="chart.png"><a href="#">link</a></body></html>"""
+
+
+def write_export(directory, filename, title='Sample'):
+    path = os.path.join(str(directory), filename)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(SAMPLE_HTML.format(title=title))
+    return path
+
+
+def test_iter_html_files_is_lazy(tmp_path, monkeypatch, make_manager):
+    """Records expose filename and size without opening any file"""
+    manager = make_manager(tmp_path)
+    write_export(tmp_path, 'a.html')
+    write_export(tmp_path, 'b.htm')
+    (tmp_path / 'notes.txt').write_text('not html')
+    
+    def fail(*args, **kwargs):
+        raise AssertionError('file should not be parsed')
+    
+    monkeypatch.setattr(manager, 'extract_html_metadata', fail)
+    monkeypatch.setattr(manager, 'extract_html_content', fail)
+    monkeypatch.setattr(manager, 'calculate_checksum', fail)
+    
+    records = sorted(manager.iter_html_files(), key=lambda r: r.filename)
+    assert [r.filename for r in records] == ['a.html', 'b.htm']
+    assert all(r.size_bytes > 0 for r in records)
+
+
+def test_record_matches_file_metadata(tmp_path, make_manager):
+    """A record's dict form matches get_file_metadata()"""
+    manager = make_manager(tmp_path)
+    path = write_export(tmp_path, 'chart.html', title='Chart')
+    
+    record = next(manager.iter_html_files())
+    metadata = manager.get_file_metadata(path)
+    
+    assert record.to_dict() == metadata
+    assert metadata['title'] == 'Chart'
+    assert metadata['has_images'] and metadata['has_links']
+    assert metadata['is_gemini_canvas']
+
+
+def test_projected_metadata_skips_parsing(tmp_path, monkeypatch, make_manager):
+    """Only the requested fields are computed"""
+    manager = make_manager(tmp_path)
+    path = write_export(tmp_path, 'chart.html')
+    
+    def fail(*args, **kwargs):
+        raise AssertionError('file should not be parsed')
+    
+    monkeypatch.setattr(manager, 'extract_html_content', fail)
+    monkeypatch.setattr(manager, 'calculate_checksum', fail)
+    
+    metadata = manager.get_file_metadata(path, ['filename', 'size_bytes'])
+    assert metadata == {'filename': 'chart.html', 'size_bytes': os.path.getsize(path)}
+
+
+def test_cleanup_duplicates_uses_checksums(tmp_path, make_manager):
+    manager = make_manager(tmp_path)
+    write_export(tmp_path, 'one.html')
+    write_export(tmp_path, 'two.html')
+    write_export(tmp_path, 'other.html', title='Other')
+    
+    removed = manager.cleanup_duplicates()
+    
+    assert len(removed) == 1
+    assert len(manager.list_html_files()) == 2
+
+
+def test_compressed_storage_round_trip(tmp_path, monkeypatch, make_manager):
+    """Compressed exports are listed, parsed and searched like plain ones"""
+    from gemini_html_manager.config import config
+    
+    source_dir = tmp_path / 'source'
+    source_dir.mkdir()
+    export_dir = tmp_path / 'exports'
+    export_dir.mkdir()
+    source = write_export(source_dir, 'report.html', title='Quarterly Report')
+    
+    monkeypatch.setattr(config, 'get', lambda key, default=None: (
+        'gzip' if key == 'html_manager.storage_compression' else default))
+    manager = make_manager(export_dir)
+    
+    stored_path = manager.import_html_file(source)
+    assert stored_path.endswith('report.html.gz')
+    assert manager.resolve_path('report.html') == stored_path
+    
+    files = manager.list_html_files()
+    assert [f['filename'] for f in files] == ['report.html']
+    assert files[0]['title'] == 'Quarterly Report'
+    assert files[0]['checksum'] == manager.calculate_checksum(source)
+    assert manager.search_files('canvas chart')
+    
+    converted = manager.convert_storage(None)
+    assert [r['filename'] for r in converted] == ['report.html']
+    assert manager.resolve_path('report.html') == str(export_dir / 'report.html')
+
+
+def test_optimize_on_import_keeps_original(tmp_path, monkeypatch, make_manager):
+    from gemini_html_manager.config import config
+    
+    source_dir = tmp_path / 'source'
+    source_dir.mkdir()
+    export_dir = tmp_path / 'exports'
+    export_dir.mkdir()
+    source = source_dir / 'slides.html'
+    source.write_text(
+        "<html>\n    <head>\n        <title>Slides</title>\n"
+        "        <style>  body { color : red; }  </style>\n"
+        "        <style>body{color:red;}</style>\n"
+        "    </head>\n    <!-- generated -->\n    <body>\n        <p>Hello</p>\n    </body>\n</html>\n",
+        encoding='utf-8'
+    )
+    
+    monkeypatch.setattr(config, 'get', lambda key, default=None: (
+        True if key == 'html_manager.optimize_on_import' else default))
+    manager = make_manager(export_dir)
+    
+    stored_path = manager.import_html_file(str(source))
+    
+    slimmed = open(stored_path, encoding='utf-8').read()
+    assert 'generated' not in slimmed
+    assert slimmed.count('<style>') == 1
+    assert (export_dir / '.originals' / 'slides.html').read_text(encoding='utf-8') == source.read_text(encoding='utf-8')
+    
+    metadata = manager.get_file_metadata(stored_path)
+    assert metadata['title'] == 'Slides'
+    assert metadata['bytes_saved'] == source.stat().st_size - os.path.getsize(stored_path)
+    assert [f['filename'] for f in manager.list_html_files()] == ['slides.html']
+
+
+def test_sharded_layout_and_migration(tmp_path, make_manager):
+    """Files are found in either layout and can be migrated between them"""
+    source_dir = tmp_path / 'source'
+    source_dir.mkdir()
+    export_dir = tmp_path / 'exports'
+    export_dir.mkdir()
+    manager = make_manager(export_dir)
+    write_export(export_dir, 'flat.html', title='Flat')
+    
+    manager.layout = 'sharded'
+    stored_path = manager.import_html_file(write_export(source_dir, 'new.html', title='New'))
+    assert os.path.dirname(stored_path) == manager.file_directory('new.html')
+    assert os.path.dirname(stored_path) != str(export_dir)
+    
+    # Mixed layouts list completely and resolve by filename
+    assert sorted(r.filename for r in manager.iter_html_files()) == ['flat.html', 'new.html']
+    assert manager.resolve_path('flat.html') == str(export_dir / 'flat.html')
+    assert manager.resolve_path('new.html') == stored_path
+    
+    moved = manager.migrate_layout('sharded')
+    assert [m['filename'] for m in moved] == ['flat.html']
+    assert manager.resolve_path('flat.html') == os.path.join(manager.file_directory('flat.html'), 'flat.html')
+    
+    manager.migrate_layout('flat')
+    assert sorted(os.listdir(export_dir)) == ['flat.html', 'new.html']
+
+
+def test_slim_html_keeps_distinct_sheets_and_template_literals():
+    from gemini_html_manager.optimizer import slim_html
+
+    page = ('<style>p{color:red}</style><style media="print">p{color:red}</style><style>p { color: red }</style>'
+            '<script>\n  const text = `a\n    b`;\n</script>')
+    slimmed, stats = slim_html(page)
+
+    assert '<style media="print">p{color:red}</style>' in slimmed
+    assert slimmed.count('<style>') == 1 and stats['duplicate_styles'] == 1
+    assert '`a\n    b`' in slimmed
+
+
+def test_minify_css_keeps_strings_and_urls():
+    from gemini_html_manager.optimizer import minify_css
+
+    css = ('/* "not a string */ q::before { content: "a ; b" ; }\n'
+           "a:after { content : 'x, y: z' }  .icon { background: url(img/a b.png) no-repeat , "
+           'url( "c  d.png" ) }  p { font-family: "Open  Sans", serif }')
+    assert minify_css(css) == ('q::before{content:"a ; b"}'
+                               "a:after{content:'x, y: z'}.icon{background:url(img/a b.png) no-repeat,"
+                               'url( "c  d.png" )}p{font-family:"Open  Sans",serif}')
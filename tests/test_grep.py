@@ -0,0 +1,116 @@
+"""
+Tests for byte-level grep over stored exports
+"""
+import io
+import json
+import os
+import re
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gemini_html_manager import storage
+from gemini_html_manager.config import config
+from gemini_html_manager.grep import Grep, compile_pattern
+
+PAGE = ('<html>\n<head><script src="https://cdn.plot.ly/plotly-2.js"></script></head>\n'
+        '<body>\n<div class="Chart-Container">one</div>\n<div class="chart-container">two</div>\n'
+        '<p>Über</p>\n</body></html>\n')
+
+
+@pytest.fixture
+def manager(tmp_path, make_manager):
+    """A manager over a plain, a compressed and an empty export"""
+    manager = make_manager(tmp_path)
+    (tmp_path / 'plain.html').write_text(PAGE, encoding='utf-8')
+    storage.write_compressed(io.BytesIO(PAGE.encode('utf-8')), storage.storage_path(str(tmp_path), 'packed.html', 'gzip'), 'gzip')
+    (tmp_path / 'empty.html').write_bytes(b'')
+    return manager
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_matches_report_line_and_byte_offsets(manager, workers):
+    searcher = Grep('chart-container', ignore_case=True, workers=workers)
+    matches = sorted(searcher.search(manager.iter_html_files()), key=lambda m: (m['filename'], m['offset']))
+
+    assert [(m['filename'], m['line']) for m in matches] == [('packed.html', 4), ('packed.html', 5),
+                                                               ('plain.html', 4), ('plain.html', 5)]
+    data = PAGE.encode('utf-8')
+    for match in matches:
+        assert data[match['offset']:match['offset'] + match['length']].decode() == match['match']
+    assert matches[0]['match'] == 'Chart-Container'
+    assert matches[1]['text'] == '<div class="chart-container">two</div>'
+    assert searcher.stats['files_searched'] == 3
+    assert searcher.stats['files_matched'] == 2
+    assert searcher.stats['bytes_searched'] == 2 * len(data)
+
+
+def test_regex_case_and_limits(manager):
+    case_sensitive = list(Grep('chart-container', workers=1).search(manager.iter_html_files()))
+    assert {m['line'] for m in case_sensitive} == {5}
+
+    urls = list(Grep(r'https://[a-z.]+/\w+', regex=True, workers=1).search(manager.iter_html_files()))
+    assert {m['match'] for m in urls} == {'https://cdn.plot.ly/plotly'}
+
+    # Non-ASCII patterns match their UTF-8 bytes
+    assert len(list(Grep('Über', workers=1).search(manager.iter_html_files()))) == 2
+
+    searcher = Grep('div', max_matches=1, context_bytes=3, workers=1)
+    limited = list(searcher.search(manager.iter_html_files()))
+    assert len(limited) == 2
+    assert limited[0]['text'] == '<div cl'
+    assert sorted(searcher.stats['truncated_files']) == ['packed.html', 'plain.html']
+
+    with pytest.raises(ValueError):
+        compile_pattern('(unclosed', regex=True)
+    with pytest.raises(ValueError):
+        compile_pattern('')
+
+
+def test_grep_api_streams_ndjson(manager, monkeypatch):
+    from gemini_html_manager import web_interface
+
+    monkeypatch.setattr(web_interface.file_manager, 'export_directory', manager.export_directory)
+    client = web_interface.app.test_client()
+
+    response = client.get('/api/grep?q=chart-container&ignore_case=1&files=plain*')
+    assert response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [line['line'] for line in lines[:-1]] == [4, 5]
+    assert lines[-1]['summary']['matches'] == 2
+    assert lines[-1]['summary']['files_searched'] == 1
+
+    # Regular expressions need the admin token or grep.api_regex
+    assert client.get('/api/grep?q=(x&regex=1').status_code == 403
+    monkeypatch.setattr(web_interface.profiler, 'admin_token', 'secret')
+    assert client.get('/api/grep?q=(x&regex=1', headers={'X-Admin-Token': 'secret'}).status_code == 400
+    monkeypatch.setitem(config.get('grep'), 'api_regex', True)
+    response = client.get('/api/grep?q=plotly-\\d&regex=1&files=plain*')
+    assert json.loads(response.get_data(as_text=True).splitlines()[0])['match'] == 'plotly-2'
+
+
+def test_grep_api_limits_concurrent_searches(manager, monkeypatch):
+    from gemini_html_manager import web_interface
+
+    monkeypatch.setattr(web_interface.file_manager, 'export_directory', manager.export_directory)
+    monkeypatch.setattr(web_interface, 'grep_slots', threading.BoundedSemaphore(1))
+    client = web_interface.app.test_client()
+
+    streaming = client.get('/api/grep?q=div', buffered=False)
+    assert streaming.status_code == 200
+    assert client.get('/api/grep?q=div').status_code == 429
+    streaming.close()
+    assert client.get('/api/grep?q=div').status_code == 200
+    assert client.get('/api/grep?q=div').status_code == 200
+
+
+def test_case_insensitive_literal_spans_cross_windows(monkeypatch):
+    from gemini_html_manager import grep
+
+    monkeypatch.setattr(grep, 'LOWER_WINDOW', 4)
+    data = b'xxABab-abAB-aBaB'
+    expected = [(m.start(), m.end()) for m in re.finditer(b'(?i)abab', data)]
+    assert list(grep._literal_spans(data, b'ABAB', True)) == expected == [(2, 6), (7, 11), (12, 16)]
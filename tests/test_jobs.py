@@ -0,0 +1,145 @@
+"""
+Tests for the background job manager
+"""
+import os
+import sys
+import json
+import time
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gemini_html_manager.jobs import JobManager, Job, COMPLETED, CANCELLED, INTERRUPTED, RUNNING
+
+
+def wait_until_finished(manager, job_id, timeout=5):
+    job = manager.get(job_id)
+    for _ in range(int(timeout / 0.01)):
+        if job.finished:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_job_reports_progress_and_result(tmp_path):
+    manager = JobManager(state_directory=str(tmp_path), max_workers=1)
+    
+    def handler(job):
+        job.set_total(3)
+        for name in ('a.html', 'b.html', 'c.html'):
+            job.add_item({'filename': name, 'success': True})
+        return {'count': 3}
+    
+    manager.register('upload', handler)
+    job = wait_until_finished(manager, manager.submit('upload', {'convert': False}).id)
+    
+    assert job.status == COMPLETED
+    assert job.result == {'count': 3}
+    assert job.to_dict()['progress'] == {'total': 3, 'completed': 3}
+    
+    with open(os.path.join(str(tmp_path), f"{job.id}.json"), encoding='utf-8') as f:
+        assert json.load(f)['status'] == COMPLETED
+
+
+def test_cancel_stops_running_job(tmp_path):
+    manager = JobManager(state_directory=str(tmp_path), max_workers=1)
+    started = threading.Event()
+    release = threading.Event()
+    
+    def handler(job):
+        job.set_total(10)
+        for i in range(10):
+            if job.cancel_requested:
+                break
+            started.set()
+            release.wait(5)
+            job.add_item({'filename': f'{i}.html', 'success': True})
+    
+    manager.register('upload', handler)
+    job = manager.submit('upload')
+    started.wait(5)
+    assert manager.cancel(job.id)
+    release.set()
+    
+    job = wait_until_finished(manager, job.id)
+    assert job.status == CANCELLED
+    assert len(job.items) < 10
+
+
+def test_running_jobs_are_interrupted_after_restart(tmp_path):
+    job = Job('upload')
+    job.status = RUNNING
+    with open(os.path.join(str(tmp_path), f"{job.id}.json"), 'w', encoding='utf-8') as f:
+        json.dump(job.to_dict(), f)
+    
+    manager = JobManager(state_directory=str(tmp_path), max_workers=1)
+    
+    assert manager.get(job.id).status == INTERRUPTED
+
+
+def test_named_pool_runs_alongside_default_pool(tmp_path):
+    manager = JobManager(state_directory=str(tmp_path), max_workers=1)
+    release = threading.Event()
+    
+    def slow(job):
+        release.wait(5)
+        return {'done': True}
+    
+    manager.register('drive_call', slow, pool='drive')
+    manager.register('local', lambda job: {'done': True})
+    slow_jobs = [manager.submit('drive_call') for _ in range(3)]
+    
+    # The default pool's single worker is free while the Drive jobs wait
+    assert wait_until_finished(manager, manager.submit('local').id).status == COMPLETED
+    for _ in range(500):
+        if all(job.status == RUNNING for job in slow_jobs):
+            break
+        time.sleep(0.01)
+    assert all(job.status == RUNNING for job in slow_jobs)
+    
+    release.set()
+    for job in slow_jobs:
+        assert wait_until_finished(manager, job.id).status == COMPLETED
+    assert manager.latest('drive_call').type == 'drive_call'
+    assert manager.latest('missing') is None
+
+
+def test_items_are_saved_in_batches(tmp_path, monkeypatch):
+    manager = JobManager(state_directory=str(tmp_path), max_workers=1)
+    saves = []
+    save_job = manager.save_job
+    monkeypatch.setattr(manager, 'save_job', lambda job: (saves.append(len(job.items)), save_job(job)))
+
+    def handler(job):
+        job.set_total(1000)
+        for i in range(1000):
+            job.add_item({'filename': f'{i}.html', 'success': True})
+
+    manager.register('upload', handler)
+    job = wait_until_finished(manager, manager.submit('upload').id)
+
+    # queued, running, total, ten batches of items and the final state
+    assert len(saves) <= 15
+    with open(os.path.join(str(tmp_path), f"{job.id}.json"), encoding='utf-8') as f:
+        assert len(json.load(f)['items']) == 1000
+
+
+def test_listing_jobs_are_shared_and_kept_apart_from_history(tmp_path):
+    manager = JobManager(state_directory=str(tmp_path), max_workers=1)
+    manager.max_history = 2
+    release = threading.Event()
+    manager.register('upload', lambda job: 'uploaded')
+    manager.register('list', lambda job: release.wait(5) and 'listed', keep=1)
+
+    uploads = [wait_until_finished(manager, manager.submit('upload').id) for _ in range(2)]
+    listing = manager.submit('list', reuse_active=True)
+    assert manager.submit('list', reuse_active=True) is listing
+    release.set()
+    wait_until_finished(manager, listing.id)
+    for _ in range(5):
+        wait_until_finished(manager, manager.submit('list', reuse_active=True).id)
+
+    kept = manager.list_jobs()
+    assert all(manager.get(job.id) for job in uploads)
+    assert len([job for job in kept if job.type == 'list' and job.finished]) == 1
+    assert len(os.listdir(str(tmp_path))) == len(kept)
@@ -0,0 +1,56 @@
+"""
+Tests for the HTTP load generator
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gemini_html_manager.load_test import LoadTest, LocalServer, parse_route, percentile, seed_corpus
+
+
+def test_seeded_corpus_is_reproducible(tmp_path):
+    first = seed_corpus(str(tmp_path / 'a'), 5, size_kb=2, seed=3)
+    second = seed_corpus(str(tmp_path / 'b'), 5, size_kb=2, seed=3)
+
+    assert first == second
+    for name in first:
+        a, b = tmp_path / 'a' / name, tmp_path / 'b' / name
+        assert a.read_bytes() == b.read_bytes()
+        assert a.stat().st_mtime == b.stat().st_mtime
+    assert (tmp_path / 'a' / first[0]).read_bytes() != (tmp_path / 'a' / first[1]).read_bytes()
+
+
+def test_route_specs_and_percentiles():
+    assert parse_route('3:/api/search?q={word}') == (3.0, '/api/search?q={word}')
+    for spec in ('/no-weight', 'x:/', '0:/', '2:relative'):
+        with pytest.raises(ValueError):
+            parse_route(spec)
+
+    values = [i / 100 for i in range(1, 101)]
+    assert percentile(values, 0.50) == 0.50
+    assert percentile(values, 0.99) == 0.99
+    assert percentile([0.2], 0.95) == 0.2
+    assert percentile([], 0.5) == 0.0
+
+
+def test_load_test_against_local_server(tmp_path):
+    filenames = seed_corpus(str(tmp_path / 'exports'), 10, size_kb=2)
+    routes = [(2, '/gemini-manager/file/{file}'), (1, '/api/search?q={word}'), (1, '/api/versions/missing.html')]
+
+    with LocalServer(str(tmp_path / 'exports'), state_directory=str(tmp_path / 'jobs')) as url:
+        tester = LoadTest(url, routes, seed=1)
+        result = tester.run_level(2, duration=0.5, warmup=0.2)
+
+    # Filenames were discovered from the server's listing
+    assert sorted(tester.filenames) == filenames
+    assert result['requests'] > 0
+    assert set(result['routes']) == {path for _, path in routes}
+    missing = result['routes']['/api/versions/missing.html']
+    assert missing['errors'] == missing['requests'] > 0
+    assert result['errors'] == missing['requests']
+    assert result['routes']['/gemini-manager/file/{file}']['errors'] == 0
+    assert result['statuses']['404'] == missing['requests']
+    assert 0 < result['p50_ms'] <= result['p95_ms'] <= result['p99_ms'] <= result['max_ms']
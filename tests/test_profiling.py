@@ -0,0 +1,111 @@
+"""
+Tests for per-request profiling and slow-request capture
+"""
+import os
+import pstats
+import sys
+import time
+
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gemini_html_manager.config import config
+from gemini_html_manager.profiling import RequestProfiler
+
+TOKEN = 'secret-token'
+
+
+def crunch_numbers():
+    return sum(i * i for i in range(20000))
+
+
+def wait_for_disk():
+    time.sleep(0.08)
+
+
+def make_app(monkeypatch, **settings):
+    for key, value in dict({'admin_token': TOKEN, 'slow_request_ms': 0, 'max_profiles': 20,
+                            'profile_paths': []}, **settings).items():
+        monkeypatch.setitem(config._config.setdefault('profiling', {}), key, value)
+    app = Flask(__name__)
+    profiler = RequestProfiler(app)
+
+    @app.route('/fast')
+    def fast():
+        return str(crunch_numbers())
+
+    @app.route('/slow')
+    def slow():
+        wait_for_disk()
+        return 'done'
+
+    return app.test_client(), profiler
+
+
+def test_header_with_admin_token_profiles_one_request(monkeypatch, tmp_path):
+    client, profiler = make_app(monkeypatch)
+
+    assert 'X-Profile-Id' not in client.get('/fast').headers
+    assert 'X-Profile-Id' not in client.get('/fast', headers={'X-Profile': '1', 'X-Admin-Token': 'wrong'}).headers
+
+    response = client.get('/fast?n=1', headers={'X-Profile': '1', 'X-Admin-Token': TOKEN})
+    record = profiler.get(response.headers['X-Profile-Id'])
+    assert record['kind'] == 'cprofile' and record['trigger'] == 'header'
+    assert record['path'] == '/fast?n=1' and record['status'] == 200
+    assert 'crunch_numbers' in profiler.report(record)
+
+    body, mimetype, name = profiler.download(record)
+    path = tmp_path / name
+    path.write_bytes(body)
+    functions = {function for _, _, function in pstats.Stats(str(path)).stats}
+    assert 'crunch_numbers' in functions
+    assert [entry['id'] for entry in profiler.list_profiles()] == [record['id']]
+
+
+def test_configured_paths_are_always_profiled(monkeypatch):
+    client, profiler = make_app(monkeypatch, profile_paths=['/fast'])
+    client.get('/fast')
+    client.get('/slow')
+    assert [(entry['path'], entry['trigger']) for entry in profiler.list_profiles()] == [('/fast', 'config')]
+
+
+def test_slow_requests_are_sampled_into_ring_buffer(monkeypatch):
+    client, profiler = make_app(monkeypatch, slow_request_ms=40, max_profiles=2)
+
+    assert 'X-Profile-Id' not in client.get('/fast').headers
+    ids = [client.get('/slow').headers['X-Profile-Id'] for _ in range(3)]
+
+    # Only the last two captures are kept
+    assert [entry['id'] for entry in profiler.list_profiles()] == ids[:0:-1]
+    record = profiler.get(ids[-1])
+    assert record['kind'] == 'sampling' and record['duration_ms'] >= 40
+    assert record['samples'] > 0
+    assert 'wait_for_disk' in profiler.report(record)
+    body, mimetype, name = profiler.download(record)
+    assert name.endswith('.folded')
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in body.decode().splitlines())
+
+
+def test_admin_endpoints_need_the_token(monkeypatch):
+    from gemini_html_manager import web_interface
+
+    client = web_interface.app.test_client()
+    monkeypatch.setattr(web_interface.profiler, 'admin_token', '')
+    assert client.get('/api/admin/profiles').status_code == 404
+
+    monkeypatch.setattr(web_interface.profiler, 'admin_token', TOKEN)
+    assert client.get('/api/admin/profiles').status_code == 403
+    profiled = client.get('/api/search?q=x', headers={'X-Profile': '1', 'X-Admin-Token': TOKEN})
+    profile_id = profiled.headers['X-Profile-Id']
+
+    admin = {'X-Admin-Token': TOKEN}
+    listing = client.get('/api/admin/profiles', headers=admin).get_json()
+    assert profile_id in [entry['id'] for entry in listing['profiles']]
+    detail = client.get(f'/api/admin/profiles/{profile_id}', headers=admin).get_json()
+    assert detail['endpoint'] == 'api_search' and 'cumulative' in detail['report']
+    text = client.get(f'/api/admin/profiles/{profile_id}?format=text', headers=admin)
+    assert text.mimetype == 'text/plain'
+    download = client.get(f'/api/admin/profiles/{profile_id}/download', headers=admin)
+    assert download.headers['Content-Disposition'].endswith('.prof"')
+    assert client.get('/api/admin/profiles/unknown', headers=admin).status_code == 404
@@ -0,0 +1,125 @@
+"""
+Tests for the token-bucket rate limiter with AIMD backoff
+"""
+import json
+import os
+import random
+import sys
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gemini_html_manager.config import config
+from gemini_html_manager.drive_emulator import DriveEmulator
+from gemini_html_manager.google_workspace import GoogleWorkspaceManager
+from gemini_html_manager.rate_limiter import AdaptiveRateLimiter, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class FailingRequest:
+    """Request that raises the given errors before succeeding"""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def execute(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return {'id': 'ok'}
+
+
+def http_error(status, reason):
+    content = json.dumps({'error': {'code': status, 'message': reason, 'errors': [{'reason': reason}]}})
+    return HttpError(httplib2.Response({'status': status}), content.encode('utf-8'))
+
+
+def make_limiter(rate=10.0, **settings):
+    clock = FakeClock()
+    limiter = AdaptiveRateLimiter(TokenBucket(rate, 1, clock, clock.sleep), TokenBucket(100.0, 1, clock, clock.sleep),
+                                  dict({'initial_backoff': 1.0, 'max_retries': 3}, **settings),
+                                  sleep=clock.sleep, rng=random.Random(1))
+    return limiter, clock
+
+
+def test_token_bucket_paces_requests():
+    clock = FakeClock()
+    bucket = TokenBucket(2.0, 1, clock, clock.sleep)
+    waits = [bucket.acquire() for _ in range(3)]
+    assert waits == [0.0, 0.5, 0.5]
+    assert clock.now == 1.0
+
+
+def test_aimd_halves_on_rate_limit_and_recovers():
+    limiter, _ = make_limiter(rate=8.0, additive_increase=2.0)
+    request = FailingRequest(http_error(403, 'userRateLimitExceeded'), http_error(429, 'rateLimitExceeded'))
+
+    assert limiter.execute(request) == {'id': 'ok'}
+    assert request.calls == 3
+    # userRateLimitExceeded halves the user bucket, a plain 429 both buckets
+    assert limiter.user_bucket.rate == pytest.approx(8.0 / 4 + 2.0 / 2.0)
+    assert limiter.project_bucket.rate == pytest.approx(50.0 + 2.0 / 50.0)
+
+    for _ in range(20):
+        limiter.execute(FailingRequest())
+    assert limiter.user_bucket.rate == 8.0
+    assert limiter.stats()['rate_limited'] == 2
+
+
+def test_non_retryable_errors_and_exhausted_retries_raise():
+    limiter, _ = make_limiter()
+
+    forbidden = FailingRequest(http_error(403, 'insufficientFilePermissions'))
+    with pytest.raises(HttpError):
+        limiter.execute(forbidden)
+    assert forbidden.calls == 1
+
+    failing = FailingRequest(*[http_error(503, 'backendError')] * 10)
+    with pytest.raises(HttpError):
+        limiter.execute(failing)
+    assert failing.calls == 4
+    assert limiter.stats()['failures'] == 2
+
+
+def test_backoff_is_jittered_and_capped():
+    limiter, _ = make_limiter(max_backoff=4.0)
+    delays = [limiter.backoff(attempt) for attempt in range(1, 10)]
+    assert all(0 <= delay <= min(4.0, 2 ** (attempt - 1)) for attempt, delay in enumerate(delays, 1))
+    assert len(set(delays)) == len(delays)
+
+
+def test_no_files_dropped_under_rate_limiting(monkeypatch, tmp_path):
+    monkeypatch.setitem(config.get('google.rate_limit'), 'initial_backoff', 0.001)
+    monkeypatch.setitem(config.get('google.rate_limit'), 'max_backoff', 0.01)
+    # Random 429s would otherwise slow the client right down; pacing is not under test here
+    monkeypatch.setitem(config.get('google.rate_limit'), 'user_requests_per_second', 1000)
+    monkeypatch.setitem(config.get('google.rate_limit'), 'min_requests_per_second', 1000)
+    emulator = DriveEmulator('127.0.0.1', 0, seed=3, rate_limit_rate=0.3, error_rate=0.1)
+    monkeypatch.setitem(config.get('google'), 'api_endpoint', emulator.start())
+
+    try:
+        for index in range(10):
+            (tmp_path / f'page-{index}.html').write_text(f'<html><body><p>Page {index}</p></body></html>')
+        manager = GoogleWorkspaceManager()
+        uploaded = manager.batch_upload_html_files(str(tmp_path))
+        stats = emulator.stats()
+    finally:
+        emulator.stop()
+
+    assert len(uploaded) == 10
+    assert stats['rate_limited'] > 0 and stats['injected_errors'] > 0
+    assert manager.rate_limiter.stats()['failures'] == 0
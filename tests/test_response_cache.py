@@ -0,0 +1,81 @@
+"""
+Tests for the rendered-response cache
+"""
+import os
+import sys
+
+from flask import Flask, flash, jsonify, request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gemini_html_manager.file_manager import HTMLFileManager
+from gemini_html_manager.catalog import Catalog
+from gemini_html_manager.response_cache import ResponseCache
+
+
+def make_app(tmp_path, max_bytes=1024 * 1024):
+    manager = HTMLFileManager()
+    manager.export_directory = str(tmp_path)
+    catalog = Catalog(manager)
+    cache = ResponseCache(catalog, max_bytes=max_bytes, enabled=True)
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    renders = []
+
+    @app.route('/files')
+    @cache.cached
+    def files():
+        renders.append(request.args.get('q'))
+        if request.args.get('q') == 'bad':
+            flash('Invalid search')
+        return jsonify([entry['filename'] for entry in catalog.entries()])
+
+    return app.test_client(), cache, renders
+
+
+def test_repeat_requests_are_served_from_cache(tmp_path):
+    client, cache, renders = make_app(tmp_path)
+    (tmp_path / 'a.html').write_text('<html><title>A</title></html>', encoding='utf-8')
+
+    first = client.get('/files?q=x')
+    second = client.get('/files?q=x')
+    assert first.headers['X-Cache'] == 'MISS'
+    assert second.headers['X-Cache'] == 'HIT'
+    assert second.get_json() == ['a.html']
+    assert renders == ['x']
+
+    client.get('/files?q=y')
+    assert renders == ['x', 'y']
+    assert cache.stats()['hit_ratio'] == 1 / 3
+
+
+def test_catalog_change_invalidates(tmp_path):
+    client, cache, renders = make_app(tmp_path)
+    (tmp_path / 'a.html').write_text('<html><title>A</title></html>', encoding='utf-8')
+    client.get('/files')
+
+    (tmp_path / 'b.html').write_text('<html><title>B</title></html>', encoding='utf-8')
+    response = client.get('/files')
+    assert response.headers['X-Cache'] == 'MISS'
+    assert sorted(response.get_json()) == ['a.html', 'b.html']
+    assert cache.stats()['invalidations'] == 1
+    assert cache.stats()['entries'] == 1
+
+
+def test_pages_with_flash_messages_are_not_cached(tmp_path):
+    client, cache, renders = make_app(tmp_path)
+    client.get('/files?q=bad')
+    client.get('/files?q=bad')
+    assert renders == ['bad', 'bad']
+
+
+def test_lru_eviction_respects_memory_cap(tmp_path):
+    client, cache, renders = make_app(tmp_path, max_bytes=10)
+    cache.put('a', b'12345', 200, {})
+    cache.put('b', b'12345', 200, {})
+    assert cache.get('a') is not None
+    cache.put('c', b'12345', 200, {})
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['size_bytes'] == 10
@@ -0,0 +1,96 @@
+"""
+Tests for the structured search query language
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gemini_html_manager.search import SearchIndex, QueryError, parse_query, refine_query, tokenize
+
+ENTRIES = [
+    {'filename': 'sales_chart.html', 'title': 'Q3 Sales Chart', 'description': 'Quarterly numbers',
+     'size_bytes': 3 * 1024 * 1024, 'word_count': 800, 'created_time': '2025-02-10T09:00:00',
+     'modified_time': '2025-02-10T09:00:00', 'has_images': True, 'has_links': False, 'is_gemini_canvas': True},
+    {'filename': 'roadmap.html', 'title': 'Product Roadmap', 'description': 'Plans for next year',
+     'size_bytes': 200 * 1024, 'word_count': 1500, 'created_time': '2025-04-01T12:00:00',
+     'modified_time': '2025-04-02T12:00:00', 'has_images': False, 'has_links': True, 'is_gemini_canvas': False},
+    {'filename': 'notes.htm', 'title': 'Meeting notes', 'description': '',
+     'size_bytes': 10 * 1024, 'word_count': 90, 'created_time': '2024-12-31T23:00:00',
+     'modified_time': '2025-01-01T08:00:00', 'has_images': False, 'has_links': True, 'is_gemini_canvas': True},
+]
+TEXT = [tokenize('revenue grew in the west region'), tokenize('launch timeline'), tokenize('action items')]
+
+
+@pytest.fixture
+def index():
+    return SearchIndex(ENTRIES, TEXT)
+
+
+def filenames(index, query):
+    return [entry['filename'] for entry in index.search(query)]
+
+
+def test_bare_words_match_metadata_and_text(index):
+    assert filenames(index, 'sales') == ['sales_chart.html']
+    assert filenames(index, 'revenue') == ['sales_chart.html']
+    assert filenames(index, 'road') == ['roadmap.html']
+    assert filenames(index, '') == ['sales_chart.html', 'roadmap.html', 'notes.htm']
+
+
+def test_field_qualifiers(index):
+    assert filenames(index, 'title:"sales chart"') == ['sales_chart.html']
+    assert filenames(index, 'filename:.htm') == ['sales_chart.html', 'roadmap.html', 'notes.htm']
+    assert filenames(index, 'name:notes') == ['notes.htm']
+    assert filenames(index, 'text:timeline') == ['roadmap.html']
+    assert filenames(index, 'title:revenue') == []
+
+
+def test_ranges_and_flags(index):
+    assert filenames(index, 'size>2mb') == ['sales_chart.html']
+    assert filenames(index, 'size:100kb..1mb') == ['roadmap.html']
+    assert filenames(index, 'words<100') == ['notes.htm']
+    assert filenames(index, 'created:2025-01..2025-03') == ['sales_chart.html']
+    assert filenames(index, 'created:2024') == ['notes.htm']
+    assert filenames(index, 'modified>=2025-04-02') == ['roadmap.html']
+    assert filenames(index, 'has:images') == ['sales_chart.html']
+    assert filenames(index, 'is:canvas has:links') == ['notes.htm']
+
+
+def test_boolean_operators(index):
+    assert filenames(index, 'is:canvas -has:images') == ['notes.htm']
+    assert filenames(index, 'NOT is:canvas') == ['roadmap.html']
+    assert filenames(index, 'roadmap OR notes') == ['roadmap.html', 'notes.htm']
+    assert filenames(index, '(roadmap OR notes) AND has:links words>1000') == ['roadmap.html']
+
+
+@pytest.mark.parametrize('query', ['size>big', 'has:videos', '(sales', 'title:"open', 'created:2025-13'])
+def test_invalid_queries(query):
+    with pytest.raises(QueryError):
+        parse_query(query)
+
+
+def test_facets_count_the_matching_documents(index):
+    results, facets = index.search_with_facets('is:canvas')
+    assert [entry['filename'] for entry in results] == ['sales_chart.html', 'notes.htm']
+    assert facets['total'] == 2
+    assert facets['flags'] == {'is_gemini_canvas': 2, 'has_images': 1, 'has_links': 1}
+    assert facets['created_date'] == [
+        {'value': '2025-02-10', 'query': 'created:2025-02-10', 'count': 1},
+        {'value': '2024-12-31', 'query': 'created:2024-12-31', 'count': 1},
+    ]
+    assert [(band['value'], band['count']) for band in facets['size']] == [('< 100 KB', 1), ('1 - 10 MB', 1)]
+
+
+def test_facet_queries_narrow_to_their_bucket(index):
+    _, facets = index.search_with_facets('')
+    for bucket in facets['created_date'] + facets['size']:
+        assert len(index.search(bucket['query'])) == bucket['count']
+
+
+def test_refine_query_keeps_or_precedence(index):
+    assert refine_query('', 'is:canvas') == 'is:canvas'
+    assert refine_query('roadmap OR notes', 'is:canvas') == '(roadmap OR notes) is:canvas'
+    assert filenames(index, refine_query('roadmap OR notes', 'is:canvas')) == ['notes.htm']
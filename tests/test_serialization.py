@@ -0,0 +1,35 @@
+"""
+Tests for JSON serialization and field projection
+"""
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gemini_html_manager import serialization
+
+
+def test_parse_fields():
+    assert serialization.parse_fields(None) is None
+    assert serialization.parse_fields('') is None
+    assert serialization.parse_fields('filename, title,filename') == ['filename', 'title']
+    with pytest.raises(ValueError):
+        serialization.parse_fields('filename,secret')
+
+
+def test_project():
+    entries = [{'filename': 'a.html', 'title': 'A', 'path': '/x/a.html'}]
+    assert serialization.project(entries, ['filename', 'title']) == [{'filename': 'a.html', 'title': 'A'}]
+    assert serialization.project(entries, None) == entries
+
+
+@pytest.mark.parametrize('use_orjson', [False, True])
+def test_dumps_matches_json(use_orjson):
+    if use_orjson and serialization.orjson is None:
+        pytest.skip('orjson not installed')
+    data = {'files': [{'title': 'Ünïcode', 'size_mb': 1.5, 'has_images': True}], 'count': 1}
+    assert json.loads(serialization.dumps(data, use_orjson=use_orjson)) == data
+    assert json.loads(serialization.dumps(data, indent=True, use_orjson=use_orjson)) == data
@@ -0,0 +1,83 @@
+"""
+Tests for the static pre-rendered build
+"""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gemini_html_manager.file_manager import HTMLFileManager
+from gemini_html_manager.static_site import StaticSiteBuilder
+
+SAMPLE_HTML = """<html><head><title>{title}</title></head>
+<body><p>Gemini canvas chart</p><img src="chart.png"></body></html>"""
+
+
+def make_builder(tmp_path):
+    export_dir = tmp_path / 'exports'
+    export_dir.mkdir()
+    public_dir = tmp_path / 'public'
+    (public_dir / 'projects').mkdir(parents=True)
+    (public_dir / 'index.html').write_text('<html><body>Landing</body></html>')
+    (public_dir / 'projects' / 'demo.html').write_text('<html><body>Demo</body></html>')
+
+    manager = HTMLFileManager()
+    manager.export_directory = str(export_dir)
+    for name in ('alpha', 'beta'):
+        (export_dir / f'{name}.html').write_text(SAMPLE_HTML.format(title=name.title()))
+    return StaticSiteBuilder(manager, str(tmp_path / 'site'), public_directory=str(public_dir)), export_dir
+
+
+def test_build_renders_pages_and_hashed_assets(tmp_path):
+    builder, _ = make_builder(tmp_path)
+    site = tmp_path / 'site'
+
+    result = builder.build()
+    assert result['files'] == 2
+    assert result['pages_rendered'] == 4
+
+    assert (site / 'index.html').read_text() == '<html><body>Landing</body></html>'
+    assert (site / 'projects' / 'demo.html').exists()
+    assert (site / 'html_exports' / 'alpha.html').read_text() == SAMPLE_HTML.format(title='Alpha')
+
+    dashboard = (site / 'gemini-manager' / 'index.html').read_text()
+    assert 'href="/gemini-manager/file/alpha.html"' in dashboard
+    assert '<style>' not in dashboard and '/api/upload_to_drive' not in dashboard
+    file_page = (site / 'gemini-manager' / 'file' / 'beta.html').read_text()
+    assert 'Beta' in file_page and 'href="/html_exports/beta.html"' in file_page
+
+    # Every asset a page links to exists and is named by its content hash
+    assets = sorted(os.listdir(site / 'assets'))
+    assert any(name.startswith('style.') and name.endswith('.css') for name in assets)
+    for name in assets:
+        assert f'/assets/{name}' in dashboard + file_page + (site / 'catalog.json').read_text() \
+            + (site / 'search-index.json').read_text() + (site / 'gemini-manager' / 'files' / 'index.html').read_text()
+
+    pointer = json.loads((site / 'catalog.json').read_text())
+    catalog = json.loads((site / pointer['catalog'].lstrip('/')).read_text())
+    assert [entry['filename'] for entry in sorted(catalog, key=lambda e: e['filename'])] == ['alpha.html', 'beta.html']
+    assert 'path' not in catalog[0]
+
+
+def test_rebuild_is_incremental(tmp_path):
+    builder, export_dir = make_builder(tmp_path)
+    site = tmp_path / 'site'
+    builder.build()
+
+    result = builder.build()
+    assert result['pages_rendered'] == 0
+    assert result['exports_copied'] == 0 and result['public_copied'] == 0
+
+    (export_dir / 'alpha.html').write_text(SAMPLE_HTML.format(title='Alpha revised'))
+    os.remove(export_dir / 'beta.html')
+    result = builder.build()
+    # alpha's page plus the dashboard and file list
+    assert result['pages_rendered'] == 3
+    assert result['exports_copied'] == 1
+    assert 'Alpha revised' in (site / 'gemini-manager' / 'file' / 'alpha.html').read_text()
+    assert not (site / 'gemini-manager' / 'file' / 'beta.html').exists()
+    assert not (site / 'html_exports' / 'beta.html').exists()
+    assert len([n for n in os.listdir(site / 'assets') if n.startswith('catalog.')]) == 1
+
+    assert builder.build(force=True)['pages_rendered'] == 3
@@ -0,0 +1,155 @@
+"""
+Tests for resumable chunked uploads
+"""
+import hashlib
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gemini_html_manager.file_manager import HTMLFileManager
+from gemini_html_manager.upload_sessions import UploadError, UploadSessionManager
+
+CONTENT = ('<html><head><title>Canvas export</title></head><body>'
+           + ''.join(f'<p>Paragraph {i}</p>' for i in range(300)) + '</body></html>').encode('utf-8')
+
+
+def chunks(data, size):
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+
+@pytest.fixture
+def sessions(tmp_path):
+    file_manager = HTMLFileManager()
+    file_manager.export_directory = str(tmp_path / 'exports')
+    manager = UploadSessionManager(file_manager, str(tmp_path / 'uploads'))
+    manager.chunk_size = 1000
+    return manager
+
+
+def test_parallel_chunks_resume_and_import(sessions, tmp_path):
+    digest = hashlib.sha256(CONTENT).hexdigest()
+    session, resumed = sessions.create('export.htm', len(CONTENT), digest)
+    assert not resumed and session.total_chunks == len(chunks(CONTENT, 1000))
+
+    parts = chunks(CONTENT, 1000)
+    half = len(parts) // 2
+    with ThreadPoolExecutor(4) as pool:
+        list(pool.map(lambda index: sessions.write_chunk(session.id, index, parts[index]), range(half)))
+
+    # A restarted server, and a client opening the same file again, pick up the session
+    reloaded = UploadSessionManager(sessions.file_manager, sessions.directory)
+    reloaded.chunk_size = 1000
+    again, resumed = reloaded.create('export.htm', len(CONTENT), digest)
+    assert resumed and again.id == session.id
+    assert again.missing() == list(range(half, len(parts)))
+
+    with pytest.raises(UploadError) as error:
+        reloaded.complete(session.id)
+    assert error.value.status == 409 and error.value.details['missing'] == again.missing()
+
+    for index in again.missing():
+        reloaded.write_chunk(session.id, index, parts[index], hashlib.sha256(parts[index]).hexdigest())
+    result = reloaded.complete(session.id)
+
+    assert result == {'filename': 'export.html', 'size': len(CONTENT), 'sha256': digest}
+    with open(reloaded.file_manager.resolve_path('export.html'), 'rb') as f:
+        assert f.read() == CONTENT
+    assert os.listdir(sessions.directory) == []
+
+
+def test_bad_chunks_and_checksums_are_refused(sessions):
+    with pytest.raises(UploadError) as error:
+        sessions.create('huge.html', 50 * 1024 * 1024)
+    assert error.value.status == 413
+    with pytest.raises(UploadError):
+        sessions.create('script.js', 10)
+
+    session, _ = sessions.create('page.html', len(CONTENT), hashlib.sha256(CONTENT).hexdigest())
+    parts = chunks(CONTENT, 1000)
+    with pytest.raises(UploadError) as error:
+        sessions.write_chunk(session.id, 0, parts[0][:10])
+    assert error.value.status == 400
+    with pytest.raises(UploadError) as error:
+        sessions.write_chunk(session.id, 0, parts[0], hashlib.sha256(b'other').hexdigest())
+    assert error.value.status == 422
+
+    # A chunk damaged without a chunk checksum is caught by the file checksum
+    damaged = list(parts)
+    damaged[1] = b'x' * len(parts[1])
+    for index, part in enumerate(damaged):
+        sessions.write_chunk(session.id, index, part)
+    with pytest.raises(UploadError) as error:
+        sessions.complete(session.id)
+    assert error.value.status == 422 and len(error.value.details['missing']) == len(parts)
+    assert sessions.file_manager.resolve_path('page.html') is None
+
+
+def test_upload_api_round_trip(tmp_path, monkeypatch):
+    from gemini_html_manager import web_interface
+
+    monkeypatch.setattr(web_interface.file_manager, 'export_directory', str(tmp_path))
+    monkeypatch.setattr(web_interface.upload_sessions, 'directory', str(tmp_path / '.uploads'))
+    monkeypatch.setattr(web_interface.upload_sessions, 'chunk_size', 4096)
+    client = web_interface.app.test_client()
+
+    response = client.post('/api/uploads', json={'filename': 'report.html', 'size': len(CONTENT),
+                                                 'sha256': hashlib.sha256(CONTENT).hexdigest(),
+                                                 'new_name': 'renamed'})
+    assert response.status_code == 201
+    session = response.get_json()
+    assert session['missing'] == list(range(session['total_chunks']))
+
+    for index, part in reversed(list(enumerate(chunks(CONTENT, 4096)))):
+        response = client.put(f"/api/uploads/{session['id']}/chunks/{index}", data=part,
+                              headers={'X-Chunk-Sha256': hashlib.sha256(part).hexdigest()})
+        assert response.status_code == 200
+    assert client.put(f"/api/uploads/{session['id']}/chunks/0", data=b'x' * 5000).status_code == 413
+    assert client.get(f"/api/uploads/{session['id']}").get_json()['missing'] == []
+
+    response = client.post(f"/api/uploads/{session['id']}/complete")
+    assert response.status_code == 200
+    assert response.get_json()['filename'] == 'renamed.html'
+    assert (tmp_path / 'renamed.html').read_bytes() == CONTENT
+    assert client.get(f"/api/uploads/{session['id']}").status_code == 404
+
+
+def test_chunk_without_content_length_is_read_up_to_the_limit(tmp_path, monkeypatch):
+    from gemini_html_manager import web_interface
+
+    monkeypatch.setattr(web_interface.file_manager, 'export_directory', str(tmp_path))
+    monkeypatch.setattr(web_interface.upload_sessions, 'directory', str(tmp_path / '.uploads'))
+    monkeypatch.setattr(web_interface.upload_sessions, 'chunk_size', 4096)
+    client = web_interface.app.test_client()
+    session = client.post('/api/uploads', json={'filename': 'report.html', 'size': len(CONTENT)}).get_json()
+
+    class EndlessBody(io.RawIOBase):
+        """A chunked request body that never ends, counting what is read"""
+        read_bytes = 0
+
+        def readable(self):
+            return True
+
+        def readinto(self, buffer):
+            size = min(len(buffer), 1000)
+            buffer[:size] = b'x' * size
+            self.read_bytes += size
+            return size
+
+    def put_chunked(body):
+        # Chunked transfer encoding: no Content-Length, and the server marks the input terminated
+        return client.put(f"/api/uploads/{session['id']}/chunks/0", headers={'Transfer-Encoding': 'chunked'},
+                          environ_overrides={'wsgi.input': body, 'wsgi.input_terminated': True,
+                                             'CONTENT_LENGTH': ''})
+
+    body = EndlessBody()
+    assert put_chunked(body).status_code == 413
+    assert body.read_bytes <= 4096 + 1000
+
+    response = put_chunked(io.BytesIO(CONTENT[:4096]))
+    assert response.status_code == 200
+    assert client.get(f"/api/uploads/{session['id']}").get_json()['received'] == [0]
@@ -0,0 +1,165 @@
+"""
+Tests for delta-compressed version history of re-imported exports
+"""
+import gzip
+import os
+import random
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gemini_html_manager.config import config
+from gemini_html_manager.versions import make_delta, apply_delta
+
+
+def iterated_exports(count, rows=2000):
+    """An export and `count` revisions of it, each changing a few rows"""
+    rng = random.Random(7)
+    lines = [f'<tr><td class="c{i % 5}">{rng.random():.6f}</td><td>Item {i}</td></tr>' for i in range(rows)]
+    exports = []
+    for revision in range(count):
+        for _ in range(10):
+            row = rng.randrange(len(lines))
+            lines[row] = lines[row].replace('Item', f'Revised {revision}')
+        lines.insert(rng.randrange(len(lines)), f'<p>Note {revision}</p>')
+        exports.append(('<html><body><table>\n' + '\n'.join(lines) + '\n</table></body></html>').encode())
+    return exports
+
+
+def test_delta_round_trip():
+    rng = random.Random(3)
+    base = bytes(rng.randrange(256) for _ in range(5000)) + b'<div>shared</div>\n' * 50
+    target = b'<p>prefix</p>' + base[100:3000] + b'<b>changed</b>' + base[3000:] + b'tail'
+
+    assert apply_delta(base, make_delta(base, target)) == target
+    assert apply_delta(base, make_delta(base, b'')) == b''
+    assert apply_delta(b'', make_delta(b'', target)) == target
+
+
+def test_reimport_records_versions(tmp_path, make_manager):
+    source_dir = tmp_path / 'source'
+    source_dir.mkdir()
+    export_dir = tmp_path / 'exports'
+    export_dir.mkdir()
+    manager = make_manager(export_dir)
+    exports = iterated_exports(6)
+
+    source = source_dir / 'report.html'
+    for content in exports:
+        source.write_bytes(content)
+        stored_path = manager.import_html_file(str(source))
+
+    # One export on disk, holding the latest version in full
+    assert [r.filename for r in manager.iter_html_files()] == ['report.html']
+    assert open(stored_path, 'rb').read() == exports[-1]
+
+    history = manager.list_versions('report.html')
+    assert [entry['version'] for entry in history] == [1, 2, 3, 4, 5, 6]
+    assert [entry['current'] for entry in history] == [False] * 5 + [True]
+    for entry, content in zip(history, exports):
+        assert manager.get_version('report.html', entry['version']) == content
+    assert manager.get_version('report.html', 7) is None
+
+    # Deltas are an order of magnitude smaller than compressed full copies
+    usage = manager.versions.usage('report.html')
+    assert usage['delta_bytes'] * 10 < sum(len(gzip.compress(content)) for content in exports[:-1])
+
+    # Re-importing identical content adds no version
+    assert manager.import_html_file(str(source)) == stored_path
+    assert len(manager.list_versions('report.html')) == 6
+
+    assert manager.restore_version('report.html', 2)
+    assert manager.get_version('report.html', 7) == exports[1]
+    assert open(manager.resolve_path('report.html'), 'rb').read() == exports[1]
+
+
+def test_history_disabled_keeps_timestamped_copies(tmp_path, monkeypatch, make_manager):
+    monkeypatch.setitem(config.get('html_manager'), 'version_history', False)
+    source = tmp_path / 'page.html'
+    export_dir = tmp_path / 'exports'
+    export_dir.mkdir()
+    manager = make_manager(export_dir)
+
+    source.write_text('<html><body>one</body></html>')
+    manager.import_html_file(str(source))
+    source.write_text('<html><body>two</body></html>')
+    manager.import_html_file(str(source))
+
+    names = sorted(r.filename for r in manager.iter_html_files())
+    assert len(names) == 2 and names[0] == 'page.html'
+    assert manager.list_versions('page.html') == []
+
+
+def test_restore_replaces_the_export_with_history_disabled(tmp_path, monkeypatch, make_manager):
+    source = tmp_path / 'page.html'
+    export_dir = tmp_path / 'exports'
+    export_dir.mkdir()
+    manager = make_manager(export_dir)
+    for body in ('one', 'two'):
+        source.write_text(f'<html><body>{body}</body></html>')
+        manager.import_html_file(str(source))
+
+    # Versions recorded earlier can still be restored after history is turned off
+    monkeypatch.setitem(config.get('html_manager'), 'version_history', False)
+    restored = manager.restore_version('page.html', 1)
+
+    assert restored == manager.resolve_path('page.html')
+    assert [r.filename for r in manager.iter_html_files()] == ['page.html']
+    assert open(restored, encoding='utf-8').read() == '<html><body>one</body></html>'
+    assert len(manager.list_versions('page.html')) == 3
+
+
+def test_concurrent_imports_of_one_name_keep_every_file(tmp_path, make_manager):
+    export_dir = tmp_path / 'exports'
+    export_dir.mkdir()
+    manager = make_manager(export_dir)
+    sources = []
+    for index in range(8):
+        source = tmp_path / f'source-{index}'
+        source.mkdir()
+        (source / 'page.html').write_text(f'<html><body>{index}</body></html>')
+        sources.append(str(source / 'page.html'))
+
+    # Asked not to version, an import never replaces the existing file
+    with ThreadPoolExecutor(8) as pool:
+        stored = list(pool.map(lambda path: manager.import_html_file(path, version_history=False), sources))
+
+    assert len(set(stored)) == 8
+    contents = {open(path, encoding='utf-8').read() for path in stored}
+    assert contents == {f'<html><body>{index}</body></html>' for index in range(8)}
+    assert manager.list_versions('page.html') == []
+
+    # Versioned imports take turns, so every one is recorded
+    for index, path in enumerate(sources):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f'<html><body>revised {index}</body></html>')
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda path: manager.import_html_file(path, version_history=True), sources))
+    history = manager.list_versions('page.html')
+    assert len(history) == 9
+    revised = {manager.get_version('page.html', entry['version']) for entry in history[1:]}
+    assert revised == {f'<html><body>revised {index}</body></html>'.encode() for index in range(8)}
+
+
+def test_versions_api(tmp_path, monkeypatch):
+    from gemini_html_manager import web_interface
+
+    export_dir = tmp_path / 'exports'
+    export_dir.mkdir()
+    monkeypatch.setattr(web_interface.file_manager, 'export_directory', str(export_dir))
+    source = tmp_path / 'page.html'
+    for body in ('first', 'second'):
+        source.write_text(f'<html><body><p>{body} version of the page</p></body></html>')
+        web_interface.file_manager.import_html_file(str(source))
+
+    client = web_interface.app.test_client()
+    listing = client.get('/api/versions/page.html').get_json()
+    assert [entry['version'] for entry in listing['versions']] == [1, 2]
+    assert listing['usage']['versions'] == 2
+
+    response = client.get('/api/versions/page.html/1')
+    assert response.status_code == 200
+    assert b'first version' in response.data
+    assert client.get('/api/versions/page.html/9').status_code == 404
+    assert client.get('/api/versions/missing.html').status_code == 404